@@ -0,0 +1,108 @@
+# coding: utf-8
+"""
+Benchmark survey.clean_urls against the row by row loop it replaced
+
+Usage: python benchmarks/clean_urls.py [--rows 100000] [--input path]
+
+The input csv is cleaned with survey.clean_raw, then resampled up to the
+requested number of rows. Both implementations are timed on the same data
+and their outputs are checked to be identical.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from classifyintents import survey, reg_match
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                             'test_data', 'raw_test_data_2.csv')
+
+
+def clean_urls_loop(data):
+    """
+    The iterrows implementation of survey.clean_urls, kept for comparison
+    """
+
+    data.org = data.org.astype('str')
+    data.section = data.section.astype('str')
+
+    query = r'\/?browse'
+
+    data['page'] = str()
+
+    for index, row in data.iterrows():
+
+        if ((row['full_url'] == '/') | (row['full_url'] == np.nan)
+                | (str(row['full_url']) == 'nan')):
+
+            continue
+
+        elif re.search('/government/world', str(row['full_url'])):
+
+            data.loc[index, ['org', 'page']] = ['Foreign & Commonwealth Office',
+                                                '/government/world']
+
+        elif re.search(r'\/guidance|\/government', str(row['full_url'])):
+            if row['org'] == 'nan':
+                data.loc[index, 'page'] = row['full_url']
+
+        elif re.search(r'\/browse', str(row['full_url'])):
+            data.loc[index, 'page'] = reg_match(query, row['full_url'], 1)
+
+            if row['section'] == 'nan':
+                data.loc[index, 'section'] = reg_match(query, row['full_url'], 2)
+
+        else:
+            data.loc[index, 'page'] = '/' + reg_match('.*', row['full_url'], 0)
+
+    return data
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--loop-rows', type=int, default=10000,
+                        help='rows to time the (slow) loop on')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    args = parser.parse_args()
+
+    intent = survey()
+    intent.load(args.input)
+    intent.clean_raw()
+
+    sample = intent.data.sample(args.rows, replace=True, random_state=1)
+    sample = sample.reset_index(drop=True)
+
+    intent.data = sample.copy()
+    start = time.perf_counter()
+    intent.clean_urls()
+    vectorized = time.perf_counter() - start
+
+    loop_data = sample[:args.loop_rows].copy()
+    start = time.perf_counter()
+    loop_data = clean_urls_loop(loop_data)
+    loop = time.perf_counter() - start
+
+    expected = loop_data[['page', 'org', 'section']]
+    actual = intent.data.loc[:args.loop_rows - 1, ['page', 'org', 'section']]
+    identical = expected.equals(actual)
+
+    print('rows      method      seconds      rows/s')
+    print('%-9d %-11s %-12.3f %.0f' % (args.loop_rows, 'loop', loop, args.loop_rows / loop))
+    print('%-9d %-11s %-12.3f %.0f' % (args.rows, 'vectorized', vectorized,
+                                       args.rows / vectorized))
+    print('identical output: %s' % identical)
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# coding: utf-8
+"""
+Benchmark comment_features against the single feature functions it replaced
+
+Usage: python benchmarks/comment_features.py [--rows 1000000]
+
+Comments are sampled from the test data, with a random suffix so that most
+of them are unique, as real comments are. The old functions are timed on a
+subset of the rows, and both are checked to give identical output.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from classifyintents import (survey, comment_features, string_capsratio,
+                             string_nexcl, string_lengths, clean_comment)
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                             'test_data', 'raw_test_data.csv')
+
+
+def comment_features_old(feature):
+    """
+    The features as clean_raw used to calculate them
+    """
+
+    return pd.DataFrame({
+        'comment': clean_comment(feature),
+        'len': string_lengths(feature),
+        'capsratio': [string_capsratio(x) for x in feature],
+        'nexcl': [string_nexcl(x) for x in feature],
+        }, index=feature.index, columns=['comment', 'len', 'capsratio', 'nexcl'])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--old-rows', type=int, default=100000,
+                        help='rows to time the old functions on')
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    args = parser.parse_args()
+
+    intent = survey()
+    intent.load(args.input)
+
+    comments = pd.concat([intent.raw[col] for col in intent.raw.columns
+                          if col.startswith(('Q2.', 'Q3.', 'Q7.', 'Q8.'))])
+    comments = comments.dropna().tolist()
+
+    random = np.random.RandomState(1)
+    sample = random.choice(comments, args.rows)
+    suffix = random.randint(0, args.rows, args.rows).astype(str)
+    feature = pd.Series(np.char.add(sample.astype(str), suffix), dtype='object')
+
+    start = time.perf_counter()
+    new = comment_features(feature)
+    new_time = time.perf_counter() - start
+
+    subset = feature[:args.old_rows]
+    start = time.perf_counter()
+    old = comment_features_old(subset)
+    old_time = time.perf_counter() - start
+
+    identical = old.equals(new[:args.old_rows])
+
+    print('rows      method      seconds      rows/s')
+    print('%-9d %-11s %-12.3f %.0f' % (args.old_rows, 'old', old_time,
+                                       args.old_rows / old_time))
+    print('%-9d %-11s %-12.3f %.0f' % (args.rows, 'single', new_time,
+                                       args.rows / new_time))
+    print('identical output: %s' % identical)
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# coding: utf-8
+"""
+Benchmark the latency of ResponseFeaturizer on single responses
+
+Usage: python benchmarks/featurize.py [--responses 10000]
+
+A FeatureTransformer is fitted to the classified test data, and the
+responses of a synthetic survey are featurized one at a time. The
+features of every response are checked against survey.predictor, and
+the 50th, 90th and 99th percentile latencies are reported.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from classifyintents import survey, FeatureTransformer, ResponseFeaturizer, percentiles
+from classifyintents.synthetic import synthetic_survey
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                             'test_data', 'raw_test_data_classified.csv')
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--responses', type=int, default=10000)
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    args = parser.parse_args()
+
+    train = survey()
+    train.load(args.input)
+    train.clean_raw()
+    train.clean_urls()
+    train.trainer(['ok'])
+
+    transformer = FeatureTransformer.from_survey(train)
+    responses = synthetic_survey(args.responses, seed=1, classified=False)
+    records = responses.to_dict(orient='records')
+
+    # Score the same responses in batch, to check the features
+
+    intent = survey(transformer=transformer)
+    intent.raw = intent.tidy_raw(responses.copy(), 'synthetic')
+    intent.clean_raw()
+    intent.clean_urls()
+    intent.predictor()
+
+    featurizer = ResponseFeaturizer(transformer)
+    latencies = []
+    features = []
+
+    for record in records:
+        start = time.perf_counter()
+        features.append(featurizer.featurize(record))
+        latencies.append(time.perf_counter() - start)
+
+    expected = intent.cleaned.astype('float64').values
+    actual = np.array([features[i] for i in intent.cleaned.index])
+
+    print('responses %d, features match predictor: %s' % (
+        len(records), np.array_equal(actual, expected)))
+
+    for name, seconds in percentiles(latencies).items():
+        print('%-12s %.1f us' % (name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# coding: utf-8
+"""
+Benchmark the time taken to import classifyintents
+
+Usage: python benchmarks/import_time.py [--repeat 5]
+
+Each import is timed in a fresh interpreter, so nothing is already loaded,
+and the heavy dependencies it loaded are reported. Importing the package
+or the url rules should load none of them.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY = ['numpy', 'pandas', 'scipy', 'sklearn', 'requests', 'pyarrow']
+
+IMPORTS = [
+    'import classifyintents',
+    'from classifyintents import reg_match, normalise_url',
+    'from classifyintents import survey',
+    'from classifyintents import ResponseFeaturizer',
+    ]
+
+SCRIPT = '''
+import sys, time, json
+start = time.perf_counter()
+%s
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [m for m in %r if m in sys.modules]]))
+'''
+
+
+def time_import(statement):
+    """
+    Time an import statement in a fresh interpreter
+
+    :param statement: <str> Import statement to run.
+    :return: <tuple> Seconds taken, and the heavy modules it loaded.
+    """
+
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT % (statement, HEAVY)], cwd=ROOT)
+
+    return json.loads(output)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for statement in IMPORTS:
+        times = []
+
+        for _ in range(args.repeat):
+            seconds, loaded = time_import(statement)
+            times.append(seconds)
+
+        print('%-55s best %7.1fms  loads: %s' % (
+            statement, min(times) * 1000, ', '.join(loaded) or 'nothing heavy'))
+
+
+if __name__ == '__main__':
+    main()
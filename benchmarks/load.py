@@ -0,0 +1,67 @@
+# coding: utf-8
+"""
+Benchmark survey.load from csv, Parquet and Feather files
+
+Usage: python benchmarks/load.py [--rows 200000]
+
+The test data are resampled up to the requested number of rows and
+written to a temporary directory in each format. Load time and the deep
+memory usage of intent.raw are then reported for each. Parquet and
+Feather files are read with only the columns in raw_mapping.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from classifyintents import survey
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                             'test_data', 'raw_test_data_classified.csv')
+
+MB = 1024 * 1024
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.input)
+    random = np.random.RandomState(1)
+    raw = raw.iloc[random.randint(0, len(raw), args.rows)].reset_index(drop=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        paths = [os.path.join(tmp, 'raw.' + ext) for ext in ('csv', 'parquet', 'feather')]
+        raw.to_csv(paths[0], index=False)
+        raw.to_parquet(paths[1])
+        raw.to_feather(paths[2])
+
+        print('format    low_memory  size MB   seconds   raw MB    columns')
+
+        for path in paths:
+            for low_memory in (False, True):
+
+                intent = survey(low_memory=low_memory)
+                start = time.perf_counter()
+                intent.load(path)
+                seconds = time.perf_counter() - start
+
+                print('%-9s %-11s %-9.1f %-9.3f %-9.1f %d' % (
+                    os.path.splitext(path)[1][1:], low_memory,
+                    os.path.getsize(path) / MB, seconds,
+                    intent.raw.memory_usage(deep=True).sum() / MB,
+                    intent.raw.shape[1]))
+
+
+if __name__ == '__main__':
+    main()
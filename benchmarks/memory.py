@@ -0,0 +1,124 @@
+# coding: utf-8
+"""
+Memory profile of the survey pipeline, with and without low_memory
+
+Usage: python benchmarks/memory.py [--rows 200000]
+
+The test data are resampled up to the requested number of rows and
+written to a temporary csv. Each mode is then run in a separate process,
+so that peak RSS is measured independently, and the following reported
+after each stage:
+
+* rss: resident set size of the process.
+* delta: change in rss over the stage.
+* peak: peak resident set size of the process so far (Linux only).
+* held: deep memory usage of the raw, data and cleaned DataFrames.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from classifyintents.instrument import rss, MB
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                             'test_data', 'raw_test_data_classified.csv')
+
+
+def peak_rss():
+    """
+    Peak resident set size in bytes, None if it cannot be read
+    """
+
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+
+        return int(status['VmHWM'].split()[0]) * 1024
+
+    except (IOError, KeyError):
+        return None
+
+
+def held(intent):
+
+    return sum(frame.memory_usage(deep=True, index=True).sum()
+               for frame in [intent.raw, intent.data, intent.cleaned])
+
+
+def profile(path, low_memory):
+    """
+    Run the pipeline, recording memory after each stage
+    """
+
+    from classifyintents import survey
+
+    intent = survey(low_memory=low_memory)
+    stages = [('load', lambda: intent.load(path)),
+              ('clean_raw', intent.clean_raw),
+              ('clean_urls', intent.clean_urls),
+              ('trainer', intent.trainer)]
+
+    report = []
+    before = rss()
+
+    for name, stage in stages:
+        stage()
+        current = rss()
+        report.append({'stage': name, 'rss': current, 'delta': current - before,
+                       'peak': peak_rss(), 'held': int(held(intent))})
+        before = current
+
+    return report
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--child', choices=['default', 'low_memory'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(profile(args.input, args.child == 'low_memory')))
+        return
+
+    raw = pd.read_csv(args.input)
+    raw = raw.sample(args.rows, replace=True, random_state=1)
+    raw['UserID'] = np.arange(args.rows) + 10000000
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        path = os.path.join(tmp, 'survey.csv')
+        raw.to_csv(path, index=False)
+        del raw
+
+        print('%s rows, %.1f MB csv\n' % (args.rows, os.path.getsize(path) / MB))
+        print('%-11s %-11s %10s %10s %10s %10s' %
+              ('mode', 'stage', 'rss MB', 'delta MB', 'peak MB', 'held MB'))
+
+        for mode in ['default', 'low_memory']:
+
+            output = subprocess.check_output(
+                [sys.executable, __file__, '--child', mode, '--input', path],
+                stderr=subprocess.DEVNULL)
+
+            for stage in json.loads(output.decode().splitlines()[-1]):
+                peak = 'n/a' if stage['peak'] is None else '%.1f' % (stage['peak'] / MB)
+
+                print('%-11s %-11s %10.1f %10.1f %10s %10.1f' %
+                      (mode, stage['stage'], stage['rss'] / MB, stage['delta'] / MB,
+                       peak, stage['held'] / MB))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+# coding: utf-8
+"""
+Benchmark each stage of the survey pipeline on synthetic data at scale
+
+Usage: python benchmarks/suite.py [--rows 10000 100000 1000000] [--repeat 3]
+       [--compare benchmarks/results/previous.json]
+
+For each number of rows, a synthetic survey export is generated with
+synthetic_survey (and kept in --data-dir, so it is only generated once),
+then run through load, clean_raw, clean_urls, api_lookup, trainer and
+predictor --repeat times. api_lookup is run against a stub search API on
+localhost, so the suite runs offline.
+
+The time taken by each stage is taken from survey.metrics. The fastest
+and median of the repeats are printed, and written with details of the
+commit and environment to a json file in --output, so that throughput can
+be tracked over releases. --compare prints the change against a previous
+results file.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import platform
+import argparse
+import threading
+import socketserver
+import subprocess
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from classifyintents import survey, ContentAPIClient
+from classifyintents.synthetic import synthetic_survey, BROWSE
+
+STAGES = ['load', 'clean_raw', 'clean_urls', 'api_lookup', 'trainer', 'predictor']
+
+ORGANISATIONS = ['HM Revenue & Customs', 'Driver and Vehicle Licensing Agency',
+                 'HM Passport Office', 'Department for Work and Pensions',
+                 'Home Office', 'Companies House']
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    HTTPServer handling each request in a thread, as
+    http.server.ThreadingHTTPServer does from Python 3.7
+    """
+
+    daemon_threads = True
+
+
+class StubSearchAPI(BaseHTTPRequestHandler):
+    """
+    Stands in for the search API, returning an organisation and browse
+    page chosen by a hash of each page, after an optional delay
+    """
+
+    latency = 0
+
+    def do_GET(self):
+
+        query = parse_qs(urlparse(self.path).query)
+        results = []
+
+        for page in query.get('filter_link[]', []):
+            digest = int(hashlib.md5(page.encode()).hexdigest(), 16)
+
+            # About one page in ten is not found
+
+            if digest % 10 == 0:
+                continue
+
+            result = {'organisations': [{'title': ORGANISATIONS[digest % len(ORGANISATIONS)]}],
+                      'mainstream_browse_pages': [BROWSE[digest % len(BROWSE)]]}
+
+            if 'link' in query.get('fields', []):
+                result['link'] = page
+
+            results.append(result)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = json.dumps({'results': results}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def environment():
+    """
+    Details of the code and environment the benchmarks were run with
+    """
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = 'unknown'
+
+    with open(os.path.join(ROOT, 'setup.py')) as f:
+        version = re.search(r"version='([^']+)'", f.read()).group(1)
+
+    return {'version': version, 'commit': commit,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'pandas': pd.__version__,
+            'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count()}
+
+
+def synthetic_csv(rows, seed, data_dir):
+    """
+    Path to a synthetic survey export, generating it if it does not exist
+    """
+
+    path = os.path.join(data_dir, 'synthetic_%s_%s.csv' % (rows, seed))
+
+    if not os.path.exists(path):
+        print('Generating %s rows...' % rows, flush=True)
+        synthetic_survey(rows, seed=seed).to_csv(path, index=False)
+
+    return path
+
+
+def run(path, url, concurrency, batch_size, n_jobs=1):
+    """
+    Run the pipeline once, returning the metrics of each stage
+    """
+
+    client = ContentAPIClient(url=url, concurrency=concurrency, rate=None,
+                              batch_size=batch_size)
+
+    intent = survey()
+    intent.load(path)
+    intent.clean_raw(n_jobs=n_jobs)
+    intent.clean_urls()
+    intent.api_lookup(client=client)
+    intent.trainer(['ok'])
+    intent.predictor(intent.stats['levels'])
+
+    return intent.metrics_frame()
+
+
+def summarise(metrics, rows):
+    """
+    Fastest and median time of each stage over the repeats
+    """
+
+    results = []
+
+    for stage in STAGES:
+        stage_metrics = metrics[metrics['stage'] == stage]
+        seconds = stage_metrics['seconds']
+
+        result = {'rows': rows, 'stage': stage,
+                  'seconds_min': float(seconds.min()),
+                  'seconds_median': float(seconds.median()),
+                  'rows_per_second': rows / float(seconds.min()),
+                  'rss_delta_mb': float(stage_metrics['rss_delta_mb'].max())
+                                  if 'rss_delta_mb' in stage_metrics else None}
+
+        if stage == 'api_lookup':
+            result['requests'] = int(stage_metrics['requests'].iloc[0])
+            result['pages'] = int(stage_metrics['pages'].iloc[0])
+
+        results.append(result)
+
+    return results
+
+
+def compare(results, path):
+    """
+    Print the change in the fastest time of each stage against a previous run
+    """
+
+    with open(path) as f:
+        previous = json.load(f)
+
+    before = {(r['rows'], r['stage']): r['seconds_min'] for r in previous['results']}
+
+    print('\nCompared with %s (%s):' % (previous['environment']['commit'], path))
+    print('rows      stage        before     after      speedup')
+
+    for r in results:
+        key = (r['rows'], r['stage'])
+        if key in before:
+            print('%-9d %-12s %-10.3f %-10.3f %.2fx' % (
+                r['rows'], r['stage'], before[key], r['seconds_min'],
+                before[key] / r['seconds_min']))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', 'data'))
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results'))
+    parser.add_argument('--compare', help='previous results file to compare with')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds the stub API waits before responding')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--n-jobs', type=int, default=1,
+                        help='processes to run clean_raw with')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.makedirs(args.output, exist_ok=True)
+
+    StubSearchAPI.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSearchAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:%s/api/search.json' % server.server_port
+
+    env = environment()
+    results = []
+
+    print('rows      stage        min s      median s   rows/s')
+
+    try:
+        for rows in args.rows:
+            path = synthetic_csv(rows, args.seed, args.data_dir)
+            metrics = pd.concat([run(path, url, args.concurrency, args.batch_size,
+                                     args.n_jobs)
+                                 for i in range(args.repeat)])
+
+            for r in summarise(metrics, rows):
+                results.append(r)
+                print('%-9d %-12s %-10.3f %-10.3f %.0f' % (
+                    rows, r['stage'], r['seconds_min'], r['seconds_median'],
+                    r['rows_per_second']), flush=True)
+
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    output = os.path.join(args.output, '%s-%s.json' % (
+        time.strftime('%Y%m%d-%H%M%S'), env['commit']))
+
+    with open(output, 'w') as f:
+        json.dump({'environment': env, 'arguments': vars(args), 'results': results},
+                  f, indent=2)
+
+    print('\nResults written to %s' % output)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,74 @@
-from .classifyintents import *
-#__all__ = ['classifyintents']
+"""
+Classify intents from the GOV.UK intent survey
+
+Names are imported from their submodules on first use, so importing the
+package (e.g. for the url rules in classifyintents.urls) does not load
+pandas, scikit-learn or requests until something that needs them is used.
+"""
+
+import importlib
+
+# Public names of each submodule, exported from the package
+
+_exports = {
+    'classifyintents': [
+        'survey', 'string_lengths', 'length_stats', 'scale_lengths',
+        'string_len', 'COMMA_PATTERN', 'upper_case_table', 'comment_features',
+        'string_capsratio', 'string_nexcl', 'DATE_FORMATS', 'DIGIT_PATTERN',
+        'infer_date_format', 'parse_dates', 'clean_date', 'date_features',
+        'downcast_integer', 'NULL_PATTERN', 'clean_category', 'encode_category',
+        'numeric_values', 'one_hot_codes', 'clean_comment', 'clean_code',
+        'concat_partitions', 'moments', 'normalise', 'merge_stats',
+        'time_delta', 'ANSWER_PATTERN', 'split_other', 'extract_other',
+        'rewrite_other'],
+    'content_api': [
+        'SEARCH_URL', 'RETRY_STATUSES', 'ORG_SECT_COLUMNS', 'lookup',
+        'lookup_row', 'TokenBucket', 'ContentAPIClient', 'get_org'],
+    'cache': ['LookupCache'],
+    'checkpoint': ['LookupCheckpoint'],
+    'transformer': ['FeatureTransformer'],
+    'storage': [
+        'PARQUET', 'FEATHER', 'PICKLE', 'file_format', 'import_pyarrow',
+        'select_columns', 'read_frame', 'read_chunks', 'write_frame',
+        'read_saved'],
+    'instrument': ['MB', 'rss', 'percentiles', 'Progress', 'instrumented'],
+    'incremental': ['IncrementalState'],
+    'urls': [
+        'FCO_ORG', 'FCO_PAGE', 'FCO_PATTERN', 'GOVERNMENT_PATTERN',
+        'BROWSE_PATTERN', 'BROWSE_SECTION_PATTERN', 'EMPTY', 'WORLD',
+        'GOVERNMENT', 'BROWSE', 'TOP_LEVEL', 'URL_CACHE_SIZE',
+        'normalise_url', 'url_rules', 'reg_match', 'compile_pattern'],
+    'featurizer': [
+        'NA_VALUES', 'is_missing', 'clean_value', 'parse_date',
+        'feature_name', 'ResponseFeaturizer'],
+    'snapshot': ['SnapshotIndex'],
+    'resolver': ['AncestorResolver'],
+    }
+
+_modules = {name: module for module, names in _exports.items() for name in names}
+
+_submodules = set(_exports) | {'synthetic', 'service'}
+
+__all__ = [name for names in _exports.values() for name in names] + sorted(_exports)
+
+
+def __getattr__(name):
+    """
+    Import a submodule, or the submodule a name is exported from, on first use
+    """
+
+    if name in _modules:
+        value = getattr(importlib.import_module('.' + _modules[name], __name__), name)
+    elif name in _submodules:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+
+    return sorted(set(globals()) | set(__all__) | _submodules)
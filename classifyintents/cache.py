@@ -0,0 +1,140 @@
+# coding: utf-8
+"""
+Persistent cache of content API lookups
+"""
+
+import json
+import time
+import logging
+import sqlite3
+
+logger = logging.getLogger('classifyintents')
+
+
+class LookupCache:
+    """
+    Single file SQLite cache of org_sect rows, keyed by the cleaned page
+
+    A page's organisation and mainstream browse section rarely change, so
+    a cache shared between runs means only new pages need to be sent to
+    the content API. Pages that the API returns nothing for ('null' in
+    every column) are cached too, with their own TTL. Rows that record a
+    failed request ('none') are never cached.
+    """
+
+    def __init__(self, path, ttl=None, negative_ttl=None):
+        """
+        :param path: <str> Path to the cache file. Created if it does not exist.
+        :param ttl: <float> Seconds for which a cached row is used. None to
+        never expire.
+        :param negative_ttl: <float> Seconds for which a page with no results
+        is cached. None to never expire.
+        """
+
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+        # The connection may be used from another thread than the one that
+        # opened it, as by FeatureService's worker, but never by two at once
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS lookup ('
+            'page TEXT PRIMARY KEY, row TEXT NOT NULL, '
+            'negative INTEGER NOT NULL, updated REAL NOT NULL)'
+            )
+        self.connection.commit()
+
+    def __len__(self):
+
+        return self.connection.execute('SELECT COUNT(*) FROM lookup').fetchone()[0]
+
+    def _expired(self, negative, updated, now):
+
+        ttl = self.negative_ttl if negative else self.ttl
+
+        return ttl is not None and now - updated > ttl
+
+    def get_many(self, pages):
+        """
+        Get cached rows for pages
+
+        :param pages: <iterable> Pages to look up.
+        :return: <dict> Mapping of page to org_sect row for pages that were
+        found and have not expired.
+        """
+
+        pages = list(set(pages))
+        found = {}
+        now = time.time()
+
+        # Stay below SQLite's limit on the number of query parameters
+
+        for i in range(0, len(pages), 500):
+            batch = pages[i:i + 500]
+            query = ('SELECT page, row, negative, updated FROM lookup WHERE page IN (%s)'
+                     % ','.join('?' * len(batch)))
+
+            for page, row, negative, updated in self.connection.execute(query, batch):
+                if not self._expired(negative, updated, now):
+                    found[page] = json.loads(row)
+                    self.negative_hits += negative
+
+        self.hits += len(found)
+        self.misses += len(pages) - len(found)
+
+        return found
+
+    def get_all(self):
+        """
+        Get every cached row that has not expired
+
+        :return: <dict> Mapping of page to org_sect row.
+        """
+
+        now = time.time()
+
+        return {page: json.loads(row) for page, row, negative, updated in
+                self.connection.execute('SELECT page, row, negative, updated FROM lookup')
+                if not self._expired(negative, updated, now)}
+
+    def get(self, page):
+        """
+        Get the cached row for a single page, or None if it is not cached
+        """
+
+        return self.get_many([page]).get(page)
+
+    def set_many(self, rows):
+        """
+        Store rows in the cache
+
+        :param rows: <dict> Mapping of page to org_sect row.
+        """
+
+        now = time.time()
+
+        records = [(page, json.dumps(row), int(all(x == 'null' for x in row)), now)
+                   for page, row in rows.items() if 'none' not in row]
+
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO lookup (page, row, negative, updated) '
+                'VALUES (?, ?, ?, ?)', records)
+
+    def log_stats(self):
+        """
+        Log the hit and miss counts through the classifyintents logger
+        """
+
+        logger.info('Lookup cache %s: %s hits (%s with no results), %s misses',
+                    self.path, self.hits, self.negative_hits, self.misses)
+
+    def close(self):
+
+        self.connection.close()
@@ -0,0 +1,97 @@
+# coding: utf-8
+"""
+Checkpoint of the content API lookups made by survey.api_lookup, so that
+a long lookup can be resumed after a crash
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger('classifyintents')
+
+
+class LookupCheckpoint:
+    """
+    Append only JSON lines file of org_sect rows, keyed by page
+
+    survey.api_lookup sends pages to the API batch_size at a time, and
+    appends the results of each batch to the file once it completes. If the
+    lookup is interrupted, a rerun with the same checkpoint loads the pages
+    already looked up and only sends the rest. Rows that record a failed
+    request ('none') are not checkpointed, so they are retried. The file is
+    removed once the lookup completes.
+    """
+
+    def __init__(self, path, batch_size=500):
+        """
+        :param path: <str> Path to the checkpoint file. Created if it does
+        not exist.
+        :param batch_size: <int> Number of pages to look up between
+        checkpoints.
+        """
+
+        self.path = path
+        self.batch_size = batch_size
+
+    def load(self):
+        """
+        Load the rows checkpointed by a previous run
+
+        A line left incomplete by a crash while it was written is skipped.
+
+        :return: <dict> Mapping of page to org_sect row.
+        """
+
+        rows = {}
+
+        if not os.path.exists(self.path):
+            return rows
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    page, row = json.loads(line)
+                except ValueError:
+                    logger.warning('Skipping incomplete line of checkpoint %s', self.path)
+                    continue
+
+                rows[page] = row
+
+        logger.info('Resuming from %s pages checkpointed in %s', len(rows), self.path)
+
+        return rows
+
+    def save(self, found):
+        """
+        Append rows to the checkpoint, and flush them to disk
+
+        :param found: <dict> Mapping of page to org_sect row.
+        """
+
+        # Start on a new line if a crash left the last line incomplete
+
+        start = ''
+
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                start = '' if f.read(1) == b'\n' else '\n'
+
+        with open(self.path, 'a') as f:
+            f.write(start)
+
+            for page, row in found.items():
+                if row != ['none'] * 9:
+                    f.write(json.dumps([page, row]) + '\n')
+
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        """
+        Remove the checkpoint, once the lookup has completed
+        """
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
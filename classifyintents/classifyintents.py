@@ -4,25 +4,48 @@ Classifyintents: a collection of classes and functions for
 wrangling data from the govuk intent survey.
 """
 
+import os
 import re
-import sys
-import time
 import logging
 import logging.config
-import requests
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pandas.api.types import union_categoricals, is_datetime64_any_dtype
+from .content_api import ContentAPIClient, ORG_SECT_COLUMNS
+from .storage import file_format, read_frame, read_chunks, write_frame
+from .instrument import instrumented, Progress
+from .incremental import IncrementalState
+from .urls import url_rules
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    from pandas._libs.tslibs.parsing import guess_datetime_format
 
 class survey:
     """Class for handling intents surveys from Smart Survey """
 
-    def __init__(self):
+    def __init__(self, transformer=None, low_memory=False, trace_memory=False):
         """
         Instantiate the class
 
         Expects a logging object to have been created in the
         script executing the class.
+
+        :param transformer: <FeatureTransformer> Fitted transformer, e.g. from
+        the data a model was trained on. If given, clean_raw and predictor
+        normalise and encode with its statistics and levels rather than
+        fitting them to the data.
+        :param low_memory: <bool> Reduce the memory held by the object: load
+        only the columns in raw_mapping, release self.raw after clean_raw,
+        store repeated strings as categories, and downcast the date features
+        to int16 and the ratio features to float32 (rather than cleaning
+        them as categories).
+        :param trace_memory: <bool> Trace the peak memory allocated by each
+        stage of the pipeline with tracemalloc, and record it in
+        self.metrics. This slows the pipeline down.
         """
 
         self.logger = logging.getLogger("classifyintents")
@@ -33,21 +56,40 @@ class survey:
         self.unique_pages = pd.DataFrame()
         self.org_sect = pd.DataFrame()
         self.cleaned = pd.DataFrame()
+        self.stats = {}
+        self.transformer = transformer
+        self.low_memory = low_memory
+        self.trace_memory = trace_memory
+
+        # Each call to load, clean_raw, clean_urls, api_lookup, trainer and
+        # predictor appends a dict of metrics to self.metrics. See
+        # metrics_frame().
 
-        # TODO: LabelEncoder() is used both to convert categorical variables to 
-        # integer, and for converting the targets to integer classes. Only the
-        # latter is recorded to the class, the other encoders are ephemeral. These
-        # encoders need to be made available for calculating features in new data
-        # in future versions.
+        self.metrics = []
+        self.stage_metrics = None
 
-        self.target_encoder = LabelEncoder()
+        # The levels used to encode categorical variables as integers are
+        # recorded in self.stats['levels'], and the target classes in
+        # self.target_encoder. Use FeatureTransformer.from_survey() to save
+        # them for calculating features in new data.
+
+        if transformer is not None:
+            self.target_encoder = transformer.target_encoder()
+        else:
+            from sklearn.preprocessing import LabelEncoder
+            self.target_encoder = LabelEncoder()
 
+    @instrumented(rows_out='raw')
     def load(self, path):
         """
-        Load the data from csv file
+        Load the data from a csv, Parquet or Feather file
 
         An initial check is run to ensure that expect column names are present.
 
+        Parquet and Feather files (.parquet, .pq, .feather, .arrow) are
+        columnar, so only the columns in raw_mapping and codes are read from
+        them. Reading them requires pyarrow.
+
         :param path: <str> Path to the data file.
         """
 
@@ -56,57 +98,227 @@ class survey:
 
         try:
 
-            self.raw = pd.read_csv(path)
+            if self.low_memory or file_format(path) != 'csv':
+                usecols = self.is_mapped
+            else:
+                usecols = None
+
+            self.raw = self.tidy_raw(read_frame(path, usecols=usecols), path)
+
+        except FileNotFoundError:
+            self.logger.exception('Input file %s does not exist', path)
+            raise
+
+        except:
+            self.logger.error('Unexpected error loading raw data from file %s', path)
+            raise
+
+    def is_mapped(self, column):
+        """
+        Whether a raw column is used by clean_raw
 
-            # Strip whitespace from columns to save problems later!
-            # Remove no break whitespace first.
+        :param column: <str> Column name, as in the raw csv file.
+        """
 
-            self.raw.columns = [i.replace("\xa0", " ") for i in self.raw.columns]
-            self.raw.columns = self.raw.columns.str.strip()
+        column = column.replace("\xa0", " ").strip()
 
-            # Force UserID to be integer (to prevent the addition of decimal places)
+        return column in self.raw_mapping or column in self.codes
 
-            self.raw['UserID'] = self.raw['UserID'].astype('int')
+    def tidy_raw(self, raw, path):
+        """
+        Tidy the column names and UserIDs of raw data read from file
 
-            self.logger.info('Shape of %s: %s', path, self.raw.shape)
+        :param raw: <pd.DataFrame> Data as read from the data file.
+        :param path: <str> Path the data were read from (for logging).
+        """
 
-            self.raw.dropna(subset=['UserID'], inplace=True)
+        # Strip whitespace from columns to save problems later!
+        # Remove no break whitespace first.
 
-            self.logger.info('Shape of %s after dropping missing UserIDs: %s',
-                             path, self.raw.shape)
+        raw.columns = [i.replace("\xa0", " ") for i in raw.columns]
+        raw.columns = raw.columns.str.strip()
 
-            self.logger.debug('self.raw.dtypes:\n%s', self.raw.dtypes)
+        # Force UserID to be integer (to prevent the addition of decimal places)
 
-        except FileNotFoundError:
-            self.logger.exception('Input file %s does not exist', path)
-            raise
+        raw['UserID'] = raw['UserID'].astype('int')
+
+        self.logger.info('Shape of %s: %s', path, raw.shape)
+
+        raw.dropna(subset=['UserID'], inplace=True)
+
+        self.logger.info('Shape of %s after dropping missing UserIDs: %s',
+                         path, raw.shape)
+
+        self.logger.debug('self.raw.dtypes:\n%s', raw.dtypes)
+
+        return raw
+
+    def save(self, path, frame='cleaned'):
+        """
+        Save one of the survey dataframes to a csv, Parquet or Feather file
+
+        Parquet and Feather files keep category dtypes (e.g. from
+        low_memory mode), so the data can be read back without cleaning
+        them again. Use read_saved to read the file back with its index.
+
+        :param path: <str> Path to write to. The format is set by the
+        extension: .parquet, .pq, .feather, .arrow or .pkl, otherwise csv.
+        :param frame: <str> Name of the dataframe to save: one of 'raw',
+        'data', 'unique_pages', 'org_sect' or 'cleaned'.
+        """
+
+        self.logger.info('Saving self.%s to %s', frame, path)
+
+        if frame not in ('raw', 'data', 'unique_pages', 'org_sect', 'cleaned'):
+            raise ValueError('frame must be one of "raw", "data", '
+                             '"unique_pages", "org_sect" or "cleaned"')
+
+        try:
+            write_frame(getattr(self, frame), path)
 
         except:
-            self.logger.error('Unexpected error loading raw data from file %s', path)
+            self.logger.error('Unexpected error saving self.%s to %s', frame, path)
             raise
 
-
-    def clean_raw(self, date_format=None):
+    @instrumented('raw', 'data')
+    def clean_raw(self, date_format=None, stats=None, n_jobs=1):
         """
         Clean the raw dataframe
 
         Takes the self.raw object, and produces the self.data object
 
+        The statistics used to normalise time_delta and the comment length
+        features are recorded in self.stats. By default they are calculated
+        from self.raw, but they can be supplied (e.g. from survey.scan) so
+        that a subset of the data is normalised as the whole would be.
+
         :param date_format: Date format to be passed to the clean_date function
+        :param stats: <dict> Normalisation statistics, as in self.stats.
+        :param n_jobs: <int> Number of processes to clean the data with. The
+        rows of self.raw are split into n_jobs partitions, which are cleaned
+        by clean_rows in parallel. time_delta and the comment lengths are
+        then normalised over all of the rows, so the result is identical to
+        cleaning in a single process. -1 to use all CPUs.
         """
 
         self.logger.info('Running clean_raw method')
         self.logger.info('The cleaned data are stored in survey.data')
 
-        self.data = self.raw.copy()
+        if stats is None and self.transformer is not None:
+            stats = self.transformer.stats
+
+        if stats is None:
+            stats = {}
+
+        self.stats = {}
+
+        if n_jobs < 0:
+            n_jobs = os.cpu_count()
 
-        # Use mapping to rename and subset columns
+        n_jobs = max(1, min(n_jobs, len(self.raw)))
 
-        self.data.rename(columns=self.raw_mapping, inplace=True)
+        if n_jobs == 1:
+            self.data, all_null = self.clean_rows(self.raw, date_format, self.low_memory)
+
+        else:
+            self.logger.info('Cleaning %s partitions of survey.raw in parallel', n_jobs)
+
+            bounds = np.linspace(0, len(self.raw), n_jobs + 1).astype(int)
+            partitions = [self.raw.iloc[i:j] for i, j in zip(bounds[:-1], bounds[1:])]
+
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                cleaned = list(executor.map(self.clean_rows, partitions,
+                                            repeat(date_format), repeat(self.low_memory)))
+
+            self.data = concat_partitions([data for data, _ in cleaned])
+            all_null = {col: all(null[col] for _, null in cleaned) for col in cleaned[0][1]}
+
+        self.normalise_rows(all_null, stats)
+
+        self.logger.debug('\n%s', self.data.columns)
+
+        if self.low_memory:
+            self.downcast()
+            self.raw = pd.DataFrame()
+            self.logger.info('Released survey.raw (low_memory mode)')
+
+    def normalise_rows(self, all_null, stats):
+        """
+        The steps of clean_raw that depend on all of the rows
+
+        Normalises time_delta and the comment lengths in self.data, as
+        returned by clean_rows, recording the statistics in self.stats, and
+        zeros the features of comments that are entirely null.
+
+        :param all_null: <dict> Whether each comment feature is entirely null.
+        :param stats: <dict> Normalisation statistics to use rather than
+        calculating them from self.data, as in self.stats.
+        """
+
+        # Normalise time_delta over all of the rows
+
+        self.stats['time_delta'] = stats.get('time_delta') or moments(self.data['time_delta'])
+        self.data['time_delta'] = normalise(self.data['time_delta'], self.stats['time_delta'])
+
+        if not self.low_memory:
+            self.data['time_delta'] = clean_category(self.data['time_delta'])
+
+        self.logger.info('Added date feature: time_delta')
+        self.logger.debug("Head of data['time_delta']: %s", self.data['time_delta'].head())
+
+        # Record the length statistics of comments, including whether they are
+        # all null, unless they have been supplied, and normalise the lengths.
+
+        for col, null in all_null.items():
+
+            lengths = self.data[col + '_len']
+            self.stats[col + '_len'] = (stats.get(col + '_len') or
+                                        length_stats(lengths, null))
+
+            # If the column is all null, just return zeros.
+
+            if self.stats[col + '_len']['all_null']:
+                self.data[col + '_capsratio'] = 0
+                self.data[col + '_nexcl'] = 0
+                self.data[col + '_len'] = 0
+                self.data[col] = 'none'
+
+            else:
+                self.data[col + '_len'] = scale_lengths(lengths, self.stats[col + '_len'])
+                self.logger.info('Added string features to %s', col)
+
+    @classmethod
+    def clean_rows(cls, raw, date_format=None, low_memory=False):
+        """
+        The steps of clean_raw that are applied to each row independently
+
+        Renames and subsets the columns, parses dates, and cleans the
+        categorical and comment features. time_delta and the comment
+        lengths (col + '_len') are returned before normalisation, which
+        depends on all of the rows.
+
+        :param raw: <pd.DataFrame> Rows of raw data, as in self.raw.
+        :param date_format: Date format to be passed to the clean_date function
+        :param low_memory: <bool> Rename without copying, and do not clean
+        the numeric features as categories.
+        :return: <tuple> Cleaned data, and a dict of whether each comment
+        feature is entirely null.
+        """
+
+        logger = logging.getLogger('classifyintents')
+
+        # Use mapping to rename and subset columns. In low_memory mode, raw
+        # is released at the end, so there is no need to copy it.
+
+        if low_memory:
+            data = raw.rename(columns=cls.raw_mapping, copy=False)
+        else:
+            data = raw.copy()
+            data.rename(columns=cls.raw_mapping, inplace=True)
 
         # Subset columns mentioned in mapping dict
 
-        cols = list(self.raw_mapping.values())
+        cols = list(cls.raw_mapping.values())
 
         # Strip down only to the columns listed in raw.mapping - append target here
         # as it should always now be present in the data. Also include the
@@ -115,67 +327,73 @@ class survey:
         cols.extend(['target'])
 
         # NOTE: the 'comment_other_where_for_help' column is no longer contained
-        # in smartsurvey data, but is a required feature for the older models.
+        # in smartsurvey data, but is a required feature for the older models.
         # Add it in here while there is a reliance on the older models, but in
         # future it can be happily removed.
 
-        self.data['comment_other_where_for_help'] = np.nan
-
-        self.data['comment_other_found_what'] = extract_other(self.data['cat_found_looking_for'])
-        self.data['comment_other_else_help'] = extract_other(self.data['cat_anywhere_else_help'])
+        data['comment_other_where_for_help'] = np.nan
 
-        self.data['cat_found_looking_for'] = rewrite_other(self.data['cat_found_looking_for'])
-        self.data['cat_anywhere_else_help'] = rewrite_other(self.data['cat_anywhere_else_help'])
+        (data['cat_found_looking_for'],
+         data['comment_other_found_what']) = split_other(data['cat_found_looking_for'])
+        (data['cat_anywhere_else_help'],
+         data['comment_other_else_help']) = split_other(data['cat_anywhere_else_help'])
 
         # Check output of the _other functions
 
-        self.logger.debug('values of cat_anywhere_else_help:\n%s',
-                          self.data['cat_anywhere_else_help'].value_counts())
-        self.logger.debug('head of comment_other_else_help '
-                          '(extracted from cat_anywhere_else_help:\n%s',
-                          self.data['comment_other_else_help'].head())
+        logger.debug('values of cat_anywhere_else_help:\n%s',
+                     data['cat_anywhere_else_help'].value_counts())
+        logger.debug('head of comment_other_else_help '
+                     '(extracted from cat_anywhere_else_help:\n%s',
+                     data['comment_other_else_help'].head())
 
-        self.logger.debug('values of cat_other_found_what:\n%s',
-                          self.data['cat_found_looking_for'].value_counts())
-        self.logger.debug('head of comment_other_found_what '
-                          '(extracted from cat_other_found_what):\n%s',
-                          self.data['comment_other_found_what'].head())
+        logger.debug('values of cat_other_found_what:\n%s',
+                     data['cat_found_looking_for'].value_counts())
+        logger.debug('head of comment_other_found_what '
+                     '(extracted from cat_other_found_what):\n%s',
+                     data['comment_other_found_what'].head())
 
         # Check here: if target is not in the raw data, i.e. we are predicting, not
         # training, then add the column to the dataframe.
 
-        if 'target' not in self.data.columns.tolist():
-            self.data['target'] = str()
+        if 'target' not in data.columns.tolist():
+            data['target'] = str()
 
-        self.data = self.data[cols]
+        data = data[cols]
 
         # Arrange date features
 
-        self.data['start_date'] = clean_date(self.data['start_date'], date_format)
-        self.data['end_date'] = clean_date(self.data['end_date'], date_format)
+        data['start_date'] = clean_date(data['start_date'], date_format)
+        data['end_date'] = clean_date(data['end_date'], date_format)
 
-        self.logger.info('Added date features: start_date and end_date')
-        self.logger.debug("Head of data['start_date']:\n%s", self.data['start_date'].head())
-        self.logger.debug("Head of data['end_date']:\n%s", self.data['start_date'].head())
-        # Create time delta and normalise
+        logger.info('Added date features: start_date and end_date')
+        logger.debug("Head of data['start_date']:\n%s", data['start_date'].head())
+        logger.debug("Head of data['end_date']:\n%s", data['start_date'].head())
 
-        self.data['time_delta'] = time_delta(self.data['end_date'], self.data['start_date'])
-        self.data['time_delta'] = normalise(self.data['time_delta'])
-        self.logger.info('Added date feature: time_delta')
-        self.logger.debug("Head of data['time_delta']: %s", self.data['time_delta'].head())
+        # Create time delta, which is normalised by clean_raw
+
+        data['time_delta'] = time_delta(data['end_date'], data['start_date'])
 
         # Combine new date features with existing features.
         # Prepare org and section features for population from API lookup.
 
-        self.data = pd.concat([
+        data = pd.concat([
             pd.DataFrame(columns=['org', 'section']),
-            date_features(self.data['start_date']),
-            self.data], axis=1)
+            date_features(data['start_date']),
+            data], axis=1)
+
+        all_null = {}
 
         # Create features on column names
 
         try:
-            for col in self.data:
+            for col in data:
+
+                # Numeric features are downcast by clean_raw in low_memory
+                # mode, rather than cleaned as categories. time_delta is
+                # cleaned once it has been normalised.
+
+                if col == 'time_delta' or (low_memory and col in cls.numeric):
+                    continue
 
                 # Start by cleaning the categorical variables
 
@@ -184,39 +402,52 @@ class survey:
                 # NaN or None would result in these rows being dropped from the
                 # data. That it is empty is an importat feature in itself.
 
-                all_null = self.data[col].isnull().sum() == len(self.data[col])
+                if 'comment' in col:
+                    all_null[col] = bool(data[col].isnull().sum() == len(data[col]))
+
+                data[col] = clean_category(data[col])
 
-                self.data[col] = clean_category(self.data[col])
                 # Now clean the comment variables
 
-                if 'comment' in col and not all_null:
-                    self.data[col + '_capsratio'] = [string_capsratio(x) for x in self.data[col]]
-                    self.data[col + '_nexcl'] = [string_nexcl(x) for x in self.data[col]]
-                    self.logger.debug('self.data[%s]:\n%s', col, self.data[col].dtype)
+                if 'comment' in col:
+                    features = comment_features(data[col])
 
-                    self.data[col + '_len'] = string_len(self.data[col])
-                    self.data[col] = clean_comment(self.data[col])
+                    data[col + '_capsratio'] = features['capsratio']
+                    data[col + '_nexcl'] = features['nexcl']
+                    data[col + '_len'] = features['len']
+                    data[col] = features['comment']
 
-                    # Some issues with the string_len function exposed here in debug
-                    
-                    self.logger.info('Added string features to %s', col)
-                    self.logger.debug('head of %s column: \n%s',
-                                      col + '_capsratio', self.data[col + '_capsratio'].head())
+                    logger.debug('head of %s column: \n%s',
+                                 col + '_capsratio', data[col + '_capsratio'].head())
 
-                # If the column is all null, just return zeros.
+        except:
+            logger.error('Error cleaning %s column', col)
+            raise
 
-                elif 'comment' in col and all_null:
-                    self.data[col + '_capsratio'] = 0
-                    self.data[col + '_nexcl'] = 0
-                    self.data[col + '_len'] = 0
-                    self.data[col] = 'none'
+        return data, all_null
 
-            self.logger.debug('\n%s', self.data.columns)
+    def downcast(self):
+        """
+        Reduce the memory used by self.data
 
-        except:
-            self.logger.error('Error cleaning %s column', col)
-            raise
+        Date features are stored as int16 (or float32 if they contain NaN),
+        time_delta and the comment ratio features as float32, and full_url
+        and the cleaned comments as categories.
+        """
+
+        for col in self.dates:
+            self.data[col] = downcast_integer(self.data[col])
+
+        ratios = [col + suffix for col in self.comments
+                  for suffix in ['_len', '_nexcl', '_capsratio']]
 
+        for col in ['time_delta'] + ratios:
+            self.data[col] = self.data[col].astype('float32')
+
+        for col in ['full_url'] + self.comments:
+            self.data[col] = self.data[col].astype('category')
+
+    @instrumented('data', 'data')
     def clean_urls(self):
         """
         Extract additional features from the gov.uk content API
@@ -235,11 +466,8 @@ class survey:
 
         # NOTE: The logic for this section was provided as expert knowledge
         # from a performance analyst familiar with the process. It may need
-        # updating in the future as the content API develops.
-
-        # Set regex query to be used in the reg_match function later.
-
-        query = r'\/?browse'
+        # updating in the future as the content API develops. The rules
+        # themselves are applied once to each distinct url by url_rules().
 
         # Add a blank page column
 
@@ -249,49 +477,12 @@ class survey:
 
             if 'full_url' in list(self.data.columns):
 
-                for index, row in self.data.iterrows():
-
-                    # Deal with cases of no address
-
-                    if ((row['full_url'] == '/') | (row['full_url'] == np.nan)
-                            | (str(row['full_url']) == 'nan')):
-
-                        continue
-
-                    # If FCO government/world/country page:
-                    # Strip back to /government/world and
-                    # set org to FCO
-
-                    elif re.search('/government/world', str(row['full_url'])):
-
-                        self.data.loc[index, ['org', 'page']] = ['Foreign & Commonwealth Office',
-                                                                 '/government/world']
-
-                    # If full_url starts with /guidance or /government:
-                    # and there is no org (i.e. not the above)
-                    # Set page to equal full_url
-
-                    elif re.search(r'\/guidance|\/government', str(row['full_url'])):
-                        if row['org'] == 'nan':
-                            self.data.loc[index, 'page'] = row['full_url']
-
-                    # If page starts with browse:
-                    # set page to equal /browse/xxx/
-
-                    elif re.search(r'\/browse', str(row['full_url'])):
-                        self.data.loc[index, 'page'] = reg_match(query, row['full_url'], 1)
-
-                    # If the section is also empty:
-                    # Set section to be /browse/--this-bit--/
-
-                        if row['section'] == 'nan':
-                            self.data.loc[index, 'section'] = reg_match(query, row['full_url'], 2)
+                rules = url_rules(self.data['full_url'], self.data['org'],
+                                  self.data['section'])
 
-                    # Otherwise:
-                    # Strip back to the top level
-
-                    else:
-                        self.data.loc[index, 'page'] = '/' + reg_match('.*', row['full_url'], 0)
+                self.data['page'] = rules['page']
+                self.data['org'] = rules['org']
+                self.data['section'] = rules['section']
 
         except KeyError:
             self.logger.error("'full_url' column not contained in survey.data object. "
@@ -315,10 +506,37 @@ class survey:
                          'These are stored in survey.unique_pages.',
                          str(len(self.unique_pages['page'])))
 
+        if self.low_memory:
+            for col in ['page', 'org', 'section']:
+                self.data[col] = self.data[col].astype('category')
+
 
-    def api_lookup(self, wait=0.1):
+    @instrumented('data', 'data')
+    def api_lookup(self, wait=0.1, concurrency=4, batch_size=1, client=None,
+                   cache=None, index=None, resolver=None, checkpoint=None):
         """
         Perform a lookup using the GOV.UK content API
+
+        :param wait: <float> Minimum interval between requests in seconds.
+        This is enforced across all concurrent requests. 0 for no limit.
+        :param concurrency: <int> Number of requests to make at once.
+        :param batch_size: <int> Number of pages to look up in each request.
+        :param client: <ContentAPIClient> Client to perform the lookup with.
+        If given, wait, concurrency and batch_size are ignored.
+        :param cache: <LookupCache> Cache of previous lookups. Only pages
+        missing from the cache are sent to the API, and their results are
+        added to the cache.
+        :param index: <SnapshotIndex> Offline index of a search API dump.
+        Pages missing from the cache are resolved against the index, and
+        only those missing from both are sent to the API.
+        :param resolver: <AncestorResolver> Resolver to infer the org and
+        section of pages without either from their nearest ancestor with
+        one. Ancestors are looked up as pages are, through the cache, index
+        and API.
+        :param checkpoint: <LookupCheckpoint> Checkpoint to save the results
+        of the API to as each batch of checkpoint.batch_size pages
+        completes. Pages saved by an interrupted run are not looked up
+        again. The checkpoint is removed once the lookup completes.
         """
         # NOTE: Future versions could use github.com/ukgovdatascience/govukurllookup
 
@@ -329,38 +547,108 @@ class survey:
         self.logger.info('Running api_lookup() method')
         self.logger.info('Looking up %s urls', self.unique_pages.shape[0])
 
+        # NOTE: The rate limit replaces a fixed wait after each request, to
+        # slow the barrage of requests to the content API.
+
+        if client is None:
+            client = ContentAPIClient(concurrency=concurrency,
+                                      rate=1 / wait if wait else None,
+                                      batch_size=batch_size)
+
+        hits = {'cache_hits': 0, 'index_hits': 0, 'resumed': 0}
+        checkpointed = checkpoint.load() if checkpoint is not None else {}
+
+        def fetch(pages):
+            """
+            Look up pages in the cache, then the index, then the API
+            """
+
+            cached = cache.get_many(pages) if cache is not None else {}
+            misses = [page for page in pages if page not in cached]
+
+            if cache is not None:
+                self.logger.info('%s urls found in cache, looking up %s',
+                                 len(pages) - len(misses), len(misses))
+
+            indexed = index.resolve_many(misses) if index is not None else {}
+
+            if index is not None:
+                misses = [page for page in misses if page not in indexed]
+
+                self.logger.info('%s urls resolved from snapshot index, looking up %s',
+                                 len(indexed), len(misses))
+
+            if checkpoint is None:
+                found = dict(zip(misses, client.get_orgs(misses)))
+
+            else:
+                found = {page: checkpointed[page] for page in misses if page in checkpointed}
+                misses = [page for page in misses if page not in found]
+                hits['resumed'] += len(found)
+
+                # The client updates a single progress for all of the batches
+
+                progress = Progress(len(misses), 'pages looked up and checkpointed')
+
+                for i in range(0, len(misses), checkpoint.batch_size):
+                    batch = misses[i:i + checkpoint.batch_size]
+                    rows = dict(zip(batch, client.get_orgs(batch, progress=progress)))
+
+                    checkpoint.save(rows)
+                    found.update(rows)
+
+            if cache is not None:
+                cache.set_many(found)
+
+            hits['cache_hits'] += len(cached)
+            hits['index_hits'] += len(indexed)
+
+            found.update(cached)
+            found.update(indexed)
+
+            return found
+
         # Only run the lookup on cases where we have not already set an org and section
 
-        org_sect = []
-        for i, page in enumerate(self.unique_pages['page']):
+        pages = self.unique_pages['page'].tolist()
+        start = client.request_counts() if hasattr(client, 'request_counts') else None
+        found = fetch(pages)
 
-            total = self.unique_pages.shape[0]
+        if resolver is not None:
+            lookups = resolver.lookups
+            inferred = resolver.resolve(found, fetch)
+            found.update(inferred)
 
-            if i % 50 == 0:
+            self.stage_metrics.update({'inferred': len(inferred),
+                                       'ancestor_lookups': resolver.lookups - lookups})
+            resolver.log_stats()
 
-                self.logger.info('Looking up page %s/%s', i, total)
+        # Hits include those of ancestors looked up by the resolver
 
-            response = get_org(page)
-            org_sect.append(response)
+        self.stage_metrics.update({'pages': len(pages), 'cache_hits': hits['cache_hits'],
+                                   'index_hits': hits['index_hits']})
 
-            # NOTE: Add a wait here to slow barrage of requests to content API.
+        if checkpoint is not None:
+            self.stage_metrics['resumed'] = hits['resumed']
 
-            time.sleep(wait)
+        if start is not None:
+            self.stage_metrics.update(client.request_stats(start))
 
-        self.logger.debug('First five entries of org_sect list:\n%s', org_sect[0:5])
+        if index is not None:
+            index.log_stats()
 
-        # This is all a bit messy from the origin function.
-        # Would be good to clean this up at some point.
+        if cache is not None:
+            cache.log_stats()
 
-        column_names = ['organisation0', 'organisation1', 'organisation2',
-                        'organisation3', 'organisation4', 'section0', 'section1',
-                        'section2', 'section3']
+        org_sect = [found[page] for page in pages]
+
+        self.logger.debug('First five entries of org_sect list:\n%s', org_sect[0:5])
 
-        self.org_sect = pd.DataFrame(org_sect, columns=column_names)
+        self.org_sect = pd.DataFrame(org_sect, columns=ORG_SECT_COLUMNS)
         self.org_sect = self.org_sect.set_index(self.unique_pages.index)
 
         self.logger.info('Finished API lookup')
-        self.logger.info('org_sect shape: %s: self.org_sect.shape')
+        self.logger.info('org_sect shape: %s', self.org_sect.shape)
 
         # Convert any NaNs to none, so they are not dropped when
         # self.trainer/predictor is run
@@ -380,23 +668,43 @@ class survey:
         self.logger.info('Lookup complete, merging results back into survey.data')
         self.logger.debug('unique_pages.head:\n%s', self.unique_pages.head())
 
-        self.data = pd.merge(right=self.data.drop(['org', 'section'], axis=1),
-                             left=self.unique_pages, on='page', how='outer',
-                             indicator=True)
+        # Attach the org and section of each row's page through the index of
+        # the looked up pages, keeping the rows of survey.data in order. Rows
+        # whose page was not looked up (e.g. their org or section was set by
+        # the url rules) are given NaN, and so are dropped by trainer and
+        # predictor.
+
+        page_index = self.unique_pages.drop_duplicates(subset='page').set_index('page')
+        row_pages = self.data['page']
+
+        if row_pages.dtype.name == 'category':
+            indexer = np.append(page_index.index.get_indexer(row_pages.cat.categories), -1)
+            indexer = indexer[np.asarray(row_pages.cat.codes)]
+        else:
+            indexer = page_index.index.get_indexer(row_pages)
 
-        self.logger.info('Merged data shape is:\n%s', self.data.shape)
-        self.logger.debug('Merged data head is:\n%s', self.data.head())
-        self.logger.debug('Merged data columns is:\n%s', self.data.columns)
-        self.logger.debug('data merge success:\n%s', self.data['_merge'].value_counts())
-        self.logger.debug('Top five right_only:\n%s',
-                          self.data[self.data['_merge'] == 'right_only'][0:5])
+        for col in ['org', 'section']:
+            values = np.append(np.asarray(page_index[col], dtype='object'), np.nan)
+            self.data[col] = values[indexer]
 
-        self.logger.info('Shape before dropping duplicates:\n%s', self.data.shape)
-        self.data.drop_duplicates(subset=['respondent_id'], inplace=True)
-        self.logger.info('Shape after dropping duplicates:\n%s', self.data.shape)
+        matched = int((indexer >= 0).sum())
+        self.stage_metrics['matched_rows'] = matched
+
+        self.logger.info('Matched %s of %s rows of survey.data to a looked up page',
+                         matched, len(self.data))
+        self.logger.debug('Top five unmatched pages:\n%s',
+                          row_pages[indexer < 0].value_counts(dropna=False).head())
+
+        if self.low_memory:
+            for col in ['page', 'org', 'section']:
+                self.data[col] = self.data[col].astype('category')
+
+        if checkpoint is not None:
+            checkpoint.remove()
 
     # Define target to encode to true (defualt to ok)
 
+    @instrumented('data', 'cleaned')
     def trainer(self, classes=None):
         """
         Prepare the data for training
@@ -408,7 +716,6 @@ class survey:
             classes = ['ok']
 
         try:
-            self.cleaned = self.data.copy()
             self.cleaned = self.data[self.selection + self.codes]
             self.cleaned = self.cleaned.dropna(how='any')
 
@@ -420,14 +727,9 @@ class survey:
             # is not a problem, but in time it may be necessary to readress
             # this.
 
-            # LabelEncoder converts labels into numeric codes for all of the factors.
-
-            for col in self.categories:
+            # Convert labels into numeric codes for all of the factors.
 
-                encoder = LabelEncoder()
-                encoder.fit(self.cleaned[col]) 
-
-                self.cleaned.loc[:, col] = encoder.transform(self.cleaned.loc[:, col])
+            self.encode()
 
             # Convert targets to integer classes
 
@@ -456,9 +758,17 @@ class survey:
             self.logger.error('Error while running trainer method')
             raise
 
-    def predictor(self):
+    @instrumented('data', 'cleaned')
+    def predictor(self, levels=None):
         """
         Prepare data for prediction using a pre-trained model
+
+        The levels each category is encoded with are recorded in
+        self.stats['levels'].
+
+        :param levels: <dict> Levels to encode each of self.categories with,
+        as in self.stats['levels']. By default they are taken from
+        self.transformer if there is one, otherwise from the data.
         """
 
         self.logger.info('Running predictor method')
@@ -467,30 +777,23 @@ class survey:
 
             self.logger.debug(self.data.columns)
 
-            self.cleaned = self.data.copy()
             self.cleaned = self.data[self.selection]
 
             self.logger.info('Dropping any remaining NAs')
             self.logger.info('cleaned shape before dropping:\n%s',
                              self.cleaned.shape)
             self.logger.debug('Columns containing NAs:\n%s',
-                              self.cleaned.loc[0:10, self.cleaned.isnull().any()])
+                              self.cleaned.loc[:, self.cleaned.isnull().any()].head(10))
             self.logger.debug('cleaned.dtype:\n%s', self.cleaned.dtypes)
 
             self.cleaned = self.cleaned.dropna(how='any')
 
             self.logger.info('cleaned shape after dropping: %s', self.cleaned.shape)
 
-            for col in self.categories:
+            if levels is None and self.transformer is not None:
+                levels = self.transformer.levels
 
-                encoder = LabelEncoder()
-                encoder.fit(self.cleaned[col])
-
-                self.logger.debug('%s converted to the following integers:\n%s',
-                                  col, dict(zip(encoder.transform(self.cleaned[col]),
-                                                self.cleaned[col])))
-
-                self.cleaned.loc[:, col] = encoder.transform(self.cleaned.loc[:, col])
+            self.encode(levels)
 
             self.logger.info('Dropping respondent_id from cleaned')
 
@@ -508,6 +811,326 @@ class survey:
             self.logger.error('There was an error running the predictor method')
             raise
 
+    def encode(self, levels=None):
+        """
+        Convert the categorical variables in self.cleaned to integer codes
+
+        Codes are the position of each value in the sorted levels of the
+        variable (as LabelEncoder would produce). Values that are not in
+        the given levels are coded as -1. The levels used are recorded in
+        self.stats['levels'].
+
+        :param levels: <dict> Levels for each of self.categories. By default
+        they are taken from the data.
+        """
+
+        self.stats['levels'] = {}
+
+        for col in self.categories:
+
+            codes, self.stats['levels'][col] = encode_category(
+                self.cleaned[col], levels[col] if levels else None)
+
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug('%s converted to the following integers:\n%s',
+                                  col, dict(zip(codes, self.cleaned[col])))
+
+            unseen = (codes == -1).sum()
+
+            if unseen:
+                self.logger.warning('%s values of %s were not in the levels '
+                                    'provided, and are coded as -1', unseen, col)
+
+            self.cleaned[col] = codes
+
+    def feature_matrix(self, sparse=False, one_hot=None, dtype='float32'):
+        """
+        The features in self.cleaned as a compact matrix for a model
+
+        Run after trainer or predictor. The target (if present) is left out,
+        and is still available as self.cleaned['target'].
+
+        One hot encoded categories are built directly from their integer
+        codes, so no dense dummy columns are created: each row has a 1 in
+        the column of its level, and no 1 if its code is -1 (not in the
+        levels).
+
+        :param sparse: <bool> Return a scipy.sparse CSR matrix rather than a
+        dense np.array.
+        :param one_hot: <list> Categories to one hot encode, with one column
+        per level in self.stats['levels']. Defaults to all of
+        self.categories if sparse, otherwise none, so that a dense matrix
+        holds the integer codes.
+        :param dtype: <str> dtype of the matrix.
+        :return: <tuple> The matrix, and a list of the name of each column.
+        Numeric features keep their column names, and one hot columns are
+        named col_level.
+        """
+
+        self.logger.info('Building feature matrix from survey.cleaned')
+
+        import scipy.sparse
+
+        if one_hot is None:
+            one_hot = self.categories if sparse else []
+
+        try:
+            blocks = []
+            names = []
+            numeric = [col for col in self.cleaned if col != 'target' and col not in one_hot]
+
+            if numeric:
+                values = np.column_stack([numeric_values(self.cleaned[col], dtype)
+                                          for col in numeric])
+                blocks.append(scipy.sparse.csr_matrix(values) if sparse else values)
+                names.extend(numeric)
+
+            for col in one_hot:
+                levels = self.stats['levels'][col]
+                blocks.append(one_hot_codes(self.cleaned[col], len(levels), dtype, sparse))
+                names.extend('%s_%s' % (col, level) for level in levels)
+
+            if sparse:
+                matrix = scipy.sparse.hstack(blocks, format='csr', dtype=dtype)
+            else:
+                matrix = np.hstack(blocks).astype(dtype, copy=False)
+
+        except Exception:
+            self.logger.error('There was an error building the feature matrix')
+            raise
+
+        self.logger.info('Feature matrix shape: %s', matrix.shape)
+
+        return matrix, names
+
+    def metrics_frame(self):
+        """
+        The metrics recorded for each stage of the pipeline as a DataFrame
+
+        One row per call of load, clean_raw, clean_urls, api_lookup, trainer
+        or predictor, in the order they were run. The columns are:
+
+        * stage: name of the method.
+        * seconds: wall time.
+        * rows_in, rows_out: rows in the dataframe read and written.
+        * rss_delta_mb: change in resident set size of the process, if it
+          can be read.
+        * peak_mb: peak memory allocated, if trace_memory is set.
+        * failed: whether the method raised an exception.
+        * chunk: chunk number, for stages run by scan or stream.
+
+        api_lookup also records the number of unique pages, cache_hits and
+        index_hits, the number of pages resumed from a checkpoint, the
+        number of pages inferred and ancestor_lookups made by a resolver,
+        the number of matched_rows of survey.data, and, for a
+        ContentAPIClient, the number of requests made, errors and the 50th,
+        90th and 99th percentile request latency in seconds.
+        """
+
+        return pd.DataFrame(self.metrics)
+
+    def scan(self, path, chunksize=10000, date_format=None, lookup=None):
+        """
+        Calculate the statistics needed to stream a data file
+
+        Runs the pipeline over the file in chunks, and combines the
+        normalisation statistics and category levels of each chunk into
+        those that would be calculated from the whole file. The result is
+        stored in self.stats, and can be reused for later calls to stream.
+
+        :param path: <str> Path to the data file.
+        :param chunksize: <int> Number of rows to read at a time.
+        :param date_format: Date format to be passed to clean_raw.
+        :param lookup: <dict> Keyword arguments for api_lookup. If None,
+        api_lookup is not run. Pass a cache to avoid looking pages up twice
+        when scan is followed by stream.
+        """
+
+        self.logger.info('Running scan method')
+
+        stats = None
+
+        for chunk in self.run_chunks(path, chunksize, date_format, lookup):
+            stats = chunk.stats if stats is None else merge_stats(stats, chunk.stats)
+
+        self.stats = stats
+
+        return stats
+
+    def stream(self, path, chunksize=10000, stats=None, date_format=None,
+               lookup=None):
+        """
+        Prepare data for prediction from a data file, one chunk at a time
+
+        Each chunk is run through clean_raw, clean_urls, (optionally)
+        api_lookup and predictor, and the output of predictor is yielded.
+        Only one chunk is held in memory at a time. Normalisation
+        statistics and category levels are taken from stats, so that the
+        chunks match the output of running the whole file at once. If
+        stats are not given, they are calculated by scan in a first pass.
+
+        :param path: <str> Path to the data file.
+        :param chunksize: <int> Number of rows to read at a time.
+        :param stats: <dict> Statistics from scan.
+        :param date_format: Date format to be passed to clean_raw.
+        :param lookup: <dict> Keyword arguments for api_lookup. If None,
+        api_lookup is not run.
+        :return: <generator> Chunks of cleaned data, as in self.cleaned.
+        """
+
+        self.logger.info('Running stream method')
+
+        if stats is None:
+            stats = self.scan(path, chunksize, date_format, lookup)
+
+        self.stats = stats
+
+        for chunk in self.run_chunks(path, chunksize, date_format, lookup, stats):
+            yield chunk.cleaned
+
+    def stream_to_csv(self, path, output, **kwargs):
+        """
+        Stream a csv file through the pipeline, writing chunks to a csv file
+
+        :param path: <str> Path to the data file.
+        :param output: <str> Path to write the cleaned data to.
+        :param kwargs: Passed to stream.
+        """
+
+        for i, cleaned in enumerate(self.stream(path, **kwargs)):
+            cleaned.to_csv(output, mode='a' if i else 'w', header=not i)
+
+    def run_chunks(self, path, chunksize, date_format=None, lookup=None,
+                   stats=None):
+        """
+        Run the pipeline over a csv or Parquet file in chunks
+
+        :return: <generator> A survey object for each chunk, after predictor.
+        """
+
+        if self.low_memory or file_format(path) != 'csv':
+            usecols = self.is_mapped
+        else:
+            usecols = None
+
+        try:
+            for i, raw in enumerate(read_chunks(path, chunksize, usecols=usecols)):
+
+                chunk = type(self)(self.transformer, self.low_memory,
+                                   self.trace_memory)
+                chunk.raw = chunk.tidy_raw(raw, path)
+                chunk.clean_raw(date_format, stats)
+                chunk.clean_urls()
+
+                if lookup is not None:
+                    chunk.api_lookup(**lookup)
+
+                chunk.predictor(stats['levels'] if stats else None)
+
+                self.metrics.extend(dict(metrics, chunk=i) for metrics in chunk.metrics)
+
+                yield chunk
+
+        except FileNotFoundError:
+            self.logger.exception('Input file %s does not exist', path)
+            raise
+
+    def update(self, path, state, date_format=None, lookup=None, refresh=False):
+        """
+        Process only the responses in a cumulative export that are new
+
+        Responses whose UserID is already in state are dropped once the
+        export is loaded, and only the new rows are run through clean_rows,
+        clean_urls, (optionally) api_lookup and predictor. Their rows of
+        self.cleaned are appended to the cleaned rows kept in state, which
+        is saved, so the time taken by each run scales with the number of
+        new responses.
+
+        time_delta and the comment lengths of the new rows are normalised
+        with the running statistics of every response processed so far,
+        which are kept in state and combined with those of the new rows by
+        merge_stats. The categories are encoded with the levels of the
+        first run. Rows processed by earlier runs are not normalised or
+        encoded again, so unless a transformer is given (fixing both), the
+        rows kept in state differ from processing the whole export at once.
+        Pass refresh to process every response in the export again, which
+        matches it exactly.
+
+        self.raw, self.data and self.cleaned hold the new responses only.
+        Use state.cleaned() for every response processed so far.
+
+        :param path: <str> Path to the cumulative export.
+        :param state: <IncrementalState> State of previous runs, or the
+        directory to keep it in.
+        :param date_format: Date format to be passed to clean_raw.
+        :param lookup: <dict> Keyword arguments for api_lookup. If None,
+        api_lookup is not run. This should be the same on every run with
+        the same state. Pass a cache so that pages looked up by earlier runs
+        are not looked up again.
+        :param refresh: <bool> Forget the responses in state, and process
+        every response in the export, with statistics and levels calculated
+        from all of them.
+        :return: <int> Number of new responses.
+        """
+
+        self.logger.info('Running update method')
+
+        if not isinstance(state, IncrementalState):
+            state = IncrementalState(state)
+
+        if refresh:
+            self.logger.info('Refreshing the state in %s', state.path)
+            state.clear()
+
+        self.load(path)
+
+        new = ~self.raw['UserID'].isin(state.ids)
+        n_new = int(new.sum())
+
+        self.logger.info('%s of %s responses in %s are new', n_new, len(self.raw), path)
+
+        self.raw = self.raw[new]
+
+        if not n_new:
+            return n_new
+
+        ids = self.raw['UserID']
+        self.data, all_null = self.clean_rows(self.raw, date_format, self.low_memory)
+
+        # Combine the statistics of the new rows with the running statistics
+
+        stats = {'time_delta': moments(self.data['time_delta'])}
+        stats.update({col + '_len': length_stats(self.data[col + '_len'], null)
+                      for col, null in all_null.items()})
+        state.stats = merge_stats(state.stats, stats)
+
+        if self.transformer is not None:
+            stats, levels = self.transformer.stats, self.transformer.levels
+        else:
+            stats, levels = state.stats, state.levels
+
+        self.stats = {}
+        self.normalise_rows(all_null, stats)
+
+        if self.low_memory:
+            self.downcast()
+            self.raw = pd.DataFrame()
+
+        self.clean_urls()
+
+        if lookup is not None:
+            self.api_lookup(**lookup)
+
+        self.predictor(levels)
+
+        state.levels = state.levels or self.stats['levels']
+        state.append(self.cleaned, ids)
+        state.runs.append({'path': str(path), 'new': n_new, 'total': len(state),
+                           'refresh': refresh, 'date': pd.Timestamp.now().isoformat()})
+        state.save()
+
+        return n_new
+
     raw_mapping = {
         'UserID':'respondent_id',
         'Started':'start_date',
@@ -543,6 +1166,12 @@ class survey:
         'target'
     ]
 
+    dates = [
+        'weekday', 'day', 'week', 'month', 'year'
+    ]
+
+    numeric = dates + ['time_delta']
+
     code_levels = [
         'ok', 'finding-general', 'service-problem', 'contact-government',
         'check-status', 'change-details', 'govuk-specific', 'compliment',
@@ -555,9 +1184,9 @@ class survey:
                  [(x + '_nexcl') for x in comments] + [(x + '_capsratio') for x in comments])
 
 
-def string_len(feature):
+def string_lengths(feature):
     """
-     Calculate feature length of comment features
+    Calculate length of comment features, before normalisation
 
     :param feature: <pd.Series> Comment feature.
     """
@@ -568,31 +1197,152 @@ def string_len(feature):
 
         feature = feature.replace(r'\,\s?\,?$|none\,', 'none', regex=True)
         feature = feature.str.strip()
-        
+
         # Convert NaN to 'a'. Then when counted this will
         # be a 1. Whilst not 0, any entry with 1 is virtually
         # meaningless, so 1 is a proxy for 0.
 
-        feature = pd.Series([len(y) for y in feature.fillna('a')])
+        lengths = pd.Series([len(y) for y in feature.fillna('a')], index=feature.index)
+
+    except Exception:
+        print('There was an error converting feature to string length column')
+        raise
+    return lengths
+
+def length_stats(lengths, all_null=False):
+    """
+    Statistics used to normalise the lengths of a comment feature
+
+    :param lengths: <pd.Series> Output of string_lengths.
+    :param all_null: <bool> Whether the comment feature is entirely null.
+    """
+
+    return {'n': int(len(lengths)), 'mean': float(lengths.mean()),
+            'min': int(lengths.min()), 'max': int(lengths.max()),
+            'all_null': bool(all_null)}
+
+def scale_lengths(lengths, stats):
+    """
+    Normalise comment lengths using statistics from length_stats
+
+    :param lengths: <pd.Series> Output of string_lengths.
+    :param stats: <dict> Output of length_stats.
+    """
+
+    # NOTE: if normalised is all the same value, there will be division
+    # by zero issues.
+
+    normalised = (lengths - stats['mean']) / (stats['max'] - stats['min'])
+    normalised = pd.Series(normalised).fillna(0)
+
+    assert normalised.isnull().sum() == 0, normalised
+
+    return normalised
+
+def string_len(feature, stats=None):
+    """
+     Calculate feature length of comment features
+
+    :param feature: <pd.Series> Comment feature.
+    :param stats: <dict> Statistics to normalise with, from length_stats.
+    Calculated from feature if not given.
+    """
+    try:
+
+        feature = string_lengths(feature)
 
         assert isinstance(feature, pd.Series)
         assert feature.isnull().sum() == 0
 
         # Now normalise the scores
 
-        # NOTE: if normalised is all the same value, there will be division
-        # by zero issues.
+        if stats is None:
+            stats = length_stats(feature)
 
-        normalised = (feature - feature.mean()) / (feature.max() - feature.min())
-        normalised = pd.Series(normalised).fillna(0)
-
-        assert normalised.isnull().sum() == 0, normalised
+        normalised = scale_lengths(feature, stats)
 
     except Exception:
         print('There was an error converting feature to string length column')
         raise
     return normalised
 
+# Weirdness with some columns being filled with just a comma, see clean_comment
+
+COMMA_PATTERN = re.compile(r'\,\s?\,?$|none\,')
+
+# Lookup table of which unicode code points are upper case, grown as
+# needed by upper_case_table().
+
+_upper_case = np.zeros(0, dtype=bool)
+
+def upper_case_table(size):
+    """
+    Boolean array of str.isupper() for the first size code points
+    """
+
+    global _upper_case
+
+    if len(_upper_case) < size:
+        _upper_case = np.array([chr(i).isupper() for i in range(size)], dtype=bool)
+
+    return _upper_case
+
+def comment_features(feature):
+    """
+    Calculate all of the features of a comment feature in one pass
+
+    Equivalent to clean_comment, string_lengths, string_capsratio and
+    string_nexcl, but each unique comment is only cleaned once, and the
+    capitals and exclamations are counted with NumPy over the code points
+    of all of the unique comments at once.
+
+    :param feature: <pd.Series> Comment feature.
+    :return: <pd.DataFrame> Columns comment (cleaned), len (not normalised),
+    capsratio and nexcl, with the index of feature.
+    """
+    try:
+
+        codes, uniques = pd.factorize(feature)
+        uniques = [str(x) for x in uniques]
+
+        # Count capitals and exclamation marks in each unique comment
+
+        lengths = np.array([len(x) for x in uniques], dtype='int64')
+        points = np.frombuffer(''.join(uniques).encode('utf-32-le', 'surrogatepass'),
+                               dtype=np.uint32)
+
+        upper = upper_case_table(int(points.max()) + 1 if len(points) else 0)[points]
+        upper = np.concatenate([[0], np.cumsum(upper, dtype='int64')])
+        excl = np.concatenate([[0], np.cumsum(points == ord('!'), dtype='int64')])
+
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            capsratio = np.where(lengths > 0, (upper[ends] - upper[starts]) / lengths, 0)
+            nexcl = np.where(lengths > 0, (excl[ends] - excl[starts]) / lengths, 0)
+
+        # Clean the unique comments, as clean_comment and string_lengths do
+
+        cleaned = [COMMA_PATTERN.sub('none', x.strip().lower()) for x in uniques]
+        cleaned_lengths = [len(x.strip()) for x in cleaned]
+        cleaned = np.array(cleaned, dtype='object')
+
+        # Map back to rows. NaN is coded -1 by factorize, so append the
+        # values for NaN to the end of each array.
+
+        features = pd.DataFrame({
+            'comment': np.append(cleaned, 'none')[codes],
+            'len': np.append(np.array(cleaned_lengths, dtype='int64'), 1)[codes],
+            'capsratio': np.append(capsratio, 0.)[codes],
+            'nexcl': np.append(nexcl, 0.)[codes],
+            }, index=feature.index, columns=['comment', 'len', 'capsratio', 'nexcl'])
+
+    except Exception:
+        print('There was an error creating comment features')
+        raise
+    return features
+
 def string_capsratio(feature):
     """
     Calculate ratio of capitals to all characters
@@ -627,14 +1377,104 @@ def string_nexcl(feature):
         raise
     return feature
 
+# Formats guessed by infer_date_format, keyed by the shape of the dates
+# they were guessed from (e.g. 00/00/0000 00:00:00)
+
+DATE_FORMATS = {}
+DIGIT_PATTERN = re.compile(r'\d')
+
+def infer_date_format(sample):
+    """
+    Guess the format of a date string, e.g. %m/%d/%Y %H:%M:%S
+
+    The guess is cached for all dates of the same shape, so it is only made
+    once per process. pd.to_datetime reads ambiguous dates such as
+    09/03/2017 month first, so a guess with the day before the month (from
+    e.g. 25/03/2017) is cached in its month first form: dates that do not
+    match it are parsed by pandas, as they would have been without a
+    format. Formats with a time zone are not used. Failed guesses are not
+    cached, so that a later date of the same shape can still be guessed.
+
+    :param sample: <str> A date.
+    :return: <str> The format, or None if it could not be guessed.
+    """
+
+    shape = DIGIT_PATTERN.sub('0', sample)
+
+    if shape not in DATE_FORMATS:
+        format = guess_datetime_format(sample)
+
+        if not format or '%z' in format or '%Z' in format:
+            return None
+
+        if '%d' in format and '%m' in format and format.index('%d') < format.index('%m'):
+            format = format.replace('%d', '%_').replace('%m', '%d').replace('%_', '%m')
+
+        DATE_FORMATS[shape] = format
+
+    return DATE_FORMATS[shape]
+
+def parse_dates(dates, format=None):
+    """
+    Parse distinct date strings, with an inferred format where possible
+
+    Dates that do not match the inferred format (e.g. 25/03/2017 when the
+    format is %m/%d/%Y) are parsed as pd.to_datetime would without one, so
+    the result is the same as pd.to_datetime(dates).
+
+    :param dates: <pd.Index> Distinct dates.
+    :param format: <str> Format to parse the dates with. If None, it is
+    inferred from the first of the first few dates it can be guessed from.
+    """
+
+    if format is None:
+        inferred = None
+
+        for sample in dates[:5]:
+            if isinstance(sample, str):
+                inferred = infer_date_format(sample)
+
+            if inferred:
+                break
+
+        if inferred:
+            parsed = pd.to_datetime(dates, format=inferred, errors='coerce')
+            failed = parsed.isnull()
+
+            if not failed.any():
+                return parsed
+
+            rest = pd.to_datetime(dates[failed])
+
+            if rest.dtype == parsed.dtype:
+                values = parsed.values.copy()
+                values[failed] = rest.values
+                return pd.DatetimeIndex(values)
+
+    return pd.to_datetime(dates, format=format)
+
 def clean_date(feature, format=None):
     """
     Convert feature to a datetime object
 
+    Each distinct date is only parsed once, and if format is None, the
+    format is inferred with infer_date_format.
+
     :param feature: <pd.Series> Date feature.
+    :param format: <str> Format of the dates, e.g. %d/%m/%Y %H:%M:%S.
     """
     try:
-        feature = pd.to_datetime(feature, format=format)
+        if not isinstance(feature, pd.Series):
+            feature = pd.to_datetime(feature, format=format)
+
+        elif not is_datetime64_any_dtype(feature):
+            codes, uniques = pd.factorize(feature)
+            parsed = parse_dates(pd.Index(uniques, dtype='object'), format)
+
+            # Missing dates are coded -1, and filled with NaT
+
+            feature = pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT),
+                                index=feature.index, name=feature.name)
 
     except Exception:
         print('There was an error cleaning the StartDate column!')
@@ -648,7 +1488,8 @@ def date_features(feature):
     :param feature: <pd.Series> Date feature.
     """
     try:
-        feature = pd.to_datetime(feature)
+        if not is_datetime64_any_dtype(feature):
+            feature = pd.to_datetime(feature)
 
         date_features = pd.DataFrame({
             'weekday' : feature.dt.weekday,
@@ -663,26 +1504,152 @@ def date_features(feature):
         raise
     return date_features
 
+def downcast_integer(feature):
+    """
+    Store an integer feature as int16, or as float32 if it contains NaN
+
+    :param feature: <pd.Series> Integer feature, e.g. from date_features.
+    """
+
+    if feature.isnull().any():
+        return feature.astype('float32')
+
+    return feature.astype('int16')
+
+# Values of a categorical feature that code for empty, see clean_category
+
+NULL_PATTERN = re.compile(r'null|\#Value\!')
+
 def clean_category(feature):
     """
     Clean categorical features
 
+    Values are converted to lower case strings, and null replaced with
+    'none'. Each distinct value is only cleaned once: the feature is
+    factorized (or its own codes used, if it is already categorical), and
+    the categorical is rebuilt from the codes of the cleaned values.
+
     :param feature: <pd.Series> Categorical feature.
     """
     try:
 
-        feature = feature.apply(str)
-        feature = feature.str.lower()
-        feature = feature.replace(r'null|\#Value\!', 'none', regex=True)
-        feature = feature.fillna('none')
-        feature = pd.Series(feature)
-        feature = feature.astype('category')
+        if feature.dtype.name == 'category':
+            codes = np.asarray(feature.cat.codes, dtype='int64')
+            uniques = feature.cat.categories
+        else:
+            codes, uniques = pd.factorize(feature)
+
+            # factorize treats equal values as one (e.g. 1 and 1.0), which
+            # are cleaned to different strings, so object columns holding
+            # anything but strings are factorized on their strings instead.
+
+            if feature.dtype == 'object' and not all(isinstance(x, str) for x in uniques):
+                codes, uniques = pd.factorize(feature.map(str))
+
+        values = [str(x) for x in uniques]
+
+        # Missing values are coded -1, and are cleaned as str() of the
+        # missing value, e.g. 'nan' or 'NaT', except in categoricals, where
+        # they are filled with 'none'. An object column may hold more than
+        # one kind of missing value (e.g. None and NaN), so they are given
+        # a code for each type.
+
+        missing = np.flatnonzero(codes == -1)
+
+        if len(missing):
+            if feature.dtype.name == 'category':
+                values.append('none')
+                codes[missing] = len(uniques)
+            elif feature.dtype == 'object':
+                kinds, index, inverse = np.unique(
+                    feature.iloc[missing].map(type).astype('str').values,
+                    return_index=True, return_inverse=True)
+                values += [str(feature.iat[missing[i]]) for i in index]
+                codes[missing] = len(uniques) + inverse
+            else:
+                values.append(str(feature.iat[missing[0]]))
+                codes[missing] = len(uniques)
+
+        values = [NULL_PATTERN.sub('none', x.lower()) for x in values]
+
+        # Map the cleaned values to sorted categories, as astype('category')
+
+        categories, cleaned_codes = np.unique(np.array(values, dtype='object'),
+                                              return_inverse=True)
+
+        feature = pd.Series(
+            pd.Categorical.from_codes(cleaned_codes[codes], categories),
+            index=feature.index, name=feature.name)
 
     except Exception:
         print('There was an error cleaning the column.')
         raise
     return feature
 
+def encode_category(feature, levels=None):
+    """
+    Convert a categorical feature to integer codes
+
+    :param feature: <pd.Series> Categorical feature.
+    :param levels: <list> Sorted levels of the feature. Values not in levels
+    are coded as -1. If not given, the unique values of feature are used.
+    :return: <tuple> Integer codes as a np.array, and the levels used.
+    """
+    try:
+
+        if levels is None:
+            levels = np.unique(np.asarray(feature)).tolist()
+
+        codes = pd.Categorical(feature, categories=levels).codes.astype('int64')
+
+    except Exception:
+        print('There was an error encoding the column.')
+        raise
+    return codes, levels
+
+def numeric_values(feature, dtype='float32'):
+    """
+    A feature of survey.cleaned as a numeric np.array
+
+    Date features and time_delta are stored as categories of strings
+    outside of low_memory mode, so each category is converted once.
+
+    :param feature: <pd.Series> Numeric or integer coded feature.
+    :param dtype: <str> dtype of the result.
+    """
+
+    if feature.dtype.name == 'category':
+        categories = np.append(np.asarray(feature.cat.categories, dtype=dtype), np.nan)
+        return categories[np.asarray(feature.cat.codes)]
+
+    return np.asarray(feature, dtype=dtype)
+
+def one_hot_codes(codes, n_levels, dtype='float32', sparse=True):
+    """
+    One hot encode integer codes, e.g. from encode_category
+
+    :param codes: <pd.Series> Integer codes. -1 is encoded as all zeros.
+    :param n_levels: <int> Number of levels, and so columns.
+    :param dtype: <str> dtype of the result.
+    :param sparse: <bool> Return a scipy.sparse CSR matrix rather than a
+    dense np.array.
+    """
+
+    import scipy.sparse
+
+    codes = np.asarray(codes, dtype='int64')
+    rows = np.flatnonzero(codes >= 0)
+
+    if sparse:
+        return scipy.sparse.csr_matrix(
+            (np.ones(len(rows), dtype=dtype), (rows, codes[rows])),
+            shape=(len(codes), n_levels))
+
+    matrix = np.zeros((len(codes), n_levels), dtype=dtype)
+    matrix[rows, codes[rows]] = 1
+
+    return matrix
+
 def clean_comment(feature):
     """
     Clean comment features
@@ -737,81 +1704,92 @@ def clean_code(feature, levels):
         if df.iloc[0,].str.match('Open-Ended Response').sum():
             df.drop(0, inplace=True)
         return df
-## Functions dealing with the API lookup
+## Functions dealing with developing a time difference feature
 
-def lookup(r, page, index):
+def concat_partitions(partitions):
     """
-    Helper function for parsing results from api lookup
+    Combine partitions of data cleaned by survey.clean_rows
+
+    Categorical columns are combined with the union of their categories,
+    sorted, as if the partitions had been cleaned together.
+
+    :param partitions: <list> DataFrames, in row order.
     """
 
-    try:
-        if page == 'mainstream_browse_pages':
-            x = r['results'][0][page][index]
-        elif page == 'organisations':
-            x = r['results'][0][page][index]['title']
-        else:
-            print('page argument must be one of "organisations" or "mainstream_browse_pages"')
-            sys.exit(1)
-    except (IndexError, KeyError):
-        x = 'null'
+    data = pd.concat(partitions)
+    data.index = data.index.astype(partitions[0].index.dtype)
+
+    for col in data:
+        if all(p[col].dtype.name == 'category' for p in partitions):
+            categorical = union_categoricals([p[col] for p in partitions],
+                                             sort_categories=True)
+            data[col] = pd.Series(categorical, index=data.index)
+
+    return data
+
+def moments(x):
+    """
+    Statistics used by normalise
+
+    :param x: <pd.Series> Numeric feature.
+    """
+
+    return {'n': int(len(x)), 'mean': float(np.mean(x)), 'std': float(np.std(x))}
+
+def normalise(x, stats=None):
+
+    # stats (from moments) are calculated from x if not given
+
+    if stats is None:
+        stats = moments(x)
+
+    x = np.subtract(x, stats['mean']) / stats['std']
     return x
 
-def get_org(page):
+def merge_stats(a, b):
     """
-    Perform lookup against the GOV.UK Content API
+    Combine the statistics recorded in survey.stats for two sets of rows
+
+    :param a: <dict> survey.stats from the first set of rows.
+    :param b: <dict> survey.stats from the second set of rows.
+    :return: <dict> Statistics as if calculated from both sets of rows.
     """
 
-    # argument x should be pd.Series of full length urls
-    # Loop through each entry in the series
+    merged = {}
 
-    url = ("https://www.gov.uk/api/search.json?filter_link[]"
-           "=%s&fields=organisations&fields=mainstream_browse_pages" % page)
+    for key in set(a) | set(b):
 
-    #self.logger.info('Looking up ' + url)
+        if key not in a or key not in b:
+            merged[key] = a.get(key) or b.get(key)
 
-    try:
+        elif key == 'levels':
+            merged[key] = {col: sorted(set(a[key][col]) | set(b[key][col]))
+                           for col in a[key]}
 
-        # read JSON result into r
-        r = requests.get(url).json()
-
-        # chose the fields you want to scrape. This scrapes the first 5
-        # instances of organisation, error checking as it goes
-        # this exception syntax might not work in Python 3
-
-        organisation0 = lookup(r, 'organisations', 0)
-        organisation1 = lookup(r, 'organisations', 1)
-        organisation2 = lookup(r, 'organisations', 2)
-        organisation3 = lookup(r, 'organisations', 3)
-        organisation4 = lookup(r, 'organisations', 4)
-        section0 = lookup(r, 'mainstream_browse_pages', 0)
-        section1 = lookup(r, 'mainstream_browse_pages', 1)
-        section2 = lookup(r, 'mainstream_browse_pages', 2)
-        section3 = lookup(r, 'mainstream_browse_pages', 3)
-
-        row = [organisation0,
-               organisation1,
-               organisation2,
-               organisation3,
-               organisation4,
-               section0,
-               section1,
-               section2,
-               section3]
-
-        return row
+        elif 'std' in a[key]:
 
-    except Exception:
-        print('Error looking up ' + url)
-        print('Returning "none"')
-        row = ['none'] * 9
-        return row
+            # Chan et al's method for combining variances
 
-## Functions dealing with developing a time difference feature
+            x, y = a[key], b[key]
+            n = x['n'] + y['n']
+            delta = y['mean'] - x['mean']
+            m2 = (x['std'] ** 2 * x['n'] + y['std'] ** 2 * y['n'] +
+                  delta ** 2 * x['n'] * y['n'] / n)
 
-def normalise(x):
+            merged[key] = {'n': n, 'mean': x['mean'] + delta * y['n'] / n,
+                           'std': float(np.sqrt(m2 / n))}
 
-    x = (x - np.mean(x)) / np.std(x)
-    return x
+        else:
+            x, y = a[key], b[key]
+            n = x['n'] + y['n']
+
+            merged[key] = {'n': n,
+                           'mean': (x['mean'] * x['n'] + y['mean'] * y['n']) / n,
+                           'min': min(x['min'], y['min']),
+                           'max': max(x['max'], y['max']),
+                           'all_null': x['all_null'] and y['all_null']}
+
+    return merged
 
 def time_delta(x,y):
 
@@ -828,56 +1806,68 @@ def time_delta(x,y):
 
     return delta
 
-def reg_match(r, x, i):
-
-    r = r + '/'
+# Functions to remove other categories from categorical questions following
+# switch to smart survey
 
-    # r = uncompiled regex query
-    # x = string to search
-    # i = index of captive group (0 = all)
+# Answers to the categorical questions with an "other" option. Any other
+# answer is free text, see split_other
 
-    p = re.compile(r)
-    s = p.search(x)
+ANSWER_PATTERN = re.compile(r'^Yes$|^No$|^Not sure / Not yet$')
 
-    if s:
-        t = re.split('\/', x, maxsplit=3)
-        if i == 0:
-            found = t[1]
-        if i == 1:
-            found = '/' + t[1] + '/' + t[2]
-        elif i == 2:
-            found = t[2]
-    else:
-        found = x
-    return found
+def split_other(x):
+    """
+    Split a categorical question into its answer and any "other" comment
 
-# Functions to remove other categories from categorical questions following
-# switch to smart survey
+    Each distinct value is matched against ANSWER_PATTERN once. Answers
+    that match are kept, and their comment is 'none'. Any other answer
+    (including missing) becomes 'other', and is kept as the comment, with
+    missing comments filled with 'none'. x is not modified.
 
-def extract_other(x):
+    :param x: <pd.Series> Categorical question, e.g. cat_found_looking_for.
+    :return: <tuple> Answers (as rewrite_other) and comments (as
+    extract_other), as pd.Series with the index of x.
+    """
     try:
 
-        # NOTE: Weirdness with some columns being filled with just a comma.
-        # Is this due to improper handling of the csv file somewhere?
-        x = x.fillna('none')
-        x = x.replace(r'^Yes$|^No$|^Not sure / Not yet$', 'none', regex=True)
+        codes, uniques = pd.factorize(x)
+
+        answers = []
+        comments = []
+
+        for value in uniques:
+            match = isinstance(value, str) and ANSWER_PATTERN.match(value)
+
+            answers.append(value if match else 'other')
+            comments.append(ANSWER_PATTERN.sub('none', value) if match else value)
+
+        # Missing values are coded -1, so add their results to the end
+
+        answers = np.array(answers + ['other'], dtype='object')[codes]
+        comments = np.array(comments + ['none'], dtype='object')[codes]
+
+        answers = pd.Series(answers, index=x.index, name=x.name)
+        comments = pd.Series(comments, index=x.index, name=x.name)
 
     except Exception:
-        print('There was an error extracting "other" class form feature')
+        print('There was an error splitting "other" class from feature')
         raise
-    return x
+    return answers, comments
 
+def extract_other(x):
+    """
+    The free text "other" comments of a categorical question, see split_other
+
+    :param x: <pd.Series> Categorical question.
+    """
+
+    return split_other(x)[1]
 
 def rewrite_other(x):
-    try:
-        
-        # NOTE: Weirdness with some columns being filled with just a comma.
-        # Is this due to improper handling of the csv file somewhere?        
-        x = x.fillna('none')
-        x[~x.str.match('^Yes$|^No$|^Not sure / Not yet$', na=False)] = 'other'
+    """
+    A categorical question with free text answers rewritten as 'other', see
+    split_other
 
-    except Exception:
-        print('There was an error rewriting "other" class from feature')
-        raise
-    return x
- 
+    :param x: <pd.Series> Categorical question.
+    """
+
+    return split_other(x)[0]
@@ -0,0 +1,358 @@
+# coding: utf-8
+"""
+Client for looking up organisations and sections from the GOV.UK search API
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .instrument import percentiles, Progress
+
+SEARCH_URL = 'https://www.gov.uk/api/search.json'
+
+# Responses that are worth retrying: rate limiting and server errors
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+ORG_SECT_COLUMNS = ['organisation0', 'organisation1', 'organisation2',
+                    'organisation3', 'organisation4', 'section0', 'section1',
+                    'section2', 'section3']
+
+logger = logging.getLogger('classifyintents')
+
+
+def lookup(r, page, index):
+    """
+    Helper function for parsing results from api lookup
+    """
+
+    try:
+        if page == 'mainstream_browse_pages':
+            x = r['results'][0][page][index]
+        elif page == 'organisations':
+            x = r['results'][0][page][index]['title']
+        else:
+            print('page argument must be one of "organisations" or "mainstream_browse_pages"')
+            sys.exit(1)
+    except (IndexError, KeyError):
+        x = 'null'
+    return x
+
+
+def lookup_row(r):
+    """
+    Parse a search API response into a row of the org_sect lookup
+
+    Returns the first five organisations and the first four mainstream
+    browse pages, with 'null' where they are not present.
+
+    :param r: <dict> Decoded json response from the search API.
+    """
+
+    row = [lookup(r, 'organisations', i) for i in range(5)]
+    row.extend([lookup(r, 'mainstream_browse_pages', i) for i in range(4)])
+
+    return row
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket rate limiter
+
+    Tokens are added at `rate` per second, up to `capacity`. Each call to
+    acquire() takes one token, blocking until one is available.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        :param rate: <float> Tokens added per second.
+        :param capacity: <int> Maximum number of tokens (i.e. burst size).
+        """
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available
+        """
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                delay = (1 - self.tokens) / self.rate
+
+            time.sleep(delay)
+
+
+class ContentAPIClient:
+    """
+    Connection pooled, rate limited client for the GOV.UK search API
+
+    Requests are made from a pool of worker threads sharing one
+    requests.Session, so connections are reused. A token bucket shared by
+    the workers limits the overall request rate, and responses with a
+    status in RETRY_STATUSES are retried with exponential backoff.
+
+    The number of requests made and of errors are counted, and the latency
+    and status of the most recent are kept in self.requests. Both are
+    summarised by request_stats.
+    """
+
+    def __init__(self, url=SEARCH_URL, concurrency=4, rate=10, retries=3,
+                 backoff=0.5, timeout=10, batch_size=1, session=None, window=10000):
+        """
+        :param url: <str> Url of the search API endpoint.
+        :param concurrency: <int> Number of requests to make concurrently.
+        :param rate: <float> Maximum requests per second. None for no limit.
+        :param retries: <int> Number of times to retry a failed request.
+        :param backoff: <float> Initial wait between retries in seconds,
+        doubled on each retry.
+        :param timeout: <float> Timeout for each request in seconds.
+        :param batch_size: <int> Number of pages to look up in each request
+        made by get_orgs.
+        :param session: <requests.Session> Session to use. One is created
+        with a connection pool sized to concurrency if not given.
+        :param window: <int> Number of recent requests to keep the latency
+        and status of.
+        """
+
+        self.url = url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.bucket = TokenBucket(rate) if rate else None
+        self.requests = deque(maxlen=window)
+        self.request_count = 0
+        self.error_count = 0
+        self.lock = threading.Lock()
+
+        if session is None:
+            import requests
+            import requests.adapters
+
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                    pool_maxsize=concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+
+        self.session = session
+
+    def query(self, params):
+        """
+        Query the search API, retrying on rate limiting and server errors
+
+        :param params: <list> List of (key, value) query parameters.
+        :return: <dict> Decoded json response.
+        """
+
+        for attempt in range(self.retries + 1):
+
+            if self.bucket:
+                self.bucket.acquire()
+
+            start = time.perf_counter()
+
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+
+            except Exception:
+                self.record(time.perf_counter() - start, None)
+                raise
+
+            self.record(time.perf_counter() - start, response.status_code)
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+
+            # Honour the Retry-After header if the API sends one
+
+            try:
+                delay = float(response.headers['Retry-After'])
+            except (KeyError, ValueError):
+                delay = self.backoff * 2 ** attempt
+
+            logger.debug('Status %s from search API, retrying in %ss',
+                         response.status_code, delay)
+            time.sleep(delay)
+
+        response.raise_for_status()
+
+        return response.json()
+
+    def record(self, latency, status):
+        """
+        Record a request, from any of the worker threads
+
+        :param latency: <float> Seconds the request took.
+        :param status: <int> Status of the response, or None if the request
+        raised an exception.
+        """
+
+        with self.lock:
+            self.requests.append((latency, status))
+            self.request_count += 1
+            self.error_count += status is None or status >= 400
+
+    def request_counts(self):
+        """
+        The number of requests made and of errors so far, to pass to
+        request_stats as start
+        """
+
+        with self.lock:
+            return self.request_count, self.error_count
+
+    def request_stats(self, start=None):
+        """
+        Summarise the requests made by the client
+
+        A request is counted as an error if it raised an exception (e.g. a
+        timeout) or returned an error status, including those retried.
+        Latencies are only kept for the most recent window requests.
+
+        :param start: <tuple> Only summarise requests made since
+        request_counts returned start, e.g. before a lookup.
+        :return: <dict> Number of requests, number of errors, and latency
+        percentiles in seconds.
+        """
+
+        requests, errors = start or (0, 0)
+
+        with self.lock:
+            requests = self.request_count - requests
+            errors = self.error_count - errors
+            recent = list(self.requests)[-requests:] if requests else []
+
+        stats = {'requests': requests, 'errors': errors}
+        stats.update(percentiles([latency for latency, status in recent]))
+
+        return stats
+
+    def get_org(self, page):
+        """
+        Look up the organisations and sections of a single page
+
+        :param page: <str> Page to look up, e.g. /browse/tax.
+        :return: <list> Row of the org_sect lookup, or 'none' * 9 on error.
+        """
+
+        params = [('filter_link[]', page), ('fields', 'organisations'),
+                  ('fields', 'mainstream_browse_pages')]
+
+        try:
+            row = lookup_row(self.query(params))
+
+        except Exception:
+            logger.warning('Error looking up %s, returning "none"', page)
+            row = ['none'] * 9
+
+        return row
+
+    def get_org_batch(self, pages):
+        """
+        Look up several pages in a single request
+
+        The search API accepts several filter_link[] values. The link field
+        is requested too, so that the results can be split back out per
+        page and parsed exactly as get_org would parse them.
+
+        :param pages: <list> Pages to look up.
+        :return: <list> Rows of the org_sect lookup, in the order of pages,
+        or 'none' * 9 for every page on error.
+        """
+
+        params = [('filter_link[]', page) for page in pages]
+        params.extend([('fields', 'link'), ('fields', 'organisations'),
+                       ('fields', 'mainstream_browse_pages'),
+                       ('count', len(pages))])
+
+        try:
+            results = {}
+
+            for result in self.query(params)['results']:
+                results.setdefault(result.get('link'), []).append(result)
+
+            rows = [lookup_row({'results': results.get(page, [])}) for page in pages]
+
+        except Exception:
+            logger.warning('Error looking up batch of %s pages starting %s, '
+                           'returning "none"', len(pages), pages[0])
+            rows = [['none'] * 9 for page in pages]
+
+        return rows
+
+    def get_orgs(self, pages, progress=None):
+        """
+        Look up many pages concurrently
+
+        Pages are sent batch_size at a time. Progress is logged with the
+        rate of lookups and the time remaining.
+
+        :param pages: <iterable> Pages to look up.
+        :param progress: <Progress> Progress to update as pages are looked
+        up, e.g. when the caller looks up pages over several calls. One is
+        created for pages if not given.
+        :return: <list> Rows of the org_sect lookup, in the order of pages.
+        """
+
+        pages = list(pages)
+        total = len(pages)
+        size = self.batch_size
+        batches = [pages[i:i + size] for i in range(0, total, size)]
+
+        def get_batch(batch):
+
+            if size == 1:
+                return [self.get_org(batch[0])]
+
+            return self.get_org_batch(batch)
+
+        if progress is None:
+            progress = Progress(total, 'pages looked up')
+
+        rows = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for batch in executor.map(get_batch, batches):
+                rows.extend(batch)
+                progress.update(len(batch))
+
+        return rows
+
+
+_default_client = None
+
+def get_org(page):
+    """
+    Perform lookup against the GOV.UK Content API
+
+    Uses a module level ContentAPIClient, so that connections are reused
+    between calls.
+
+    :param page: <str> Page to look up.
+    """
+
+    global _default_client
+
+    if _default_client is None:
+        _default_client = ContentAPIClient(concurrency=1, rate=None)
+
+    return _default_client.get_org(page)
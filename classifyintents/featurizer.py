@@ -0,0 +1,358 @@
+# coding: utf-8
+"""
+Calculate the features of single survey responses, for online scoring
+
+survey works on whole DataFrames, so classifying each response as it
+arrives (e.g. from a Smart Survey webhook) would mean building a DataFrame
+of one row and running the whole pipeline. ResponseFeaturizer applies the
+same steps as clean_raw, clean_urls, api_lookup and predictor to a single
+response dict with plain Python, using the statistics and levels of a
+fitted FeatureTransformer and a preloaded lookup of page to org and
+section.
+"""
+
+import math
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from functools import lru_cache
+from .classifyintents import (survey, COMMA_PATTERN, NULL_PATTERN, ANSWER_PATTERN,
+                              infer_date_format)
+from .urls import normalise_url, FCO_ORG, WORLD, BROWSE
+
+logger = logging.getLogger('classifyintents')
+
+# Strings read as missing by pd.read_csv, so that a response is cleaned as
+# it would be if it had been loaded from an export
+
+NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN',
+             '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN',
+             'None', 'n/a', 'nan', 'null'}
+
+
+def is_missing(value):
+    """
+    Whether a raw value would be NaN once loaded with pd.read_csv
+    """
+
+    if value is None:
+        return True
+
+    if isinstance(value, float):
+        return math.isnan(value)
+
+    return isinstance(value, str) and value in NA_VALUES
+
+
+def clean_value(value):
+    """
+    Clean a single value, as clean_category does a column
+
+    :param value: <str> Value, or None if missing.
+    """
+
+    return NULL_PATTERN.sub('none', str(np.nan if value is None else value).lower())
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value, format=None):
+    """
+    Parse a single date, as clean_date does a column
+
+    Dates are usually recorded to the minute, so recent dates are cached.
+
+    :param value: <str> Date.
+    :param format: <str> Format of the date. If None, it is inferred with
+    infer_date_format, and dates that do not match the inferred format are
+    parsed by pandas.
+    """
+
+    if format is not None:
+        return datetime.strptime(value, format)
+
+    inferred = infer_date_format(value)
+
+    if inferred:
+        try:
+            return datetime.strptime(value, inferred)
+        except ValueError:
+            pass
+
+    return pd.Timestamp(value).to_pydatetime()
+
+
+@lru_cache(maxsize=256)
+def feature_name(column):
+    """
+    The name a column of the Smart Survey export is mapped to by clean_raw
+    """
+
+    column = column.replace('\xa0', ' ').strip()
+
+    return survey.raw_mapping.get(column, column)
+
+
+class ResponseFeaturizer:
+    """
+    Calculate the features of survey responses one at a time
+
+    The features of a response are identical to its row of survey.cleaned
+    after clean_raw, clean_urls, api_lookup (if pages are given) and
+    predictor, when the survey is given the same transformer, and the
+    lookup returns the same org and section for its page. In low_memory
+    mode, the survey stores time_delta and the comment features as float32,
+    so they match to float32 precision.
+    """
+
+    # The features returned, in the order of the columns of survey.cleaned
+
+    columns = [col for col in survey.selection if col != 'respondent_id']
+
+    def __init__(self, transformer, pages=None, date_format=None):
+        """
+        :param transformer: <FeatureTransformer> Fitted transformer, with the
+        normalisation statistics and the levels of each category.
+        :param pages: <dict> Mapping of page to (org, section), as returned
+        by api_lookup. See pages_from_survey and pages_from_cache. If None,
+        org and section are those set by the url rules, as when predictor
+        is run without api_lookup.
+        :param date_format: <str> Format of the dates, as passed to clean_raw.
+        """
+
+        self.stats = transformer.stats
+        self.pages = pages
+        self.date_format = date_format
+
+        # Pages that were not in pages, which are given the org and
+        # section 'none', as for a failed lookup
+
+        self.misses = 0
+
+        self.codes = {col: {level: i for i, level in enumerate(levels)}
+                      for col, levels in transformer.levels.items()}
+
+    @staticmethod
+    def pages_from_survey(intent):
+        """
+        The org and section of each page looked up by survey.api_lookup
+
+        :param intent: <survey> Survey that api_lookup has been run on.
+        :return: <dict> Mapping of page to (org, section).
+        """
+
+        pages = intent.unique_pages
+
+        return dict(zip(pages['page'], zip(pages['org'], pages['section'])))
+
+    @staticmethod
+    def pages_from_cache(cache):
+        """
+        The org and section of every page in a lookup cache
+
+        :param cache: <LookupCache> Cache of content API lookups.
+        :return: <dict> Mapping of page to (org, section).
+        """
+
+        return {page: (row[0], row[5]) for page, row in cache.get_all().items()}
+
+    def featurize(self, response):
+        """
+        Calculate the features of a single response
+
+        :param response: <dict> Answers to the survey, keyed by the columns
+        of the Smart Survey export (or the names they are mapped to in
+        survey.raw_mapping). Missing answers can be left out.
+        :return: <np.array> Features in the order of self.columns, or None if
+        the response would be dropped by predictor: its dates are missing,
+        or its org or section were set by the url rules and so were not
+        looked up.
+        """
+
+        dates = self.dates(response)
+
+        if dates is None:
+            return None
+
+        start, end = dates
+        response = {feature_name(key): value for key, value in response.items()}
+
+        def get(col):
+            value = response.get(col)
+            return None if is_missing(value) else value
+
+        org, section = self.org_section(clean_value(get('full_url')))
+
+        if org is None:
+            return None
+
+        stats = self.stats['time_delta']
+        delta = (int((end - start).total_seconds()) - stats['mean']) / stats['std']
+
+        features = {
+            'weekday': start.weekday(), 'day': start.day,
+            'week': start.isocalendar()[1], 'month': start.month,
+            'year': start.year, 'time_delta': delta, 'org': org, 'section': section
+            }
+
+        # The answers to categorical questions, with 'other' answers
+        # split into comments as extract_other and rewrite_other do
+
+        answers = {col: get(col) for col in survey.raw_mapping.values()}
+
+        for cat, other in [('cat_found_looking_for', 'comment_other_found_what'),
+                           ('cat_anywhere_else_help', 'comment_other_else_help')]:
+
+            answer = 'none' if answers[cat] is None else answers[cat]
+
+            answers[other] = 'none' if ANSWER_PATTERN.match(answer) else answer
+            answers[cat] = answer if ANSWER_PATTERN.match(answer) else 'other'
+
+        answers['comment_other_where_for_help'] = None
+
+        for col in survey.categories[2:]:
+            features[col] = clean_value(answers[col])
+
+        for col in survey.comments:
+            features.update(self.comment_features(col, clean_value(answers[col])))
+
+        for col in survey.categories:
+            features[col] = self.codes[col].get(features[col], -1)
+
+        return np.array([features[col] for col in self.columns], dtype='float64')
+
+    def dates(self, response):
+        """
+        The start and end dates of a response
+
+        :param response: <dict> Response, as passed to featurize.
+        :return: <tuple> Start and end as datetimes, or None if either is
+        missing. Raises ValueError if either cannot be parsed.
+        """
+
+        dates = {}
+
+        for key, value in response.items():
+            col = feature_name(key)
+
+            if col in ('start_date', 'end_date'):
+                dates[col] = None if is_missing(value) else value
+
+        start, end = dates.get('start_date'), dates.get('end_date')
+
+        if start is None or end is None:
+            return None
+
+        return parse_date(start, self.date_format), parse_date(end, self.date_format)
+
+    def missing_pages(self, responses):
+        """
+        The pages of responses that would be looked up, but are not in pages
+
+        :param responses: <list> Responses, as passed to featurize.
+        :return: <list> Distinct pages, in the order they are first seen.
+        """
+
+        missing = {}
+
+        for response in responses:
+            url = None
+
+            for key, value in response.items():
+                if feature_name(key) == 'full_url' and not is_missing(value):
+                    url = value
+
+            rule, page, _ = normalise_url(clean_value(url))
+
+            if rule not in (WORLD, BROWSE) and page not in self.pages:
+                missing[page] = True
+
+        return list(missing)
+
+    def featurize_many(self, responses):
+        """
+        Calculate the features of a list of responses
+
+        :param responses: <list> Responses, as passed to featurize.
+        :return: <np.array> One row of features per response, with NaN for
+        responses that would be dropped by predictor.
+        """
+
+        features = np.full((len(responses), len(self.columns)), np.nan)
+
+        for i, response in enumerate(responses):
+            row = self.featurize(response)
+
+            if row is not None:
+                features[i] = row
+
+        return features
+
+    def org_section(self, url):
+        """
+        The org and section of a response, from its cleaned full_url
+
+        :param url: <str> Cleaned full_url.
+        :return: <tuple> org and section, or (None, None) if the response
+        would be dropped by predictor.
+        """
+
+        rule, page, browse_section = normalise_url(url)
+
+        if self.pages is None:
+
+            org = FCO_ORG if rule == WORLD else 'nan'
+            section = browse_section if rule == BROWSE else 'nan'
+
+            if not isinstance(section, str):
+                return None, None
+
+            return org, section
+
+        # Pages whose org or section are set by the rules are not looked up
+
+        if rule in (WORLD, BROWSE):
+            return None, None
+
+        if page not in self.pages:
+            self.misses += 1
+            return 'none', 'none'
+
+        return self.pages[page]
+
+    def comment_features(self, col, comment):
+        """
+        The features of a single comment, as comment_features and
+        survey.normalise_rows calculate them for a column
+
+        :param col: <str> Name of the comment feature.
+        :param comment: <str> Comment, cleaned by clean_value.
+        """
+
+        stats = self.stats[col + '_len']
+
+        if stats['all_null']:
+            return {col + '_len': 0, col + '_nexcl': 0, col + '_capsratio': 0}
+
+        length = len(comment)
+        cleaned = len(COMMA_PATTERN.sub('none', comment.strip().lower()).strip())
+
+        # As scale_lengths, 0 / 0 is 0 and x / 0 is +/-inf
+
+        difference = cleaned - stats['mean']
+        scale = stats['max'] - stats['min']
+
+        if scale:
+            scaled = difference / scale
+        else:
+            scaled = math.copysign(math.inf, difference) if difference else 0
+
+        # Comments have been lower cased, so usually have no capitals
+
+        upper = 0 if comment.islower() else sum(c.isupper() for c in comment)
+
+        return {
+            col + '_len': scaled,
+            col + '_nexcl': comment.count('!') / length if length else 0,
+            col + '_capsratio': upper / length if length else 0,
+            }
@@ -0,0 +1,124 @@
+# coding: utf-8
+"""
+Persisted state for processing a cumulative survey export incrementally
+"""
+
+import os
+import json
+import logging
+import pandas as pd
+from .storage import write_frame, read_saved
+
+logger = logging.getLogger('classifyintents')
+
+
+class IncrementalState:
+    """
+    The responses processed by previous runs of survey.update
+
+    Stored in a directory, holding:
+
+    * cleaned-<run>: the rows of survey.cleaned for the responses that were
+      new in each run. Each run only writes its own file, and cleaned()
+      reads them back together.
+    * ids: the UserIDs of every response processed so far, including those
+      dropped by predictor.
+    * state.json: the running normalisation statistics of every response
+      processed so far (as in survey.stats, combined with merge_stats), the
+      levels the categories are encoded with, and a log of the runs.
+    """
+
+    def __init__(self, path, extension='.parquet'):
+        """
+        :param path: <str> Directory to keep the state in. Created if it
+        does not exist.
+        :param extension: <str> Extension of the files to keep the ids and
+        cleaned rows in, which sets their format as for survey.save:
+        .parquet (which requires pyarrow) or .pkl.
+        """
+
+        self.path = path
+        self.extension = extension
+        self.ids_path = os.path.join(path, 'ids' + extension)
+        self.json_path = os.path.join(path, 'state.json')
+
+        os.makedirs(path, exist_ok=True)
+
+        if os.path.exists(self.json_path):
+
+            with open(self.json_path) as f:
+                state = json.load(f)
+
+            self.stats = state['stats']
+            self.levels = state['levels']
+            self.parts = state['parts']
+            self.runs = state['runs']
+            self.ids = read_saved(self.ids_path)['respondent_id']
+
+            logger.info('Loaded state of %s responses from %s', len(self.ids), path)
+
+        else:
+            self.runs = []
+            self.clear()
+
+    def __len__(self):
+
+        return len(self.ids)
+
+    def clear(self):
+        """
+        Forget every response processed so far, keeping the log of runs
+        """
+
+        for part in getattr(self, 'parts', []):
+            os.remove(os.path.join(self.path, part))
+
+        self.stats = {}
+        self.levels = None
+        self.parts = []
+        self.ids = pd.Series([], name='respondent_id', dtype='int64')
+
+    def append(self, cleaned, ids):
+        """
+        Add the responses processed by a run
+
+        :param cleaned: <pd.DataFrame> Rows of survey.cleaned for the new
+        responses, written to a file of their own.
+        :param ids: <pd.Series> UserIDs of the new responses.
+        """
+
+        part = 'cleaned-%04d%s' % (len(self.runs), self.extension)
+        write_frame(cleaned, os.path.join(self.path, part))
+
+        self.parts.append(part)
+        self.ids = pd.concat([self.ids, pd.Series(ids, dtype='int64')], ignore_index=True)
+        self.ids.name = 'respondent_id'
+
+    def cleaned(self):
+        """
+        The cleaned rows of every response processed so far
+
+        Categorical columns are combined as concat_partitions does, as if
+        the rows had been cleaned together.
+        """
+
+        from .classifyintents import concat_partitions
+
+        if not self.parts:
+            return pd.DataFrame()
+
+        return concat_partitions([read_saved(os.path.join(self.path, part))
+                                  for part in self.parts])
+
+    def save(self):
+        """
+        Write the ids and state.json to the directory
+        """
+
+        write_frame(self.ids.to_frame(), self.ids_path)
+
+        with open(self.json_path, 'w') as f:
+            json.dump({'stats': self.stats, 'levels': self.levels, 'parts': self.parts,
+                       'runs': self.runs}, f)
+
+        logger.info('Saved state of %s responses to %s', len(self.ids), self.path)
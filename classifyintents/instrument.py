@@ -0,0 +1,203 @@
+# coding: utf-8
+"""
+Stage level timing and memory instrumentation for the survey pipeline
+"""
+
+import os
+import time
+import logging
+import datetime
+import functools
+import tracemalloc
+
+logger = logging.getLogger('classifyintents')
+
+MB = 1024 * 1024
+
+
+def rss():
+    """
+    Resident set size of the process in bytes
+
+    Read from /proc on Linux, or with psutil elsewhere if it is installed.
+
+    :return: <int> Resident set size in bytes, or None if it cannot be read.
+    """
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    except (IOError, IndexError, ValueError, AttributeError):
+        pass
+
+    try:
+        import psutil
+
+    except ImportError:
+        return None
+
+    return psutil.Process().memory_info().rss
+
+
+def percentiles(latencies, q=(50, 90, 99)):
+    """
+    Latency percentiles, e.g. {'latency_p50': 0.12, ...}
+
+    :param latencies: <list> Latencies in seconds.
+    :param q: <tuple> Percentiles to calculate.
+    :return: <dict> Percentiles in seconds, None if there are no latencies.
+    """
+
+    import numpy as np
+
+    values = np.percentile(latencies, q) if len(latencies) else [None] * len(q)
+
+    return {'latency_p%s' % p: None if v is None else float(v)
+            for p, v in zip(q, values)}
+
+
+class Progress:
+    """
+    Logs the progress of a long running loop, with its rate and an estimate
+    of the time remaining
+
+    Progress is logged at most once every interval seconds, and when the
+    loop completes.
+    """
+
+    def __init__(self, total, name='pages', interval=10):
+        """
+        :param total: <int> Number of items the loop will process.
+        :param name: <str> Name of the items, for the log message.
+        :param interval: <float> Minimum seconds between log messages.
+        """
+
+        self.total = total
+        self.name = name
+        self.interval = interval
+        self.done = 0
+        self.start = time.monotonic()
+        self.logged = self.start
+
+    @property
+    def rate(self):
+        """
+        Items processed per second so far
+        """
+
+        seconds = time.monotonic() - self.start
+
+        return self.done / seconds if seconds > 0 else 0.
+
+    @property
+    def eta(self):
+        """
+        Estimated seconds until the loop completes, None if unknown
+        """
+
+        rate = self.rate
+
+        return (self.total - self.done) / rate if rate else None
+
+    def update(self, n=1):
+        """
+        Record that n more items have been processed
+
+        :param n: <int> Number of items processed.
+        """
+
+        self.done += n
+        now = time.monotonic()
+
+        if now - self.logged >= self.interval or self.done >= self.total:
+            self.logged = now
+            eta = self.eta
+
+            logger.info('%s/%s %s (%.1f/s, %s remaining)', self.done, self.total,
+                        self.name, self.rate,
+                        'unknown' if eta is None else
+                        str(datetime.timedelta(seconds=round(eta))))
+
+
+def instrumented(rows_in=None, rows_out=None):
+    """
+    Decorator recording metrics for each call of a survey method
+
+    Appends a dict to self.metrics with the stage name, wall time in
+    seconds, the number of rows in and out, and the change in resident set
+    size in MB (left out if rss() cannot read it). If self.trace_memory is
+    True, the peak memory allocated during the stage is traced with
+    tracemalloc and recorded as peak_mb. This slows the stage down, so is
+    off by default.
+
+    While the method runs, the dict is available as self.stage_metrics, so
+    that the method can add metrics of its own.
+
+    :param rows_in: <str> Name of the dataframe the method reads.
+    :param rows_out: <str> Name of the dataframe the method writes.
+    """
+
+    def decorator(method):
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+
+            metrics = {'stage': method.__name__}
+
+            if rows_in:
+                metrics['rows_in'] = len(getattr(self, rows_in))
+
+            self.stage_metrics = metrics
+
+            tracing = self.trace_memory and not tracemalloc.is_tracing()
+
+            if tracing:
+                tracemalloc.start()
+            elif self.trace_memory and hasattr(tracemalloc, 'reset_peak'):
+
+                # Before Python 3.9 the peak cannot be reset, so a stage run
+                # within another records the peak since the outer one began
+
+                tracemalloc.reset_peak()
+
+            traced = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+            start_rss = rss()
+            start = time.perf_counter()
+            failed = True
+
+            try:
+                result = method(self, *args, **kwargs)
+                failed = False
+
+            finally:
+                seconds = time.perf_counter() - start
+
+                if rows_out:
+                    metrics['rows_out'] = len(getattr(self, rows_out))
+
+                metrics['seconds'] = seconds
+                end_rss = rss()
+
+                if start_rss is not None and end_rss is not None:
+                    metrics['rss_delta_mb'] = (end_rss - start_rss) / MB
+
+                if self.trace_memory:
+                    metrics['peak_mb'] = (tracemalloc.get_traced_memory()[1] - traced) / MB
+
+                if tracing:
+                    tracemalloc.stop()
+
+                metrics['failed'] = failed
+                self.metrics.append(metrics)
+                self.stage_metrics = None
+
+                logger.info('%s metrics: %s', method.__name__,
+                            ', '.join('%s=%s' % (k, round(v, 3) if isinstance(v, float) else v)
+                                      for k, v in metrics.items() if k != 'stage'))
+
+            return result
+
+        return wrapper
+
+    return decorator
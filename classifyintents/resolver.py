@@ -0,0 +1,177 @@
+# coding: utf-8
+"""
+Infer the organisation and section of pages the search API does not know
+from their nearest ancestor that it does
+"""
+
+import logging
+
+logger = logging.getLogger('classifyintents')
+
+# Values of the org_sect lookup where an organisation or section is not known:
+# 'null' if the API had none, 'none' if the lookup failed
+
+UNKNOWN = ('null', 'none')
+
+
+def is_resolved(row):
+    """
+    Whether a row of the org_sect lookup has an organisation or a section
+
+    :param row: <list> Row of the org_sect lookup, as get_org returns.
+    """
+
+    return row[0] not in UNKNOWN or row[5] not in UNKNOWN
+
+
+class PageTrie:
+    """
+    Prefix trie of pages, keyed on their path segments
+
+    Each node holds the org_sect row of its page, if it has been looked up.
+    """
+
+    # Marks a node whose page has not been looked up
+
+    MISSING = object()
+
+    def __init__(self):
+
+        self.root = {}
+        self.size = 0
+
+    def __len__(self):
+
+        return self.size
+
+    def insert(self, page, row):
+        """
+        Record the org_sect row of a page
+
+        :param page: <str> Page, e.g. /topic/land-registration.
+        :param row: <list> Row of the org_sect lookup.
+        """
+
+        node = self.root
+
+        for segment in page.strip('/').split('/'):
+            node = node.setdefault(segment, {})
+
+        if None not in node:
+            self.size += 1
+
+        # Children are keyed on their segment, so None cannot clash
+
+        node[None] = row
+
+    def ancestors(self, page, min_depth=2):
+        """
+        The ancestors of a page and their rows, nearest first
+
+        :param page: <str> Page, e.g. /topic/land-registration/searches.
+        :param min_depth: <int> Fewest path segments an ancestor may have.
+        :return: <list> Tuples of ancestor and its row, or MISSING if it
+        has not been looked up.
+        """
+
+        segments = page.strip('/').split('/')
+        found = []
+        node = self.root
+
+        for depth in range(1, len(segments)):
+            node = node.get(segments[depth - 1]) if node is not None else None
+
+            if depth >= min_depth:
+                row = node.get(None, self.MISSING) if node is not None else self.MISSING
+                found.append(('/' + '/'.join(segments[:depth]), row))
+
+        return found[::-1]
+
+
+class AncestorResolver:
+    """
+    Resolves pages without an organisation or section from their ancestors
+
+    Pages that the search API returned no organisation or section for
+    (e.g. /topic/land-registration/searches-fees-forms) are given the row
+    of their nearest ancestor that has one (e.g. /topic/land-registration).
+    Every row seen is kept in a PageTrie, so ancestors are only looked up
+    if they have not been seen before, and only as far up as needed: the
+    parents of unresolved pages are looked up together, then the
+    grandparents of those still unresolved, and so on.
+
+    Passed to survey.api_lookup, which looks ancestors up as it does pages,
+    from the cache, the snapshot index, then the API.
+    """
+
+    def __init__(self, min_depth=2):
+        """
+        :param min_depth: <int> Fewest path segments an ancestor must have
+        to be used. The default of 2 stops e.g. /government resolving
+        everything beneath it.
+        """
+
+        self.min_depth = min_depth
+        self.trie = PageTrie()
+
+        self.inferred = 0
+        self.lookups = 0
+        self.unresolved = 0
+
+    def resolve(self, rows, fetch):
+        """
+        Infer the rows of unresolved pages from their ancestors
+
+        :param rows: <dict> Mapping of page to org_sect row, e.g. from the API.
+        :param fetch: <function> Called with a list of pages to look up,
+        returning a dict of page to org_sect row.
+        :return: <dict> Mapping of page to the row of its nearest resolved
+        ancestor, for pages in rows that were unresolved and have one.
+        """
+
+        for page, row in rows.items():
+            if isinstance(page, str):
+                self.trie.insert(page, row)
+
+        pending = [page for page, row in rows.items()
+                   if isinstance(page, str) and not is_resolved(row)]
+        inferred = {}
+
+        while pending:
+            wanted = {}
+
+            for page in pending:
+                for path, row in self.trie.ancestors(page, self.min_depth):
+
+                    if row is PageTrie.MISSING:
+                        wanted.setdefault(path, []).append(page)
+                        break
+
+                    if is_resolved(row):
+                        inferred[page] = row
+                        break
+
+            if not wanted:
+                break
+
+            fetched = fetch(list(wanted))
+            self.lookups += len(wanted)
+
+            for path in wanted:
+                self.trie.insert(path, fetched.get(path, ['null'] * 9))
+
+            pending = [page for pages in wanted.values() for page in pages]
+
+        self.inferred += len(inferred)
+        self.unresolved += sum(not is_resolved(row) for row in rows.values()) - len(inferred)
+
+        return inferred
+
+    def log_stats(self):
+        """
+        Log the inferred and lookup counts through the classifyintents logger
+        """
+
+        logger.info('Ancestor resolver: %s pages inferred from an ancestor, '
+                    '%s ancestors looked up, %s pages unresolved',
+                    self.inferred, self.lookups, self.unresolved)
@@ -0,0 +1,362 @@
+# coding: utf-8
+"""
+HTTP service calculating the features of survey responses
+
+Lets other services get the features of responses as JSON, without
+installing pandas or scikit-learn themselves. Requires aiohttp:
+pip install classifyintents[service]
+
+Usage: python -m classifyintents.service --transformer transformer.json
+       [--cache cache.db] [--lookup] [--port 8080]
+
+Endpoints:
+
+* POST /features: a single response, as a JSON object keyed by the columns
+  of the Smart Survey export. Returns {"features": [...]}, or null if the
+  response would be dropped by survey.predictor.
+* POST /features/batch: a JSON list of responses. Returns {"features":
+  [...]}, with a list (or null) for each response.
+* GET /health: {"status": "ok"} and the names of the features.
+* GET /metrics: throughput, batch sizes, latency percentiles and lookups.
+
+Concurrent requests are coalesced: responses queued while a batch is being
+calculated (or within max_wait of the first) are featurized together,
+with a single content API lookup for any of their pages that have not
+been seen before.
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .featurizer import ResponseFeaturizer
+from .transformer import FeatureTransformer
+from .content_api import ContentAPIClient
+from .cache import LookupCache
+from .instrument import percentiles
+
+logger = logging.getLogger('classifyintents')
+
+
+def import_aiohttp():
+    """
+    Import aiohttp, with a helpful message if it is not installed
+    """
+
+    try:
+        import aiohttp.web
+
+    except ImportError:
+        raise ImportError('The feature service requires aiohttp: '
+                          'pip install classifyintents[service]')
+    return aiohttp
+
+
+class FeatureService:
+    """
+    Featurizes responses in batches, coalescing concurrent requests
+
+    Responses are featurized by a ResponseFeaturizer in a single worker
+    thread, so the event loop is free to accept requests while a batch is
+    calculated. The featurizer's page lookup is shared by all requests: it
+    is preloaded from the cache, and pages that are not in it are looked up
+    through the client (if given) once per batch, and added to the lookup
+    and the cache.
+    """
+
+    def __init__(self, transformer, cache=None, client=None, max_batch=256,
+                 max_wait=0.002, window=10000):
+        """
+        :param transformer: <FeatureTransformer> Fitted transformer.
+        :param cache: <LookupCache> Cache of content API lookups to preload
+        pages from, and to add new lookups to.
+        :param client: <ContentAPIClient> Client to look up new pages with.
+        If None, new pages are given the org and section 'none'.
+        :param max_batch: <int> Maximum number of responses in a batch.
+        :param max_wait: <float> Seconds to wait for more requests to join a
+        batch once the first has arrived.
+        :param window: <int> Number of recent requests to calculate latency
+        percentiles over.
+        """
+
+        pages = ResponseFeaturizer.pages_from_cache(cache) if cache is not None else {}
+
+        self.featurizer = ResponseFeaturizer(transformer, pages)
+        self.cache = cache
+        self.client = client
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.executor = None
+        self.queue = None
+        self.batcher = None
+
+        self.started = time.monotonic()
+        self.requests = 0
+        self.responses = 0
+        self.batches = 0
+        self.errors = 0
+        self.lookups = 0
+        self.latencies = deque(maxlen=window)
+
+        logger.info('Feature service preloaded %s pages', len(pages))
+
+    async def start(self):
+        """
+        Start the task that featurizes queued requests
+        """
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self.run_batches())
+
+    async def stop(self):
+
+        self.batcher.cancel()
+
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+
+        self.executor.shutdown()
+
+    async def featurize(self, responses):
+        """
+        Featurize a list of responses, as part of the next batch
+
+        :param responses: <list> Response dicts.
+        :return: <list> Features of each response as a list, or None.
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((responses, future))
+
+        return await future
+
+    async def run_batches(self):
+        """
+        Take requests from the queue and featurize them a batch at a time
+        """
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            items = [await self.queue.get()]
+            size = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch:
+                try:
+                    if self.queue.empty():
+                        timeout = deadline - loop.time()
+                        item = await asyncio.wait_for(self.queue.get(), max(timeout, 0))
+                    else:
+                        item = self.queue.get_nowait()
+
+                except asyncio.TimeoutError:
+                    break
+
+                items.append(item)
+                size += len(item[0])
+
+            responses = [response for item in items for response in item[0]]
+
+            try:
+                features = await loop.run_in_executor(
+                    self.executor, self.featurize_batch, responses)
+
+            except Exception as error:
+                logger.exception('Error featurizing a batch of %s responses', size)
+                self.errors += len(items)
+
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.batches += 1
+            self.responses += size
+            start = 0
+
+            # A response that could not be featurized only fails the
+            # request it was sent in
+
+            for batch, future in items:
+                result = features[start:start + len(batch)]
+                errors = [f for f in result if isinstance(f, Exception)]
+                start += len(batch)
+
+                if future.done():
+                    continue
+
+                if errors:
+                    self.errors += 1
+                    future.set_exception(errors[0])
+                else:
+                    future.set_result(result)
+
+    def featurize_batch(self, responses):
+        """
+        Featurize responses, looking up any pages that have not been seen
+
+        Run in the worker thread, as are the writes of the pages that were
+        looked up to the cache.
+
+        :param responses: <list> Response dicts.
+        :return: <list> Features of each response as a list (or None), or
+        the exception raised featurizing it.
+        """
+
+        if self.client is not None:
+            missing = self.featurizer.missing_pages(responses)
+
+            if missing:
+                found = dict(zip(missing, self.client.get_orgs(missing)))
+
+                # Rows of failed lookups ('none') are not kept, so that the
+                # page is looked up again in a later batch
+
+                self.featurizer.pages.update(
+                    (page, (row[0], row[5])) for page, row in found.items()
+                    if row[0] != 'none')
+                self.lookups += len(missing)
+
+                if self.cache is not None:
+                    self.cache.set_many(found)
+
+        features = []
+
+        for response in responses:
+            try:
+                f = self.featurizer.featurize(response)
+            except Exception as error:
+                logger.warning('Error featurizing a response: %r', error)
+                features.append(error)
+            else:
+                features.append(None if f is None else f.tolist())
+
+        return features
+
+    def metrics(self):
+        """
+        Throughput, latency and lookup metrics since the service started
+        """
+
+        uptime = time.monotonic() - self.started
+
+        metrics = {
+            'uptime_seconds': uptime,
+            'requests': self.requests,
+            'responses': self.responses,
+            'batches': self.batches,
+            'errors': self.errors,
+            'mean_batch_size': self.responses / self.batches if self.batches else None,
+            'responses_per_second': self.responses / uptime,
+            'pages': len(self.featurizer.pages),
+            'lookups': self.lookups,
+            'page_misses': self.featurizer.misses,
+            }
+
+        metrics.update(percentiles(list(self.latencies)))
+
+        return metrics
+
+
+def create_app(service):
+    """
+    Create the aiohttp application serving a FeatureService
+
+    :param service: <FeatureService> Service to featurize requests with.
+    """
+
+    web = import_aiohttp().web
+
+    async def respond(request, batch):
+
+        start = time.perf_counter()
+        service.requests += 1
+
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'request body is not JSON'}, status=400)
+
+        responses = body if batch else [body]
+
+        if not isinstance(responses, list) or not all(isinstance(r, dict) for r in responses):
+            return web.json_response(
+                {'error': 'expected a list of responses' if batch else 'expected a response'},
+                status=400)
+
+        # Malformed dates are the client's error, so are rejected here
+        # rather than failing in the batch
+
+        try:
+            for response in responses:
+                service.featurizer.dates(response)
+        except (ValueError, TypeError) as error:
+            return web.json_response({'error': 'invalid date: %s' % error}, status=400)
+
+        features = await service.featurize(responses)
+        service.latencies.append(time.perf_counter() - start)
+
+        return web.json_response({'features': features if batch else features[0]})
+
+    async def features(request):
+        return await respond(request, batch=False)
+
+    async def batch_features(request):
+        return await respond(request, batch=True)
+
+    async def health(request):
+        return web.json_response({'status': 'ok', 'columns': ResponseFeaturizer.columns})
+
+    async def metrics(request):
+        return web.json_response(service.metrics())
+
+    async def on_startup(app):
+        await service.start()
+
+    async def on_cleanup(app):
+        await service.stop()
+
+    app = web.Application()
+    app.router.add_post('/features', features)
+    app.router.add_post('/features/batch', batch_features)
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+    return app
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--transformer', required=True,
+                        help='transformer saved by FeatureTransformer.save')
+    parser.add_argument('--cache', help='LookupCache file of content API lookups')
+    parser.add_argument('--lookup', action='store_true',
+                        help='look up pages missing from the cache in the content API')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-wait', type=float, default=0.002)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    service = FeatureService(FeatureTransformer.load(args.transformer),
+                             cache=LookupCache(args.cache) if args.cache else None,
+                             client=ContentAPIClient() if args.lookup else None,
+                             max_batch=args.max_batch, max_wait=args.max_wait)
+
+    import_aiohttp().web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+# coding: utf-8
+"""
+Offline index of a bulk dump of the search API, for resolving pages
+without the network
+
+Usage: python -m classifyintents.snapshot dump.jsonl snapshot.db
+"""
+
+import json
+import logging
+import sqlite3
+import argparse
+from urllib.parse import urlparse
+from .content_api import lookup_row
+
+logger = logging.getLogger('classifyintents')
+
+
+def snapshot_row(record):
+    """
+    Parse a record of a search API dump into a row of the org_sect lookup
+
+    :param record: <dict> A search API result, with the fields link,
+    organisations (titles, or dicts with a title) and
+    mainstream_browse_pages.
+    :return: <list> Row of the org_sect lookup, as get_org would return.
+    """
+
+    organisations = [org if isinstance(org, dict) else {'title': org}
+                     for org in record.get('organisations') or []]
+
+    return lookup_row({'results': [{
+        'organisations': organisations,
+        'mainstream_browse_pages': record.get('mainstream_browse_pages') or []}]})
+
+
+def ancestors(page, min_depth=2):
+    """
+    The parent paths of a page, nearest first
+
+    :param page: <str> Page, e.g. /topic/land-registration/searches.
+    :param min_depth: <int> Fewest path segments an ancestor may have.
+    :return: <list> e.g. ['/topic/land-registration'] for min_depth 2.
+    """
+
+    parts = page.rstrip('/').split('/')
+
+    return ['/'.join(parts[:i]) for i in range(len(parts) - 1, min_depth, -1)]
+
+
+class SnapshotIndex:
+    """
+    Single file SQLite index of org_sect rows from a dump of the search API
+
+    Built once from a JSON lines dump with build(), then used by
+    survey.api_lookup to resolve pages before falling back to the network.
+    Pages that are not in the index take the row of their nearest ancestor
+    that is (e.g. /topic/land-registration for
+    /topic/land-registration/searches), if prefix matching is on.
+    """
+
+    def __init__(self, path, prefix=True, min_depth=2):
+        """
+        :param path: <str> Path to an index created by build().
+        :param prefix: <bool> Resolve pages missing from the index from
+        their nearest ancestor that is in it.
+        :param min_depth: <int> Fewest path segments an ancestor must have
+        to be used. The default of 2 stops e.g. /government resolving
+        everything beneath it.
+        """
+
+        self.path = path
+        self.prefix = prefix
+        self.min_depth = min_depth
+
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(path)
+
+    def __len__(self):
+
+        return self.connection.execute('SELECT COUNT(*) FROM snapshot').fetchone()[0]
+
+    @classmethod
+    def build(cls, dump, path, batch_size=10000):
+        """
+        Build an index from a JSON lines dump of the search API
+
+        Each line is a result with a link (a path, or a url on GOV.UK),
+        organisations and mainstream_browse_pages. If a link appears more
+        than once, the first is kept, as the API lookup would keep the
+        first result.
+
+        :param dump: <str> Path to the dump.
+        :param path: <str> Path to write the index to. An existing index is
+        added to.
+        :param batch_size: <int> Number of rows to insert at a time.
+        :return: <SnapshotIndex> The index.
+        """
+
+        connection = sqlite3.connect(path)
+
+        # The index can be rebuilt from the dump, so does not need to
+        # survive a crash part way through building it
+
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute('CREATE TABLE IF NOT EXISTS snapshot ('
+                           'page TEXT PRIMARY KEY, row TEXT NOT NULL) WITHOUT ROWID')
+
+        def insert(records):
+            with connection:
+                connection.executemany(
+                    'INSERT OR IGNORE INTO snapshot (page, row) VALUES (?, ?)', records)
+
+        records = []
+        n = 0
+
+        with open(dump) as f:
+            for line in f:
+
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                page = urlparse(record['link']).path.rstrip('/') or '/'
+
+                records.append((page, json.dumps(snapshot_row(record))))
+                n += 1
+
+                if len(records) == batch_size:
+                    insert(records)
+                    records = []
+
+        insert(records)
+        connection.close()
+
+        logger.info('Indexed %s search API results from %s in %s', n, dump, path)
+
+        return cls(path)
+
+    def get_many(self, pages):
+        """
+        Get the rows of pages that are in the index
+
+        :param pages: <iterable> Pages to look up exactly.
+        :return: <dict> Mapping of page to org_sect row.
+        """
+
+        pages = list(set(pages))
+        found = {}
+
+        # Stay below SQLite's limit on the number of query parameters
+
+        for i in range(0, len(pages), 500):
+            batch = pages[i:i + 500]
+            query = ('SELECT page, row FROM snapshot WHERE page IN (%s)'
+                     % ','.join('?' * len(batch)))
+
+            for page, row in self.connection.execute(query, batch):
+                found[page] = json.loads(row)
+
+        return found
+
+    def resolve_many(self, pages):
+        """
+        Resolve pages against the index
+
+        :param pages: <iterable> Pages to resolve.
+        :return: <dict> Mapping of page to org_sect row, for pages that were
+        found, or had an ancestor that was found if prefix is set.
+        """
+
+        pages = set(pages)
+
+        # Trailing slashes are not indexed
+
+        keys = {page: page.rstrip('/') or '/' for page in pages}
+        found = self.get_many(keys.values())
+        resolved = {page: found[key] for page, key in keys.items() if key in found}
+
+        missing = [page for page in pages if page not in resolved]
+        self.hits += len(resolved)
+
+        if self.prefix and missing:
+
+            parents = {page: ancestors(keys[page], self.min_depth) for page in missing}
+            found = self.get_many({p for paths in parents.values() for p in paths})
+
+            for page, paths in parents.items():
+                for path in paths:
+                    if path in found:
+                        resolved[page] = found[path]
+                        self.prefix_hits += 1
+                        break
+
+        self.misses += len(pages) - len(resolved)
+
+        return resolved
+
+    def log_stats(self):
+        """
+        Log the hit and miss counts through the classifyintents logger
+        """
+
+        logger.info('Snapshot index %s: %s hits, %s from an ancestor, %s misses',
+                    self.path, self.hits, self.prefix_hits, self.misses)
+
+    def close(self):
+
+        self.connection.close()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Build an offline index of a '
+                                     'search API dump for survey.api_lookup')
+    parser.add_argument('dump', help='JSON lines dump of the search API')
+    parser.add_argument('index', help='path to write the SQLite index to')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    index = SnapshotIndex.build(args.dump, args.index)
+    print('%s pages indexed in %s' % (len(index), args.index))
+
+
+if __name__ == '__main__':
+    main()
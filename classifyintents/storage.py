@@ -0,0 +1,195 @@
+# coding: utf-8
+"""
+Reading and writing survey data as csv, Parquet, Feather or pickle
+
+Parquet and Feather are columnar, so only the columns that are needed are
+read, and categorical columns keep their dtype when written. They need
+pyarrow, which is an optional dependency:
+
+    pip install classifyintents[parquet]
+
+Pickle files also keep their dtypes, without pyarrow, but should only be
+read by the same version of pandas that wrote them.
+"""
+
+import os
+import pandas as pd
+
+PARQUET = ('.parquet', '.pq')
+FEATHER = ('.feather', '.arrow')
+PICKLE = ('.pkl', '.pickle')
+
+
+def file_format(path):
+    """
+    The format of a data file, from its extension: csv, parquet, feather
+    or pickle
+    """
+
+    extension = os.path.splitext(str(path))[1].lower()
+
+    if extension in PARQUET:
+        return 'parquet'
+    elif extension in FEATHER:
+        return 'feather'
+    elif extension in PICKLE:
+        return 'pickle'
+    return 'csv'
+
+
+def import_pyarrow():
+    """
+    Import pyarrow, with a helpful message if it is not installed
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+
+    except ImportError:
+        raise ImportError('Reading and writing Parquet and Feather files requires '
+                          'pyarrow: pip install classifyintents[parquet]')
+    return pyarrow
+
+
+def select_columns(names, usecols):
+    """
+    Names of the columns to read
+
+    :param names: <list> All of the columns in the file.
+    :param usecols: <callable> Returns True for columns that should be read,
+    as for pd.read_csv. None to read all columns.
+    """
+
+    if usecols is None:
+        return list(names)
+
+    return [name for name in names if usecols(name)]
+
+
+def read_frame(path, usecols=None):
+    """
+    Read a csv, Parquet, Feather or pickle file into a DataFrame
+
+    For Parquet and Feather files, columns not selected by usecols are
+    never read from disk.
+
+    :param path: <str> Path to the data file.
+    :param usecols: <callable> Returns True for columns that should be read.
+    """
+
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=usecols)
+
+    if fmt == 'pickle':
+        frame = pd.read_pickle(path)
+        return frame[select_columns(frame.columns, usecols)]
+
+    pyarrow = import_pyarrow()
+
+    if fmt == 'parquet':
+        names = pyarrow.parquet.read_schema(path).names
+        columns = select_columns(names, usecols)
+        frame = pyarrow.parquet.read_table(path, columns=columns).to_pandas()
+
+    else:
+        names = pyarrow.ipc.open_file(pyarrow.memory_map(path)).schema.names
+        columns = select_columns(names, usecols)
+        frame = pyarrow.feather.read_feather(path, columns=columns)
+
+    return frame
+
+
+def read_chunks(path, chunksize, usecols=None):
+    """
+    Read a csv or Parquet file in chunks
+
+    Chunks are indexed by their row number in the file, as they are by
+    pd.read_csv. Feather and pickle files are read whole, then split into
+    chunks.
+
+    :param path: <str> Path to the data file.
+    :param chunksize: <int> Number of rows in each chunk.
+    :param usecols: <callable> Returns True for columns that should be read.
+    :return: <generator> DataFrame for each chunk.
+    """
+
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+            yield chunk
+        return
+
+    if fmt in ('feather', 'pickle'):
+        frame = read_frame(path, usecols)
+        for start in range(0, len(frame), chunksize):
+            yield frame.iloc[start:start + chunksize]
+        return
+
+    pyarrow = import_pyarrow()
+    parquet = pyarrow.parquet.ParquetFile(path)
+    columns = select_columns(parquet.schema_arrow.names, usecols)
+    start = 0
+
+    for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def write_frame(frame, path):
+    """
+    Write a DataFrame to a csv, Parquet, Feather or pickle file
+
+    Parquet, Feather and pickle files keep category dtypes. Feather cannot
+    store an index, so it is written as an 'index' column, which read_saved
+    restores.
+
+    :param frame: <pd.DataFrame> Data to write.
+    :param path: <str> Path to write to. The format is set by the extension.
+    """
+
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        frame.to_csv(path)
+
+    elif fmt == 'pickle':
+        frame.to_pickle(path)
+
+    elif fmt == 'parquet':
+        import_pyarrow()
+        frame.to_parquet(path, engine='pyarrow')
+
+    else:
+        import_pyarrow()
+        frame.reset_index().to_feather(path)
+
+
+def read_saved(path):
+    """
+    Read a DataFrame written by write_frame, restoring its index
+
+    :param path: <str> Path to the file.
+    """
+
+    fmt = file_format(path)
+
+    if fmt == 'csv':
+        return pd.read_csv(path, index_col=0)
+
+    if fmt == 'pickle':
+        return pd.read_pickle(path)
+
+    frame = read_frame(path)
+
+    if fmt == 'feather':
+        frame = frame.set_index('index')
+        frame.index.name = None
+
+    return frame
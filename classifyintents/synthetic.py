@@ -0,0 +1,221 @@
+# coding: utf-8
+"""
+Generate synthetic intent survey exports, for benchmarking at scale
+
+The data have the columns of a Smart Survey export, with urls, comments
+and answers drawn from distributions resembling real surveys: a few pages
+account for most responses, with a long tail of pages seen once or twice;
+around half of the free text questions are left blank ('-'); and comment
+lengths are log-normally distributed.
+"""
+
+import numpy as np
+import pandas as pd
+from .classifyintents import survey
+
+COLUMNS = ['UserID', 'UserNo', 'Name', 'Email', 'IP Address', 'Unique ID',
+           'Started', 'Ended', 'Tracking Link', 'Page Path', 'clientID',
+           'Q1. Are you using GOV.UK for professional or personal reasons?',
+           'Q2. What kind of work do you do?',
+           'Q3. Describe why you came to GOV.UK todayPlease do not include personal or financial information, eg your National Insurance number or credit card details.',
+           'Q4. Have you found what you were looking for?',
+           'Q5. Overall, how did you feel about your visit to GOV.UK today?',
+           'Q6. Have you been anywhere else for help with this already?',
+           'Q7. Where did you go for help?',
+           'Q8. If you wish to comment further, please do so here.Please do not include personal or financial information, eg your National Insurance number or credit card details.']
+
+WORDS = ['tax', 'car', 'vehicle', 'passport', 'renew', 'apply', 'application',
+         'licence', 'driving', 'test', 'book', 'change', 'address', 'benefit',
+         'universal', 'credit', 'pension', 'state', 'visa', 'council', 'form',
+         'payment', 'pay', 'online', 'account', 'login', 'password', 'check',
+         'status', 'contact', 'number', 'phone', 'email', 'help', 'find',
+         'information', 'how', 'to', 'my', 'the', 'for', 'a', 'of', 'and', 'i',
+         'need', 'wanted', 'could', 'not', 'website', 'service', 'work',
+         'company', 'business', 'self', 'assessment', 'return', 'vat', 'hmrc',
+         'dvla', 'gov', 'uk', 'get', 'is', 'was', 'it', 'on', 'in', 'with',
+         'job', 'school', 'student', 'loan', 'marriage', 'birth', 'certificate',
+         'register', 'guidance', 'rules', 'travel', 'abroad', 'insurance',
+         'national', 'mot', 'fine', 'court', 'housing', 'rent', 'carer',
+         'allowance', 'child', 'maintenance', 'easy', 'useful', 'confusing']
+
+SLUGS = ['vehicle-tax', 'renew-passport', 'apply-for-a-passport', 'book-driving-test',
+         'check-mot-history', 'universal-credit', 'state-pension', 'council-tax',
+         'pay-self-assessment-tax-bill', 'log-in-register-hmrc-online-services',
+         'change-address-driving-licence', 'sold-bought-vehicle', 'jobsearch',
+         'student-finance', 'register-to-vote', 'bank-holidays', 'contact-dvla',
+         'child-benefit', 'apply-first-provisional-driving-licence', 'visas-immigration']
+
+BROWSE = ['driving', 'tax', 'benefits', 'working', 'citizenship', 'education',
+          'business', 'housing-local-services', 'visas-immigration', 'justice',
+          'abroad', 'childcare-parenting', 'employing-people', 'births-deaths-marriages']
+
+COUNTRIES = ['spain', 'france', 'turkey', 'japan', 'india', 'usa', 'germany',
+             'thailand', 'china', 'australia']
+
+ANSWERS = {
+    'clientID': (['Personal', 'Professional', '-'], [0.74, 0.25, 0.01]),
+    'Q1': (['Personal', 'Professional', '-'], [0.72, 0.25, 0.03]),
+    'Q4': (['Yes', 'No', 'Not sure / Not yet', '-'], [0.55, 0.25, 0.15, 0.05]),
+    'Q5': (['Very satisfied', 'Satisfied', 'Neither satisfied or dissatisfied',
+            'Dissatisfied', 'Very dissatisfied', '-'],
+           [0.2, 0.3, 0.15, 0.15, 0.15, 0.05]),
+    'Q6': (['Yes', 'No', '-'], [0.3, 0.6, 0.1]),
+    }
+
+
+def zipf_weights(n, exponent=1.1):
+    """
+    Normalised weights proportional to 1 / rank ** exponent
+    """
+
+    weights = 1 / np.arange(1, n + 1) ** exponent
+
+    return weights / weights.sum()
+
+
+def format_minutes(minutes, start='2017-03-01'):
+    """
+    Format minutes after start as Smart Survey dates, e.g. 09/03/2017 14:07:00
+
+    Each distinct minute is only formatted once.
+
+    :param minutes: <np.array> Integer minutes after start.
+    :param start: <str> Date of minute 0.
+    """
+
+    unique, inverse = np.unique(minutes, return_inverse=True)
+    dates = pd.Timestamp(start) + pd.to_timedelta(unique, unit='m')
+
+    return np.asarray(dates.strftime('%d/%m/%Y %H:%M:%S'), dtype=object)[inverse]
+
+
+def page_paths(n, random):
+    """
+    A vocabulary of n distinct GOV.UK paths, most popular first
+
+    :param n: <int> Number of paths.
+    :param random: <np.random.RandomState> Random number generator.
+    """
+
+    paths = ['/', '/search'] + ['/' + slug for slug in SLUGS]
+    paths += ['/browse/%s' % b for b in BROWSE]
+    paths += ['/government/world/%s' % c for c in COUNTRIES]
+    seen = set(paths)
+
+    kinds = ['/browse/%s/%s', '/government/publications/%s-%s', '/guidance/%s-%s',
+             '/government/organisations/%s-%s', '/topic/%s/%s', '/%s-%s',
+             '/%s/%s']
+
+    # Draw candidates in bulk, discarding duplicates, until there are enough
+
+    while len(paths) < n:
+        size = 2 * (n - len(paths))
+        kind = random.randint(len(kinds), size=size)
+        first = random.randint(len(WORDS), size=size)
+        section = random.randint(len(BROWSE), size=size)
+        lengths = random.randint(1, 6, size=size)
+        words = np.array(WORDS)[random.randint(len(WORDS), size=lengths.sum())]
+        ends = np.cumsum(lengths)
+
+        for i in range(size):
+            prefix = BROWSE[section[i]] if kind[i] == 0 else WORDS[first[i]]
+            path = kinds[kind[i]] % (prefix, '-'.join(words[ends[i] - lengths[i]:ends[i]]))
+
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+
+    return np.array(paths[:n], dtype=object)
+
+
+def comments(rows, random, blank=0.5, median_words=8):
+    """
+    Free text answers: '-' for blanks, otherwise sentences of random words
+
+    :param rows: <int> Number of answers.
+    :param random: <np.random.RandomState> Random number generator.
+    :param blank: <float> Proportion of answers left blank.
+    :param median_words: <int> Median number of words in a comment.
+    """
+
+    filled = random.rand(rows) >= blank
+    n = int(filled.sum())
+
+    lengths = np.maximum(1, random.lognormal(np.log(median_words), 0.8, n).astype(int))
+    words = np.array(WORDS, dtype=object)[random.choice(len(WORDS), lengths.sum(),
+                                                        p=zipf_weights(len(WORDS), 0.8))]
+
+    # Some words are shouted
+
+    shout = random.rand(len(words)) < 0.03
+    words[shout] = [w.upper() for w in words[shout]]
+
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    stops = random.choice(['.', '!', '?', '!!!', ''], n, p=[0.6, 0.1, 0.1, 0.05, 0.15])
+
+    sentences = [' '.join(words[a:b]) + stop for a, b, stop in zip(starts, ends, stops)]
+    sentences = [s[:1].upper() + s[1:] for s in sentences]
+
+    answers = np.full(rows, '-', dtype=object)
+    answers[filled] = sentences
+
+    return answers
+
+
+def synthetic_survey(rows, seed=None, classified=True, pages=None):
+    """
+    Generate a synthetic survey export
+
+    The result can be written to csv and loaded with survey.load, as a
+    real export would be.
+
+    :param rows: <int> Number of responses.
+    :param seed: <int> Seed for the random number generator, for
+    reproducible data.
+    :param classified: <bool> Add a target column of codes, as in a
+    classified survey, for use with survey.trainer.
+    :param pages: <int> Number of distinct page paths. Defaults to one for
+    every five responses.
+    :return: <pd.DataFrame> Synthetic survey export.
+    """
+
+    random = np.random.RandomState(seed)
+
+    if pages is None:
+        pages = max(50, rows // 5)
+
+    data = pd.DataFrame(index=pd.RangeIndex(rows))
+
+    data['UserID'] = random.choice(np.arange(10000000, 10000000 + 10 * rows), rows,
+                                   replace=False)
+    data['UserNo'] = random.randint(1, 1000, rows)
+
+    for col in ['Name', 'Email', 'IP Address', 'Unique ID']:
+        data[col] = np.nan
+
+    # Responses over a month, taking a few minutes each
+
+    started = random.randint(0, 28 * 24 * 60, rows)
+    duration = np.ceil(random.lognormal(np.log(3), 0.7, rows)).astype(int)
+
+    data['Started'] = format_minutes(started)
+    data['Ended'] = format_minutes(started + duration)
+    data['Tracking Link'] = random.choice(['Default Web Link',
+                                           'Variant for Frequency 1 in 2'], rows)
+    data['Page Path'] = page_paths(pages, random)[
+        random.choice(pages, rows, p=zipf_weights(pages))]
+
+    for col in COLUMNS[10:]:
+        key = col.split('.')[0]
+
+        if key in ANSWERS:
+            choices, p = ANSWERS[key]
+            data[col] = random.choice(choices, rows, p=p)
+        else:
+            data[col] = comments(rows, random, blank=0.2 if key == 'Q3' else 0.6)
+
+    if classified:
+        data['target'] = random.choice(survey.code_levels, rows)
+
+    return data
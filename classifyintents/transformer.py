@@ -0,0 +1,86 @@
+# coding: utf-8
+"""
+Fitted feature transformer, for calculating features in new data
+"""
+
+import json
+import numpy as np
+
+
+class FeatureTransformer:
+    """
+    Statistics and encodings fitted to the data a model was trained on
+
+    Holds what survey.clean_raw and survey.trainer fit to their data: the
+    time_delta mean and standard deviation, the mean, min and max of each
+    comment length, the levels of each category and the target classes.
+    Passing a transformer to survey() makes clean_raw and predictor use
+    these rather than refitting to each new batch, so that new data are
+    given the same integer codes as the training data.
+    """
+
+    def __init__(self, stats, target_levels=None):
+        """
+        :param stats: <dict> Statistics and levels, as in survey.stats.
+        :param target_levels: <list> Classes of the target encoder.
+        """
+
+        self.stats = stats
+        self.target_levels = target_levels
+
+    @property
+    def levels(self):
+
+        return self.stats['levels']
+
+    @classmethod
+    def from_survey(cls, intent):
+        """
+        Create a transformer from a survey after trainer or predictor
+
+        :param intent: <survey> Survey object that has been trained on.
+        """
+
+        target_levels = getattr(intent.target_encoder, 'classes_', None)
+
+        if target_levels is not None:
+            target_levels = target_levels.tolist()
+
+        return cls(intent.stats, target_levels)
+
+    def target_encoder(self):
+        """
+        A LabelEncoder fitted to the target classes
+        """
+
+        from sklearn.preprocessing import LabelEncoder
+
+        encoder = LabelEncoder()
+
+        if self.target_levels is not None:
+            encoder.classes_ = np.array(self.target_levels, dtype='object')
+
+        return encoder
+
+    def save(self, path):
+        """
+        Save the transformer to a json file
+
+        :param path: <str> Path to save to.
+        """
+
+        with open(path, 'w') as f:
+            json.dump({'stats': self.stats, 'target_levels': self.target_levels}, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a transformer saved by save()
+
+        :param path: <str> Path to load from.
+        """
+
+        with open(path) as f:
+            fitted = json.load(f)
+
+        return cls(fitted['stats'], fitted['target_levels'])
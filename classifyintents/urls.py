@@ -0,0 +1,162 @@
+# coding: utf-8
+"""
+Rules for reducing full_url to the page that is queried from the API
+
+The rule set is compiled once at import. Each distinct url is normalised
+once by normalise_url, which is memoized with a bounded LRU cache, and
+url_rules maps the results back to the rows of a column by their codes,
+so the cost scales with the number of distinct urls rather than rows.
+"""
+
+import re
+from functools import lru_cache
+
+FCO_ORG = 'Foreign & Commonwealth Office'
+FCO_PAGE = '/government/world'
+
+FCO_PATTERN = re.compile(r'/government/world')
+GOVERNMENT_PATTERN = re.compile(r'\/guidance|\/government')
+BROWSE_PATTERN = re.compile(r'\/browse')
+BROWSE_SECTION_PATTERN = re.compile(r'\/?browse/')
+
+# The rule that matched each url
+
+EMPTY, WORLD, GOVERNMENT, BROWSE, TOP_LEVEL = range(5)
+
+# Number of distinct urls for which normalise_url remembers its result
+
+URL_CACHE_SIZE = 2 ** 16
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def normalise_url(url):
+    """
+    Apply the url rules to a single url
+
+    The rules are applied in order, and the first to match a url wins:
+
+    * '/' or missing: page is left blank.
+    * /government/world: page is /government/world and org is set to FCO.
+    * /guidance or /government: page is the full url (if org is not set).
+    * /browse: page is /browse/xxx and section is xxx (if section is not set).
+    * Otherwise: page is stripped back to the top level.
+
+    :param url: <str> Cleaned full_url, 'nan' if missing.
+    :return: <tuple> The rule that matched, the page, and the section to
+    set for /browse urls (None for other rules).
+    """
+
+    if url == '/' or url == 'nan':
+        return EMPTY, str(), None
+
+    if FCO_PATTERN.search(url):
+        return WORLD, FCO_PAGE, None
+
+    if GOVERNMENT_PATTERN.search(url):
+        return GOVERNMENT, url, None
+
+    if BROWSE_PATTERN.search(url):
+
+        # Split on the first three slashes, as reg_match does
+
+        if BROWSE_SECTION_PATTERN.search(url):
+            parts = url.split('/', 3)
+
+            # e.g. browse/browse has no third part, so no page or section
+
+            if len(parts) < 3:
+                return BROWSE, float('nan'), float('nan')
+
+            return BROWSE, '/' + parts[1] + '/' + parts[2], parts[2]
+
+        return BROWSE, url, url
+
+    if '/' in url:
+        return TOP_LEVEL, '/' + url.split('/', 3)[1], None
+
+    return TOP_LEVEL, '/' + url, None
+
+
+def url_rules(full_url, org, section):
+    """
+    Apply the URL cleaning rules to a whole column of urls
+
+    Equivalent to running reg_match over each row, as described in
+    normalise_url. The distinct urls are normalised once each, and the
+    results mapped back to rows by their codes: full_url's own codes if it
+    is categorical (e.g. in low_memory mode), otherwise from pd.factorize.
+
+    :param full_url: <pd.Series> Cleaned full_url feature.
+    :param org: <pd.Series> Org feature, with 'nan' where not set.
+    :param section: <pd.Series> Section feature, with 'nan' where not set.
+    :return: <pd.DataFrame> page, org and section, with the index of full_url.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    try:
+
+        if full_url.dtype.name == 'category':
+            codes = np.asarray(full_url.cat.codes)
+            uniques = full_url.cat.categories.astype('str')
+        else:
+            codes, uniques = pd.factorize(full_url.astype('str'))
+
+        # Missing values are coded -1, so add their result to the end
+
+        normalised = [normalise_url(url) for url in uniques] + [normalise_url('nan')]
+
+        rule = np.array([n[0] for n in normalised])[codes]
+        page = np.array([n[1] for n in normalised], dtype='object')[codes]
+        browse_section = np.array([n[2] for n in normalised], dtype='object')[codes]
+
+        org = org.astype('str')
+        section = section.astype('str')
+
+        org = org.where(rule != WORLD, FCO_ORG)
+        page[(rule == GOVERNMENT) & (org != 'nan').values] = str()
+
+        unset = (rule == BROWSE) & (section == 'nan').values
+        section = section.where(~unset, browse_section)
+
+        rules = pd.DataFrame({'page': page, 'org': org, 'section': section},
+                             index=full_url.index, columns=['page', 'org', 'section'])
+
+    except Exception:
+        print('There was an error applying url rules to full_url')
+        raise
+    return rules
+
+
+def reg_match(r, x, i):
+
+    # r = uncompiled regex query
+    # x = string to search
+    # i = index of captive group (0 = all)
+
+    # NOTE: url_rules applies the same rules to whole columns at once.
+
+    p = compile_pattern(r + '/')
+    s = p.search(x)
+
+    if s:
+        t = x.split('/', 3)
+        if i == 0:
+            found = t[1]
+        if i == 1:
+            found = '/' + t[1] + '/' + t[2]
+        elif i == 2:
+            found = t[2]
+    else:
+        found = x
+    return found
+
+
+@lru_cache(maxsize=128)
+def compile_pattern(r):
+    """
+    Compile a regular expression, remembering the most recent patterns
+    """
+
+    return re.compile(r)
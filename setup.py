@@ -9,5 +9,6 @@ setup(name='classifyintents',
       author_email='matthew.upson@digital.cabinet-office.gov.uk',
       license='MIT',
       zip_safe=False,
-      install_requires=['pandas', 'numpy', 'scikit-learn']
+      install_requires=['pandas', 'numpy', 'scikit-learn'],
+      extras_require={'parquet': ['pyarrow'], 'service': ['aiohttp']}
      )
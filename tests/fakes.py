@@ -0,0 +1,72 @@
+# coding: utf-8
+"""
+Fake content API client and survey setup shared by the api_lookup tests
+"""
+
+import pandas as pd
+import classifyintents
+
+FOUND = ['HM Revenue & Customs'] + ['null'] * 4 + ['tax'] + ['null'] * 3
+NULL = ['null'] * 9
+FAILED = ['none'] * 9
+
+
+class FakeClient:
+    """
+    Stands in for ContentAPIClient, recording the pages it is asked for
+
+    Pages are given their row in rows, or default if they are not in it.
+    If fail is set, every page is given the row ContentAPIClient returns
+    for a failed request, and if fail_after is set, get_orgs raises once
+    that many pages have been looked up.
+    """
+
+    def __init__(self, rows=None, default=FOUND, fail=False, fail_after=None):
+        self.rows = rows or {}
+        self.default = default
+        self.fail = fail
+        self.fail_after = fail_after
+        self.pages = []
+
+    def get_orgs(self, pages, progress=None):
+
+        if self.fail_after is not None and len(self.pages) >= self.fail_after:
+            raise ConnectionError('Lookup failed')
+
+        self.pages.extend(pages)
+
+        if progress is not None:
+            progress.update(len(pages))
+
+        if self.fail:
+            return [FAILED for page in pages]
+
+        return [self.rows.get(page, self.default) for page in pages]
+
+
+def cleaned_survey(path='test_data/raw_test_data_3.csv'):
+    """
+    A survey that has been loaded, and had clean_raw and clean_urls run
+    """
+
+    intent = classifyintents.survey()
+    intent.load(path)
+    intent.clean_raw()
+    intent.clean_urls()
+
+    return intent
+
+
+def looked_up_survey(pages, **kwargs):
+    """
+    A cleaned survey, with api_lookup run on pages
+
+    :param pages: <list> Pages to set as survey.unique_pages.
+    :param kwargs: Keyword arguments for api_lookup, e.g. client.
+    """
+
+    intent = cleaned_survey()
+    intent.unique_pages = pd.DataFrame({'page': pages})
+    intent.api_lookup(**kwargs)
+
+    return intent
@@ -0,0 +1,80 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+from classifyintents import LookupCache
+from .fakes import FakeClient, FOUND, NULL, looked_up_survey
+
+class TestLookupCache:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing LookupCache')
+
+        self.tmp = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def teardown_class(self):
+
+        self.tmp.cleanup()
+
+    def cache(self, name, **kwargs):
+
+        return LookupCache(os.path.join(self.tmp.name, name), **kwargs)
+
+    def test_cache_persists_between_instances(self):
+
+        cache = self.cache('persist.sqlite')
+        cache.set_many({'/a': FOUND})
+        cache.close()
+
+        cache = self.cache('persist.sqlite')
+
+        nt.assert_equal(cache.get('/a'), FOUND)
+        nt.assert_equal((cache.hits, cache.misses), (1, 0))
+
+    def test_cache_counts_misses(self):
+
+        cache = self.cache('misses.sqlite')
+
+        nt.assert_equal(cache.get_many(['/a', '/b']), {})
+        nt.assert_equal((cache.hits, cache.misses), (0, 2))
+
+    def test_cache_expires_rows_after_ttl(self):
+
+        cache = self.cache('ttl.sqlite', ttl=-1)
+        cache.set_many({'/a': FOUND})
+
+        nt.assert_is_none(cache.get('/a'))
+
+    def test_cache_stores_negative_results_with_their_own_ttl(self):
+
+        cache = self.cache('negative.sqlite', negative_ttl=-1)
+        cache.set_many({'/a': FOUND, '/missing': ['null'] * 9})
+
+        nt.assert_equal(cache.get_many(['/a', '/missing']), {'/a': FOUND})
+
+        cache.negative_ttl = None
+
+        nt.assert_equal(cache.get('/missing'), ['null'] * 9)
+        nt.assert_equal(cache.negative_hits, 1)
+
+    def test_cache_does_not_store_failed_lookups(self):
+
+        cache = self.cache('failed.sqlite')
+        cache.set_many({'/a': ['none'] * 9})
+
+        nt.assert_equal(len(cache), 0)
+
+    def test_api_lookup_only_sends_misses_to_the_api(self):
+
+        cache = self.cache('api_lookup.sqlite')
+        cache.set_many({'/a': FOUND})
+        client = FakeClient(rows={'/missing': NULL})
+        intent = looked_up_survey(['/a', '/b', '/missing'], client=client, cache=cache)
+
+        nt.assert_equal(client.pages, ['/b', '/missing'])
+        nt.assert_equal(intent.org_sect['organisation0'].tolist(),
+                        ['HM Revenue & Customs', 'HM Revenue & Customs', 'null'])
+        nt.assert_equal(len(cache), 3)
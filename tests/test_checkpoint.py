@@ -0,0 +1,64 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+from classifyintents import LookupCheckpoint, Progress
+from .fakes import FakeClient, FOUND, looked_up_survey
+
+class TestLookupCheckpoint:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing LookupCheckpoint')
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pages = ['/page-%s' % i for i in range(10)]
+
+    @classmethod
+    def teardown_class(self):
+
+        self.tmp.cleanup()
+
+    def test_interrupted_lookup_resumes_from_checkpoint(self):
+
+        path = os.path.join(self.tmp.name, 'resume.jsonl')
+        checkpoint = LookupCheckpoint(path, batch_size=4)
+
+        with nt.assert_raises(ConnectionError):
+            looked_up_survey(self.pages, client=FakeClient(fail_after=8),
+                             checkpoint=checkpoint)
+
+        nt.assert_equal(len(checkpoint.load()), 8)
+
+        client = FakeClient()
+        intent = looked_up_survey(self.pages, client=client, checkpoint=checkpoint)
+
+        nt.assert_equal(client.pages, self.pages[8:])
+        nt.assert_equal(intent.org_sect['organisation0'].tolist(), [FOUND[0]] * 10)
+        nt.assert_equal(intent.metrics[-1]['resumed'], 8)
+        nt.assert_false(os.path.exists(path))
+
+    def test_incomplete_lines_and_failed_lookups_are_skipped(self):
+
+        path = os.path.join(self.tmp.name, 'partial.jsonl')
+        checkpoint = LookupCheckpoint(path)
+
+        checkpoint.save({'/a': FOUND, '/b': ['none'] * 9})
+
+        with open(path, 'a') as f:
+            f.write('["/c", ["HM')
+
+        checkpoint.save({'/d': FOUND})
+
+        nt.assert_equal(checkpoint.load(), {'/a': FOUND, '/d': FOUND})
+
+
+def test_progress_estimates_time_remaining():
+
+    progress = Progress(100, interval=0)
+    progress.start -= 10
+    progress.update(25)
+
+    nt.assert_almost_equal(progress.rate, 2.5, places=2)
+    nt.assert_almost_equal(progress.eta, 30, places=0)
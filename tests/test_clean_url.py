@@ -92,3 +92,69 @@ class TestCleanUrls:
                 self.c.data['org'].tolist(),
                 self.data_expected_org 
                 )
+
+class TestUrlRules:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing url_rules on hand written edge cases')
+
+        self.full_url = pd.Series([
+            '/', 'nan', '/government/world/france', '/guidance/a/b',
+            '/government/news/c', '/browse/benefits/tax', '/browse',
+            '/vehicle-tax/renew', 'noslash'
+            ])
+
+        self.org = pd.Series(['nan'] * len(self.full_url))
+        self.org[4] = 'hm revenue & customs'
+
+        self.section = pd.Series(['nan'] * len(self.full_url))
+
+        self.rules = classifyintents.url_rules(self.full_url, self.org, self.section)
+
+    def test_url_rules_returns_expected_page(self):
+
+        nt.assert_equal(
+                self.rules['page'].tolist(),
+                ['', '', '/government/world', '/guidance/a/b', '',
+                 '/browse/benefits', '/browse', '/vehicle-tax', '/noslash']
+                )
+
+    def test_url_rules_returns_expected_org(self):
+
+        nt.assert_equal(
+                self.rules['org'].tolist(),
+                ['nan', 'nan', 'Foreign & Commonwealth Office', 'nan',
+                 'hm revenue & customs', 'nan', 'nan', 'nan', 'nan']
+                )
+
+    def test_url_rules_returns_expected_section(self):
+
+        nt.assert_equal(
+                self.rules['section'].tolist(),
+                ['nan', 'nan', 'nan', 'nan', 'nan', 'benefits', '/browse',
+                 'nan', 'nan']
+                )
+
+    def test_url_rules_does_not_modify_inputs(self):
+
+        nt.assert_equal(self.org.tolist().count('nan'), len(self.org) - 1)
+        nt.assert_equal(self.section.tolist().count('nan'), len(self.section))
+
+    def test_url_rules_on_categorical_full_url_matches_object(self):
+
+        full_url = self.full_url.astype('category')
+        rules = classifyintents.url_rules(full_url, self.org, self.section)
+
+        nt.assert_true(rules.equals(self.rules))
+
+    def test_normalise_url_is_memoized(self):
+
+        normalise_url.cache_clear()
+
+        nt.assert_equal(normalise_url('/browse/benefits/tax'),
+                        (3, '/browse/benefits', 'benefits'))
+        normalise_url('/browse/benefits/tax')
+
+        nt.assert_equal(normalise_url.cache_info().hits, 1)
@@ -0,0 +1,91 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+import pandas as pd
+import classifyintents
+from classifyintents import read_saved, file_format
+
+RAW = 'test_data/raw_test_data_classified.csv'
+
+
+def run(path, low_memory=False):
+
+    intent = classifyintents.survey(low_memory=low_memory)
+    intent.load(path)
+    raw_columns = intent.raw.columns.tolist()
+    intent.clean_raw()
+    intent.clean_urls()
+    intent.trainer(['ok'])
+
+    return intent, raw_columns
+
+
+class TestColumnar:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing Parquet and Feather input and output')
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.parquet = os.path.join(self.tmp.name, 'raw.parquet')
+        self.feather = os.path.join(self.tmp.name, 'raw.feather')
+
+        raw = pd.read_csv(RAW)
+        raw.to_parquet(self.parquet)
+        raw.to_feather(self.feather)
+
+        self.csv_intent, _ = run(RAW)
+        self.runs = {path: run(path) for path in (self.parquet, self.feather)}
+
+    @classmethod
+    def teardown_class(self):
+
+        self.tmp.cleanup()
+
+    def test_file_format_is_set_by_extension(self):
+
+        nt.assert_equal(file_format('a.csv'), 'csv')
+        nt.assert_equal(file_format('a.PQ'), 'parquet')
+        nt.assert_equal(file_format('a.parquet'), 'parquet')
+        nt.assert_equal(file_format('a.feather'), 'feather')
+
+    def test_load_only_reads_mapped_columns(self):
+
+        for _, raw_columns in self.runs.values():
+
+            nt.assert_true('IP Address' not in raw_columns)
+            nt.assert_true(all(self.csv_intent.is_mapped(col) for col in raw_columns))
+
+    def test_columnar_input_matches_csv(self):
+
+        for intent, _ in self.runs.values():
+
+            nt.assert_true(intent.cleaned.equals(self.csv_intent.cleaned))
+
+    def test_stream_from_parquet_matches_csv(self):
+
+        parquet = pd.concat(classifyintents.survey().stream(self.parquet, chunksize=250))
+        csv = pd.concat(classifyintents.survey().stream(RAW, chunksize=250))
+
+        nt.assert_true(parquet.equals(csv))
+
+    def test_save_keeps_category_dtypes(self):
+
+        intent, _ = run(RAW, low_memory=True)
+
+        for name in ('data.parquet', 'data.feather'):
+
+            path = os.path.join(self.tmp.name, name)
+            intent.save(path, 'data')
+            saved = read_saved(path)
+
+            nt.assert_equal(saved['page'].dtype, 'category')
+            pd.testing.assert_frame_equal(saved, intent.data, check_index_type=False)
+
+    def test_save_rejects_unknown_frames(self):
+
+        intent = classifyintents.survey()
+
+        nt.assert_raises(ValueError, intent.save, 'x.parquet', 'model')
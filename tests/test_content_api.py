@@ -0,0 +1,251 @@
+# coding: utf-8
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import nose.tools as nt
+import pandas as pd
+import classifyintents
+from classifyintents import (ContentAPIClient, TokenBucket, LookupCheckpoint,
+                             ORG_SECT_COLUMNS)
+from .fakes import looked_up_survey
+
+# Canned search.json responses, keyed by the filter_link[] page
+
+CANNED = {
+    '/vehicle-tax': {'results': [{
+        'organisations': [{'title': 'Driver and Vehicle Licensing Agency'}],
+        'mainstream_browse_pages': ['driving/vehicle-tax']}]},
+    '/browse/tax': {'results': [{
+        'organisations': [{'title': 'HM Revenue & Customs'},
+                          {'title': 'HM Treasury'}],
+        'mainstream_browse_pages': []}]},
+    }
+
+
+class StubSearchAPI(BaseHTTPRequestHandler):
+    """
+    Serves CANNED responses, an empty result for unknown pages, and
+    errors for the /flaky and /broken pages.
+    """
+
+    requests = []
+    batches = []
+
+    def do_GET(self):
+
+        query = parse_qs(urlparse(self.path).query)
+        pages = query['filter_link[]']
+        StubSearchAPI.requests.extend(pages)
+        StubSearchAPI.batches.append(pages)
+
+        for page in pages:
+            if page == '/broken' or (page == '/flaky' and
+                                     StubSearchAPI.requests.count(page) == 1):
+                self.send_response(503)
+                self.send_header('Retry-After', '0')
+                self.end_headers()
+                return
+
+        # As the search API does, only return link if it is asked for
+
+        results = []
+
+        for page in pages:
+            for result in CANNED.get(page, {'results': []})['results']:
+                if 'link' in query['fields']:
+                    result = dict(result, link=page)
+                results.append(result)
+
+        body = json.dumps({'results': results}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestContentAPIClient:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Starting stub search API')
+
+        self.server = HTTPServer(('127.0.0.1', 0), StubSearchAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.url = 'http://127.0.0.1:%s/api/search.json' % self.server.server_port
+        self.client = ContentAPIClient(url=self.url, concurrency=4, rate=None,
+                                       retries=1, backoff=0)
+
+    @classmethod
+    def teardown_class(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_org_parses_organisations_and_sections(self):
+
+        nt.assert_equal(
+                self.client.get_org('/browse/tax'),
+                ['HM Revenue & Customs', 'HM Treasury', 'null', 'null', 'null',
+                 'null', 'null', 'null', 'null']
+                )
+
+    def test_get_org_returns_null_for_unknown_page(self):
+
+        nt.assert_equal(self.client.get_org('/unknown'), ['null'] * 9)
+
+    def test_get_org_retries_server_errors(self):
+
+        nt.assert_equal(self.client.get_org('/flaky'), ['null'] * 9)
+        nt.assert_equal(StubSearchAPI.requests.count('/flaky'), 2)
+
+    def test_get_org_returns_none_when_retries_are_exhausted(self):
+
+        nt.assert_equal(self.client.get_org('/broken'), ['none'] * 9)
+
+    def test_get_orgs_preserves_order(self):
+
+        pages = ['/vehicle-tax', '/unknown', '/browse/tax'] * 5
+        rows = self.client.get_orgs(pages)
+
+        nt.assert_equal([row[0] for row in rows],
+                        ['Driver and Vehicle Licensing Agency', 'null',
+                         'HM Revenue & Customs'] * 5)
+
+    def test_get_org_batch_splits_results_by_link(self):
+
+        rows = self.client.get_org_batch(['/browse/tax', '/unknown', '/vehicle-tax'])
+
+        nt.assert_equal(rows, [
+            self.client.get_org('/browse/tax'),
+            ['null'] * 9,
+            self.client.get_org('/vehicle-tax')
+            ])
+
+    def test_get_org_batch_returns_none_for_batch_on_error(self):
+
+        nt.assert_equal(self.client.get_org_batch(['/vehicle-tax', '/broken']),
+                        [['none'] * 9] * 2)
+
+    def test_get_orgs_sends_batch_size_pages_per_request(self):
+
+        client = ContentAPIClient(url=self.url, concurrency=2, rate=None,
+                                  batch_size=4)
+        pages = ['/vehicle-tax', '/unknown', '/browse/tax'] * 3
+
+        before = len(StubSearchAPI.batches)
+        rows = client.get_orgs(pages)
+
+        nt.assert_equal(len(StubSearchAPI.batches) - before, 3)
+        nt.assert_equal(rows, self.client.get_orgs(pages))
+
+    def test_api_lookup_returns_org_sect_frame(self):
+
+        intent = classifyintents.survey()
+        intent.load('test_data/raw_test_data_3.csv')
+        intent.clean_raw()
+        intent.clean_urls()
+        intent.unique_pages = pd.DataFrame({'page': ['/vehicle-tax', '/browse/tax']})
+        intent.api_lookup(client=self.client)
+
+        nt.assert_equal(intent.org_sect.columns.tolist(), ORG_SECT_COLUMNS)
+        nt.assert_equal(intent.org_sect['section0'].tolist(),
+                        ['driving/vehicle-tax', 'null'])
+
+    def test_request_stats_counts_requests_and_errors(self):
+
+        client = ContentAPIClient(url=self.url, rate=None, retries=1, backoff=0, window=2)
+        client.get_orgs(['/vehicle-tax', '/broken'])
+        stats = client.request_stats()
+
+        nt.assert_equal((stats['requests'], stats['errors']), (3, 2))
+        nt.assert_true(0 < stats['latency_p50'] <= stats['latency_p99'])
+        nt.assert_equal(len(client.requests), 2)
+
+        start = client.request_counts()
+        client.get_org('/vehicle-tax')
+
+        nt.assert_equal(client.request_stats(start)['requests'], 1)
+        nt.assert_equal(client.request_stats(start)['errors'], 0)
+
+    def test_api_lookup_records_request_metrics(self):
+
+        client = ContentAPIClient(url=self.url, rate=None, retries=1, backoff=0)
+        client.get_org('/unknown')
+
+        intent = classifyintents.survey()
+        intent.load('test_data/raw_test_data_3.csv')
+        intent.clean_raw()
+        intent.clean_urls()
+        intent.unique_pages = pd.DataFrame({'page': ['/vehicle-tax', '/broken']})
+        intent.api_lookup(client=client)
+
+        metrics = intent.metrics[-1]
+
+        nt.assert_equal(metrics['stage'], 'api_lookup')
+        nt.assert_equal((metrics['pages'], metrics['cache_hits']), (2, 0))
+        nt.assert_equal((metrics['requests'], metrics['errors']), (3, 2))
+
+    def test_api_lookup_keeps_rows_in_order(self):
+
+        intent = classifyintents.survey()
+        intent.load('test_data/raw_test_data_3.csv')
+        intent.clean_raw()
+        intent.clean_urls()
+
+        before = intent.data[['respondent_id', 'page']].copy()
+        intent.unique_pages = intent.unique_pages.iloc[1:4]
+        intent.api_lookup(client=self.client)
+
+        matched = intent.data['page'].isin(intent.unique_pages['page'])
+
+        nt.assert_true(intent.data[['respondent_id', 'page']].equals(before))
+        nt.assert_equal(intent.metrics[-1]['matched_rows'], matched.sum())
+        nt.assert_true(0 < matched.sum() < len(intent.data))
+        nt.assert_true(intent.data.loc[~matched, 'org'].isnull().all())
+
+    def test_checkpointed_lookup_logs_one_progress(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            checkpoint = LookupCheckpoint(os.path.join(tmp, 'progress.jsonl'), batch_size=1)
+
+            # fileConfig in test_trainer disables the logger for later tests
+
+            logger = logging.getLogger('classifyintents')
+            disabled, logger.disabled = logger.disabled, False
+
+            try:
+                with nt.assert_logs(logger, level='INFO') as logs:
+                    looked_up_survey(['/vehicle-tax', '/browse/tax', '/unknown'],
+                                     client=self.client, checkpoint=checkpoint)
+            finally:
+                logger.disabled = disabled
+
+        progress = [line for line in logs.output if 'pages looked up' in line]
+
+        nt.assert_equal(len(progress), 1)
+        nt.assert_in('3/3 pages looked up and checkpointed', progress[0])
+
+
+def test_token_bucket_limits_rate():
+
+    bucket = TokenBucket(rate=100)
+
+    start = time.monotonic()
+    for i in range(11):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    assert elapsed >= 0.09
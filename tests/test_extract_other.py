@@ -40,3 +40,15 @@ class TestSmartSurveyFunctions:
         nt.assert_true(
                 self.rewritten.equals(rewrite_other_a)
                 )
+
+    def test_split_other_does_not_modify_input(self):
+
+        original = pd.Series(['Yes', np.nan, 'Something else'], index=[3, 1, 2])
+        copy = original.copy()
+
+        answers, comments = classifyintents.split_other(original)
+
+        nt.assert_true(original.equals(copy))
+        nt.assert_equal(answers.tolist(), ['Yes', 'other', 'other'])
+        nt.assert_equal(comments.tolist(), ['none', 'none', 'Something else'])
+        nt.assert_true(answers.index.equals(original.index))
@@ -2,7 +2,9 @@
 import pandas as pd
 import numpy as np
 from classifyintents import (normalise, date_features, string_len, 
-        string_capsratio, string_nexcl, clean_date)
+        string_capsratio, string_nexcl, clean_date, comment_features,
+        string_lengths, clean_comment, clean_category, infer_date_format,
+        DATE_FORMATS)
 
 class TestFeatureGenerators(object):
     
@@ -86,6 +88,48 @@ class TestFeatureGenerators(object):
         assert isinstance(clean_date(date), pd.Timestamp)
 
 
+    def test_clean_date_matches_to_datetime(self):
+
+        # 25/03/2017 does not match the inferred format of %m/%d/%Y
+
+        dates = pd.Series([
+            '09/03/2017 14:07:00',
+            '25/03/2017 14:07:00',
+            np.nan,
+            '09/03/2017 14:07:00'
+            ], index=[3, 2, 1, 0])
+
+        assert clean_date(dates).equals(pd.to_datetime(dates))
+
+
+    def test_infer_date_format_caches_format_by_shape(self):
+
+        saved = DATE_FORMATS.copy()
+        DATE_FORMATS.clear()
+
+        try:
+            assert infer_date_format('09/03/2017 14:07:00') == '%m/%d/%Y %H:%M:%S'
+            assert DATE_FORMATS == {'00/00/0000 00:00:00': '%m/%d/%Y %H:%M:%S'}
+        finally:
+            DATE_FORMATS.clear()
+            DATE_FORMATS.update(saved)
+
+    def test_infer_date_format_reads_day_first_guess_month_first(self):
+
+        saved = DATE_FORMATS.copy()
+        DATE_FORMATS.clear()
+
+        try:
+            assert infer_date_format('25/03/2017 14:07:00') == '%m/%d/%Y %H:%M:%S'
+            assert infer_date_format('09/03/2017 14:07:00') == '%m/%d/%Y %H:%M:%S'
+
+            dates = pd.Series(['25/03/2017 14:07:00', '09/03/2017 14:07:00', None])
+            assert clean_date(dates).equals(pd.to_datetime(dates))
+        finally:
+            DATE_FORMATS.clear()
+            DATE_FORMATS.update(saved)
+
+
     def test_date_features_works_as_expected(self):
 
         test_dates = pd.Series([
@@ -107,3 +151,72 @@ class TestFeatureGenerators(object):
         actual_date_features = date_features(test_dates)
 
         assert expected_date_features.equals(actual_date_features)
+
+
+class TestCommentFeatures(object):
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing comment_features against the single feature functions')
+
+        self.test_case = pd.Series([
+            '-', ' ', 'none, ', 'What is my purpose?', 'You pass butter!',
+            'ÉCOLE Straße!!', 'You pass butter!', np.nan, 'OH MY GOD.', ','
+        ], index=range(10, 20))
+
+        self.features = comment_features(self.test_case)
+
+    def test_comment_features_keeps_index(self):
+
+        assert self.features.index.equals(self.test_case.index)
+
+    def test_comment_features_capsratio_is_identical(self):
+
+        expected = [string_capsratio(i) for i in self.test_case]
+
+        assert self.features['capsratio'].tolist() == expected
+
+    def test_comment_features_nexcl_is_identical(self):
+
+        expected = [string_nexcl(i) for i in self.test_case]
+
+        assert self.features['nexcl'].tolist() == expected
+
+    def test_comment_features_len_is_identical(self):
+
+        assert self.features['len'].equals(string_lengths(self.test_case))
+
+    def test_comment_features_comment_is_identical(self):
+
+        assert self.features['comment'].equals(clean_comment(self.test_case))
+
+class TestCleanCategory(object):
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing clean_category against cleaning each row')
+
+    def clean_rows(self, feature):
+
+        feature = feature.apply(str).str.lower()
+        feature = feature.replace(r'null|\#Value\!', 'none', regex=True)
+
+        return feature.fillna('none').astype('category')
+
+    def test_clean_category_matches_cleaning_each_row(self):
+
+        cases = [
+            pd.Series(['Yes', 'NULL', np.nan, 'No', 'Yes'], index=range(5, 10), name='a'),
+            pd.Series(['a', None, np.nan, 'B'], dtype='object'),
+            pd.Series([3, 1, 2, 1]),
+            pd.Series([1.5, np.nan, 2.0]),
+            pd.Series(pd.Categorical(['A', 'b', None, 'a'])),
+            pd.Series(pd.to_datetime(['2017-01-01 10:00', None])),
+            pd.Series([1, 'a', 1.0, '1', True, None]),
+            pd.Series([1, 'a', 1.0, '1'], dtype='category'),
+        ]
+
+        for case in cases:
+            pd.testing.assert_series_equal(clean_category(case), self.clean_rows(case))
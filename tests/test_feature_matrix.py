@@ -0,0 +1,59 @@
+# coding: utf-8
+import nose.tools as nt
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import classifyintents
+from classifyintents import one_hot_codes
+
+
+class TestFeatureMatrix:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing survey.feature_matrix')
+
+        self.a = classifyintents.survey()
+        self.a.load('test_data/raw_test_data_classified.csv')
+        self.a.clean_raw()
+        self.a.clean_urls()
+        self.a.trainer(['ok'])
+
+    def test_dense_matrix_holds_cleaned_features_as_float32(self):
+
+        matrix, names = self.a.feature_matrix()
+        expected = self.a.cleaned.drop('target', axis=1)
+
+        nt.assert_equal(matrix.dtype, np.float32)
+        nt.assert_equal(names, expected.columns.tolist())
+        nt.assert_true(np.array_equal(matrix, expected.astype('float32').values))
+
+    def test_sparse_matrix_one_hot_encodes_categories(self):
+
+        matrix, names = self.a.feature_matrix(sparse=True)
+        levels = self.a.stats['levels']['cat_satisfaction']
+
+        nt.assert_true(scipy.sparse.isspmatrix_csr(matrix))
+        nt.assert_equal(matrix.shape[1], len(names))
+
+        columns = [names.index('cat_satisfaction_%s' % level) for level in levels]
+        one_hot = matrix[:, columns].toarray()
+
+        nt.assert_true(np.array_equal(one_hot.argmax(axis=1),
+                                      self.a.cleaned['cat_satisfaction'].values))
+        nt.assert_true(np.array_equal(one_hot.sum(axis=1), np.ones(matrix.shape[0])))
+
+    def test_sparse_and_dense_one_hot_matrices_match(self):
+
+        sparse, sparse_names = self.a.feature_matrix(sparse=True)
+        dense, dense_names = self.a.feature_matrix(one_hot=self.a.categories)
+
+        nt.assert_equal(sparse_names, dense_names)
+        nt.assert_true(np.array_equal(sparse.toarray(), dense))
+
+    def test_unseen_codes_are_all_zeros(self):
+
+        matrix = one_hot_codes(pd.Series([0, -1, 2]), 3)
+
+        nt.assert_equal(matrix.toarray().tolist(), [[1, 0, 0], [0, 0, 0], [0, 0, 1]])
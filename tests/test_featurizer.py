@@ -0,0 +1,111 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+import numpy as np
+import classifyintents
+from classifyintents import FeatureTransformer, LookupCache, ResponseFeaturizer
+
+
+class LengthClient:
+    """
+    Stands in for ContentAPIClient, returning an org and section that
+    depend on the length of each page
+    """
+
+    def get_orgs(self, pages):
+        return [['org%s' % (len(page) % 3)] + ['null'] * 4 +
+                ['section%s' % (len(page) % 4)] + ['null'] * 3 for page in pages]
+
+
+class TestResponseFeaturizer:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing ResponseFeaturizer against survey.predictor')
+
+        train = classifyintents.survey()
+        train.load('test_data/raw_test_data_classified.csv')
+        train.clean_raw()
+        train.clean_urls()
+        train.api_lookup(client=LengthClient())
+        train.trainer(['ok'])
+
+        self.transformer = FeatureTransformer.from_survey(train)
+
+        self.pred = classifyintents.survey(transformer=self.transformer)
+        self.pred.load('test_data/raw_test_data_2.csv')
+        self.pred.clean_raw()
+        self.pred.clean_urls()
+        self.pred.api_lookup(client=LengthClient())
+        self.pred.predictor()
+
+        raw = classifyintents.survey()
+        raw.load('test_data/raw_test_data_2.csv')
+
+        self.responses = dict(zip(raw.raw['UserID'],
+                                  raw.raw.to_dict(orient='records')))
+
+    def expected(self):
+
+        ids = self.pred.data.loc[self.pred.cleaned.index, 'respondent_id']
+
+        return [int(x) for x in ids], self.pred.cleaned.astype('float64').values
+
+    def test_features_match_predictor(self):
+
+        featurizer = ResponseFeaturizer(
+            self.transformer, ResponseFeaturizer.pages_from_survey(self.pred))
+
+        ids, expected = self.expected()
+        actual = np.array([featurizer.featurize(self.responses[i]) for i in ids])
+
+        nt.assert_true(np.array_equal(actual, expected))
+        nt.assert_equal(featurizer.misses, 0)
+
+    def test_dropped_responses_return_none(self):
+
+        featurizer = ResponseFeaturizer(
+            self.transformer, ResponseFeaturizer.pages_from_survey(self.pred))
+
+        ids, _ = self.expected()
+        dropped = [i for i in self.responses if i not in set(ids)]
+
+        nt.assert_true(len(dropped) > 0)
+        nt.assert_true(all(featurizer.featurize(self.responses[i]) is None
+                           for i in dropped))
+
+    def test_featurize_many_fills_dropped_responses_with_nan(self):
+
+        featurizer = ResponseFeaturizer(
+            self.transformer, ResponseFeaturizer.pages_from_survey(self.pred))
+
+        features = featurizer.featurize_many(list(self.responses.values()))
+        ids, expected = self.expected()
+
+        nt.assert_equal(features.shape, (len(self.responses), len(ResponseFeaturizer.columns)))
+        nt.assert_equal((~np.isnan(features).any(axis=1)).sum(), len(ids))
+
+    def test_pages_are_read_from_lookup_cache(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            cache = LookupCache(os.path.join(tmp, 'cache.db'))
+            cache.set_many({'/vehicle-tax': LengthClient().get_orgs(['/vehicle-tax'])[0]})
+
+            pages = ResponseFeaturizer.pages_from_cache(cache)
+            cache.close()
+
+        nt.assert_equal(pages, {'/vehicle-tax': ('org0', 'section0')})
+
+    def test_unknown_pages_are_counted_as_misses(self):
+
+        featurizer = ResponseFeaturizer(self.transformer, pages={})
+        response = {'Started': '09/03/2017 14:07:00', 'Ended': '09/03/2017 14:09:00',
+                    'Page Path': '/vehicle-tax'}
+
+        features = featurizer.featurize(response)
+
+        nt.assert_equal(featurizer.misses, 1)
+        nt.assert_equal(len(features), len(ResponseFeaturizer.columns))
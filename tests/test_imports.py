@@ -0,0 +1,51 @@
+# coding: utf-8
+import os
+import sys
+import json
+import subprocess
+import nose.tools as nt
+import classifyintents
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def loaded_modules(statement):
+    """
+    The heavy dependencies loaded by an import, in a fresh interpreter
+    """
+
+    script = ('import sys, json\n%s\nprint(json.dumps([m for m in '
+              '["numpy", "pandas", "sklearn", "scipy", "requests"] '
+              'if m in sys.modules]))' % statement)
+
+    return json.loads(subprocess.check_output([sys.executable, '-c', script], cwd=ROOT))
+
+
+def test_package_import_loads_no_heavy_dependencies():
+
+    nt.assert_equal(loaded_modules('import classifyintents'), [])
+
+
+def test_url_rules_import_without_pandas():
+
+    nt.assert_equal(loaded_modules(
+        'from classifyintents import reg_match, normalise_url, url_rules'), [])
+
+
+def test_survey_import_does_not_load_sklearn_or_requests():
+
+    loaded = loaded_modules('from classifyintents import survey')
+
+    nt.assert_not_in('sklearn', loaded)
+    nt.assert_not_in('requests', loaded)
+
+
+def test_names_resolve_from_their_submodules():
+
+    from classifyintents.urls import reg_match
+
+    nt.assert_is(classifyintents.reg_match, reg_match)
+    nt.assert_in('survey', dir(classifyintents))
+
+    with nt.assert_raises(AttributeError):
+        classifyintents.not_a_name
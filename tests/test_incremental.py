@@ -0,0 +1,106 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+import pandas as pd
+import classifyintents
+from classifyintents import IncrementalState, FeatureTransformer
+
+EXPORT = 'test_data/raw_test_data_classified.csv'
+
+
+class TestIncrementalUpdate:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing incremental updates')
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.day1 = os.path.join(self.tmp.name, 'day1.csv')
+        pd.read_csv(EXPORT).iloc[:400].to_csv(self.day1, index=False)
+
+        self.full = classifyintents.survey()
+        self.full.load(EXPORT)
+        self.full.clean_raw()
+        self.full.clean_urls()
+        self.full.predictor()
+
+    @classmethod
+    def teardown_class(self):
+
+        self.tmp.cleanup()
+
+    def update(self, name, extension='.parquet', transformer=None):
+
+        state = IncrementalState(os.path.join(self.tmp.name, name), extension)
+        intent = classifyintents.survey(transformer)
+        new = [intent.update(path, state) for path in (self.day1, EXPORT)]
+
+        return intent, state, new
+
+    def test_only_new_responses_are_processed(self):
+
+        intent, _, new = self.update('only_new')
+
+        nt.assert_equal(new, [400, 226])
+        nt.assert_equal(len(intent.cleaned), len(self.full.cleaned.loc[400:]))
+        metrics = intent.metrics_frame()
+        nt.assert_equal(metrics.loc[metrics['stage'] == 'clean_urls', 'rows_in'].tolist(),
+                        [400, 226])
+
+    def test_output_matches_processing_whole_export_with_a_transformer(self):
+
+        transformer = FeatureTransformer.from_survey(self.full)
+
+        for extension in ('.parquet', '.pkl'):
+
+            _, state, _ = self.update('matches' + extension, extension, transformer)
+
+            pd.testing.assert_frame_equal(state.cleaned().reset_index(drop=True),
+                                          self.full.cleaned.reset_index(drop=True),
+                                          check_exact=True)
+
+    def test_running_statistics_match_whole_export(self):
+
+        intent, state, _ = self.update('running')
+
+        for col, stats in state.stats.items():
+            for key, value in stats.items():
+                nt.assert_almost_equal(value, self.full.stats[col][key], places=9)
+
+        # The categories of later runs are encoded with the levels of the first
+
+        nt.assert_equal(intent.stats['levels'], state.levels)
+
+    def test_refresh_matches_processing_whole_export(self):
+
+        intent, state, _ = self.update('refresh')
+
+        nt.assert_equal(intent.update(EXPORT, state, refresh=True), 626)
+        pd.testing.assert_frame_equal(state.cleaned().reset_index(drop=True),
+                                      self.full.cleaned.reset_index(drop=True),
+                                      check_exact=True)
+        nt.assert_equal(intent.stats, self.full.stats)
+        nt.assert_equal(state.parts, ['cleaned-0002.parquet'])
+
+    def test_state_is_persisted(self):
+
+        self.update('persisted')
+        state = IncrementalState(os.path.join(self.tmp.name, 'persisted'))
+
+        nt.assert_equal(len(state), 626)
+        nt.assert_equal(set(state.ids), set(pd.read_csv(EXPORT)['UserID']))
+        nt.assert_equal([run['new'] for run in state.runs], [400, 226])
+        nt.assert_equal(len(state.cleaned()), len(self.full.cleaned))
+
+    def test_rerun_without_new_responses(self):
+
+        _, state, _ = self.update('rerun')
+        cleaned = state.cleaned()
+        again = classifyintents.survey()
+
+        nt.assert_equal(again.update(EXPORT, os.path.join(self.tmp.name, 'rerun')), 0)
+        nt.assert_true(again.cleaned.empty)
+        pd.testing.assert_frame_equal(
+            IncrementalState(os.path.join(self.tmp.name, 'rerun')).cleaned(), cleaned)
@@ -0,0 +1,85 @@
+# coding: utf-8
+import logging
+import nose.tools as nt
+import classifyintents
+from classifyintents import percentiles
+
+
+class TestInstrumentation:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing stage metrics')
+
+        self.intent = classifyintents.survey(trace_memory=True)
+        self.intent.load('test_data/raw_test_data_classified.csv')
+        self.intent.clean_raw()
+        self.intent.clean_urls()
+        self.intent.trainer(['ok'])
+        self.metrics = self.intent.metrics_frame().set_index('stage')
+
+    def test_each_stage_is_recorded_in_order(self):
+
+        nt.assert_equal(self.metrics.index.tolist(),
+                        ['load', 'clean_raw', 'clean_urls', 'trainer'])
+        nt.assert_false(self.metrics['failed'].any())
+        nt.assert_true((self.metrics['seconds'] > 0).all())
+
+    def test_rows_in_and_out_are_recorded(self):
+
+        rows = len(self.intent.data)
+
+        nt.assert_equal(self.metrics.loc['load', 'rows_out'], rows)
+        nt.assert_equal(self.metrics.loc['clean_raw', 'rows_in'], rows)
+        nt.assert_equal(self.metrics.loc['trainer', 'rows_out'], len(self.intent.cleaned))
+
+    def test_peak_memory_is_traced(self):
+
+        nt.assert_true((self.metrics['peak_mb'] > 0).all())
+
+    def test_failed_stages_are_recorded(self):
+
+        intent = classifyintents.survey()
+
+        nt.assert_raises(FileNotFoundError, intent.load, 'test_data/missing.csv')
+        nt.assert_true(intent.metrics[0]['failed'])
+
+    def test_stream_records_metrics_for_each_chunk(self):
+
+        intent = classifyintents.survey()
+        list(intent.stream('test_data/raw_test_data_classified.csv', chunksize=400,
+                           stats=self.intent.stats))
+        metrics = intent.metrics_frame()
+
+        nt.assert_equal(metrics['chunk'].tolist(), [0] * 3 + [1] * 3)
+        nt.assert_equal(metrics['stage'].tolist(),
+                        ['clean_raw', 'clean_urls', 'predictor'] * 2)
+
+    def test_metrics_are_logged(self):
+
+        logger = logging.getLogger('classifyintents')
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger.addHandler(handler)
+        level, disabled = logger.level, logger.disabled
+        logger.setLevel(logging.INFO)
+        logger.disabled = False
+
+        try:
+            classifyintents.survey().load('test_data/raw_test_data_3.csv')
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+            logger.disabled = disabled
+
+        nt.assert_true(any(r.getMessage().startswith('load metrics: rows_out=')
+                           for r in records))
+
+
+def test_percentiles():
+
+    nt.assert_equal(percentiles([1, 2, 3]),
+                    {'latency_p50': 2.0, 'latency_p90': 2.8, 'latency_p99': 2.98})
+    nt.assert_equal(percentiles([])['latency_p50'], None)
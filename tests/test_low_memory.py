@@ -0,0 +1,59 @@
+# coding: utf-8
+import nose.tools as nt
+import numpy as np
+import classifyintents
+
+
+class TestLowMemory:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Comparing low_memory mode with the default')
+
+        self.default = classifyintents.survey()
+        self.default.load('test_data/raw_test_data_classified.csv')
+        self.default.clean_raw()
+        self.default.clean_urls()
+        self.default.trainer(['ok'])
+
+        self.low = classifyintents.survey(low_memory=True)
+        self.low.load('test_data/raw_test_data_classified.csv')
+        self.low_raw_columns = self.low.raw.columns.tolist()
+        self.low.clean_raw()
+        self.low.clean_urls()
+        self.low.trainer(['ok'])
+
+    def test_load_only_reads_mapped_columns(self):
+
+        nt.assert_true('IP Address' not in self.low_raw_columns)
+        nt.assert_true(all(self.low.is_mapped(col) for col in self.low_raw_columns))
+
+    def test_raw_is_released_after_clean_raw(self):
+
+        nt.assert_true(self.low.raw.empty)
+
+    def test_features_are_downcast(self):
+
+        dtypes = self.low.data.dtypes
+
+        nt.assert_true(all(dtypes[col] == 'int16' for col in self.low.dates))
+        nt.assert_equal(dtypes['time_delta'], 'float32')
+        nt.assert_equal(dtypes['comment_why_you_came_capsratio'], 'float32')
+        nt.assert_equal(dtypes['full_url'], 'category')
+        nt.assert_equal(dtypes['page'], 'category')
+
+    def test_low_memory_data_is_smaller(self):
+
+        nt.assert_true(self.low.data.memory_usage(deep=True).sum() <
+                       self.default.data.memory_usage(deep=True).sum())
+
+    def test_trainer_output_matches_default(self):
+
+        nt.assert_equal(self.low.cleaned.columns.tolist(),
+                        self.default.cleaned.columns.tolist())
+
+        for col in self.default.cleaned:
+            assert np.allclose(self.low.cleaned[col].astype(float),
+                               self.default.cleaned[col].astype(float),
+                               rtol=1e-6), col
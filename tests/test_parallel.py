@@ -0,0 +1,55 @@
+# coding: utf-8
+import nose.tools as nt
+import pandas as pd
+import classifyintents
+
+
+def clean(path, n_jobs, low_memory=False):
+
+    intent = classifyintents.survey(low_memory=low_memory)
+    intent.load(path)
+    intent.clean_raw(n_jobs=n_jobs)
+
+    return intent
+
+
+class TestParallelCleanRaw:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Comparing parallel and serial clean_raw')
+
+        self.path = 'test_data/raw_test_data_classified.csv'
+        self.serial = clean(self.path, n_jobs=1)
+        self.parallel = clean(self.path, n_jobs=3)
+
+    def test_parallel_output_is_identical(self):
+
+        pd.testing.assert_frame_equal(self.serial.data, self.parallel.data,
+                                      check_exact=True)
+
+    def test_normalisation_uses_all_rows(self):
+
+        nt.assert_equal(self.serial.stats, self.parallel.stats)
+        nt.assert_equal(self.parallel.stats['time_delta']['n'], len(self.parallel.raw))
+
+    def test_parallel_output_is_identical_in_low_memory_mode(self):
+
+        pd.testing.assert_frame_equal(clean(self.path, 1, low_memory=True).data,
+                                      clean(self.path, 2, low_memory=True).data,
+                                      check_exact=True)
+
+    def test_all_null_comments_are_zeroed_across_partitions(self):
+
+        # comment_further_comments is empty in the test data
+
+        nt.assert_true(self.parallel.stats['comment_further_comments_len']['all_null'])
+        nt.assert_true((self.parallel.data['comment_further_comments'] == 'none').all())
+
+    def test_n_jobs_is_capped_at_number_of_rows(self):
+
+        intent = clean('test_data/raw_test_data_3.csv', n_jobs=1)
+        capped = clean('test_data/raw_test_data_3.csv', n_jobs=100)
+
+        pd.testing.assert_frame_equal(intent.data, capped.data, check_exact=True)
@@ -0,0 +1,83 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+from classifyintents import AncestorResolver, LookupCache
+from classifyintents.resolver import PageTrie, is_resolved
+from .fakes import FakeClient, NULL, looked_up_survey
+
+ROWS = {
+    '/topic/land-registration': ['HM Land Registry'] + ['null'] * 8,
+    '/topic/land-registration/searches-fees-forms': NULL,
+    '/browse/tax': ['null'] * 5 + ['tax'] + ['null'] * 3,
+    }
+
+
+class TestAncestorResolver:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing AncestorResolver')
+
+    def test_trie_lists_ancestors_nearest_first(self):
+
+        trie = PageTrie()
+        trie.insert('/a/b', NULL)
+
+        nt.assert_equal(trie.ancestors('/a/b/c/d'),
+                        [('/a/b/c', PageTrie.MISSING), ('/a/b', NULL)])
+        nt.assert_equal(len(trie), 1)
+
+    def test_unresolved_pages_take_nearest_resolved_ancestor(self):
+
+        client = FakeClient(rows=ROWS, default=NULL)
+        pages = ['/topic/land-registration/searches-fees-forms/a/b', '/browse/tax',
+                 '/browse/tax/vat/x']
+
+        def fetch(pages):
+            return dict(zip(pages, client.get_orgs(pages)))
+
+        resolver = AncestorResolver()
+        inferred = resolver.resolve(fetch(pages), fetch)
+
+        nt.assert_equal(inferred, {
+            '/topic/land-registration/searches-fees-forms/a/b':
+                ROWS['/topic/land-registration'],
+            '/browse/tax/vat/x': ROWS['/browse/tax']})
+
+        # Ancestors are looked up nearest first, and only until one resolves.
+        # /browse/tax was already looked up as a page.
+
+        nt.assert_equal(client.pages[len(pages):], [
+            '/topic/land-registration/searches-fees-forms/a', '/browse/tax/vat',
+            '/topic/land-registration/searches-fees-forms', '/topic/land-registration'])
+
+        nt.assert_equal(resolver.lookups, 4)
+        nt.assert_true(all(is_resolved(row) for row in inferred.values()))
+
+    def test_api_lookup_infers_from_ancestors(self):
+
+        client = FakeClient(rows=ROWS, default=NULL)
+        intent = looked_up_survey(['/topic/land-registration/searches-fees-forms', '/b'],
+                                  client=client, resolver=AncestorResolver(min_depth=1))
+
+        nt.assert_equal(intent.org_sect['organisation0'].tolist(), ['HM Land Registry', 'null'])
+        nt.assert_equal(intent.metrics[-1]['inferred'], 1)
+        nt.assert_equal(intent.metrics[-1]['ancestor_lookups'], 1)
+
+    def test_ancestor_cache_hits_are_counted(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            cache = LookupCache(os.path.join(tmp, 'cache.sqlite'))
+            cache.set_many({'/topic/land-registration': ROWS['/topic/land-registration']})
+            client = FakeClient(rows=ROWS, default=NULL)
+
+            intent = looked_up_survey(['/topic/land-registration/searches-fees-forms', '/b'],
+                                      client=client, cache=cache,
+                                      resolver=AncestorResolver(min_depth=1))
+            cache.close()
+
+        nt.assert_not_in('/topic/land-registration', client.pages)
+        nt.assert_equal(intent.metrics[-1]['cache_hits'], 1)
@@ -0,0 +1,182 @@
+# coding: utf-8
+import os
+import asyncio
+import tempfile
+import pytest
+import nose.tools as nt
+import classifyintents
+from classifyintents import FeatureTransformer, LookupCache, ResponseFeaturizer
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from aiohttp.test_utils import TestServer, TestClient
+from classifyintents.service import FeatureService, create_app
+from .fakes import FakeClient, FOUND
+
+class TestFeatureService:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing the feature service')
+
+        train = classifyintents.survey()
+        train.load('test_data/raw_test_data_classified.csv')
+        train.clean_raw()
+        train.clean_urls()
+        train.trainer(['ok'])
+
+        self.transformer = FeatureTransformer.from_survey(train)
+
+        raw = classifyintents.survey()
+        raw.load('test_data/raw_test_data_2.csv')
+
+        # Round trip through JSON, as a client would send them
+
+        self.responses = [{key: None if value != value else value
+                           for key, value in response.items()}
+                          for response in raw.raw.to_dict(orient='records')]
+
+        self.tmp = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def teardown_class(self):
+
+        self.tmp.cleanup()
+
+    def run(self, service, requests):
+        """
+        Make requests to the service concurrently, returning the replies
+        """
+
+        async def run():
+
+            async with TestClient(TestServer(create_app(service))) as client:
+
+                async def request(method, path, body=None):
+                    reply = await client.request(method, path, json=body)
+                    return reply.status, await reply.json()
+
+                return await asyncio.gather(*[request(*r) for r in requests])
+
+        return asyncio.run(run())
+
+    def test_features_match_featurizer(self):
+
+        service = FeatureService(self.transformer, client=FakeClient())
+        replies = self.run(service, [('POST', '/features', r) for r in self.responses[:20]])
+
+        featurizer = ResponseFeaturizer(self.transformer, service.featurizer.pages)
+
+        for (status, body), response in zip(replies, self.responses):
+            expected = featurizer.featurize(response)
+
+            nt.assert_equal(status, 200)
+            nt.assert_equal(body['features'], None if expected is None else expected.tolist())
+
+    def test_concurrent_requests_are_coalesced(self):
+
+        service = FeatureService(self.transformer, max_wait=0.05)
+        replies = self.run(service, [('POST', '/features', r) for r in self.responses[:50]])
+
+        nt.assert_true(all(status == 200 for status, _ in replies))
+        nt.assert_equal(service.responses, 50)
+        nt.assert_true(service.batches < 50)
+
+    def test_batch_endpoint_returns_features_for_each_response(self):
+
+        service = FeatureService(self.transformer)
+        [(status, body)] = self.run(service, [('POST', '/features/batch', self.responses)])
+
+        nt.assert_equal(status, 200)
+        nt.assert_equal(len(body['features']), len(self.responses))
+
+    def test_new_pages_are_looked_up_once_and_cached(self):
+
+        cache = LookupCache(os.path.join(self.tmp.name, 'cache.db'))
+        cache.set_many({'/vehicle-tax': FOUND})
+
+        client = FakeClient()
+        service = FeatureService(self.transformer, cache=cache, client=client)
+
+        response = {'Started': '09/03/2017 14:07:00', 'Ended': '09/03/2017 14:09:00'}
+        requests = [('POST', '/features', dict(response, **{'Page Path': page}))
+                    for page in ['/vehicle-tax', '/new-page', '/new-page/a']]
+
+        replies = self.run(service, requests)
+
+        nt.assert_true(all(body['features'] is not None for _, body in replies))
+        nt.assert_equal(client.pages, ['/new-page'])
+        nt.assert_equal(cache.get('/new-page'), FOUND)
+        cache.close()
+
+    def test_failed_lookups_are_retried(self):
+
+        client = FakeClient(fail=True)
+        service = FeatureService(self.transformer, client=client)
+
+        response = {'Started': '09/03/2017 14:07:00', 'Ended': '09/03/2017 14:09:00',
+                    'Page Path': '/flaky-page'}
+
+        self.run(service, [('POST', '/features', response)])
+        nt.assert_not_in('/flaky-page', service.featurizer.pages)
+
+        client.fail = False
+        self.run(service, [('POST', '/features', response)])
+
+        nt.assert_equal(client.pages, ['/flaky-page', '/flaky-page'])
+        nt.assert_equal(service.featurizer.pages['/flaky-page'], (FOUND[0], FOUND[5]))
+
+    def test_bad_response_only_fails_its_own_request(self):
+
+        service = FeatureService(self.transformer)
+        bad = dict(self.responses[1], Started='not a date')
+
+        replies = self.run(service, [('POST', '/features', self.responses[0]),
+                                     ('POST', '/features', bad),
+                                     ('POST', '/features/batch', self.responses[2:4])])
+
+        nt.assert_equal([status for status, _ in replies], [200, 400, 200])
+        nt.assert_in('invalid date', replies[1][1]['error'])
+
+        # Responses that get past the check fail only their own request
+
+        async def run():
+            await service.start()
+
+            results = await asyncio.gather(
+                service.featurize([self.responses[0]]),
+                service.featurize([{'Started': {}, 'Ended': '09/03/2017 14:09:00'}]),
+                service.featurize(self.responses[2:4]), return_exceptions=True)
+
+            await service.stop()
+            return results
+
+        good, error, batch = asyncio.run(run())
+
+        nt.assert_equal(len(good), 1)
+        nt.assert_is_instance(error, Exception)
+        nt.assert_equal(len(batch), 2)
+        nt.assert_equal(service.errors, 1)
+
+    def test_invalid_requests_are_rejected(self):
+
+        service = FeatureService(self.transformer)
+        replies = self.run(service, [('POST', '/features', [1, 2]),
+                                     ('POST', '/features/batch', {'a': 1})])
+
+        nt.assert_equal([status for status, _ in replies], [400, 400])
+
+    def test_health_and_metrics(self):
+
+        service = FeatureService(self.transformer)
+        replies = self.run(service, [('POST', '/features', self.responses[0])])
+        replies += self.run(service, [('GET', '/health'), ('GET', '/metrics')])
+
+        nt.assert_equal(replies[1][1]['columns'], ResponseFeaturizer.columns)
+
+        metrics = replies[2][1]
+
+        nt.assert_equal(metrics['responses'], 1)
+        nt.assert_equal(metrics['requests'], 1)
+        nt.assert_true(metrics['latency_p99'] > 0)
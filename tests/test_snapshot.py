@@ -0,0 +1,74 @@
+# coding: utf-8
+import os
+import json
+import tempfile
+import nose.tools as nt
+from classifyintents import SnapshotIndex
+from classifyintents.snapshot import ancestors
+from .fakes import FakeClient, NULL, looked_up_survey
+
+DUMP = [
+    {'link': '/vehicle-tax', 'organisations': [{'title': 'DVLA'}],
+     'mainstream_browse_pages': ['driving/vehicle-tax-mot']},
+    {'link': 'https://www.gov.uk/topic/land-registration/',
+     'organisations': ['HM Land Registry'], 'mainstream_browse_pages': []},
+    {'link': '/vehicle-tax', 'organisations': [{'title': 'HMRC'}]},
+    {'link': '/government', 'organisations': [{'title': 'Cabinet Office'}]},
+    ]
+
+
+class TestSnapshotIndex:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing SnapshotIndex')
+
+        self.tmp = tempfile.TemporaryDirectory()
+        dump = os.path.join(self.tmp.name, 'dump.jsonl')
+
+        with open(dump, 'w') as f:
+            f.write('\n'.join(json.dumps(record) for record in DUMP) + '\n\n')
+
+        self.index = SnapshotIndex.build(dump, os.path.join(self.tmp.name, 'snapshot.db'))
+
+    @classmethod
+    def teardown_class(self):
+
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_build_keeps_first_result_for_each_path(self):
+
+        nt.assert_equal(len(self.index), 3)
+        nt.assert_equal(self.index.get_many(['/vehicle-tax'])['/vehicle-tax'],
+                        ['DVLA'] + ['null'] * 4 + ['driving/vehicle-tax-mot'] + ['null'] * 3)
+
+    def test_pages_resolve_from_nearest_indexed_ancestor(self):
+
+        resolved = self.index.resolve_many([
+            '/topic/land-registration/searches-fees-forms/a', '/topic/land-registration/',
+            '/government/publications/x', '/missing'])
+
+        nt.assert_equal(resolved['/topic/land-registration/searches-fees-forms/a'][0],
+                        'HM Land Registry')
+        nt.assert_equal(resolved['/topic/land-registration/'][0], 'HM Land Registry')
+
+        # /government has too few path segments to be used as an ancestor
+
+        nt.assert_equal(set(resolved), {'/topic/land-registration/searches-fees-forms/a',
+                                        '/topic/land-registration/'})
+
+    def test_ancestors_are_nearest_first(self):
+
+        nt.assert_equal(ancestors('/a/b/c/d'), ['/a/b/c', '/a/b'])
+        nt.assert_equal(ancestors('/a/b/c/d', min_depth=1), ['/a/b/c', '/a/b', '/a'])
+
+    def test_api_lookup_only_sends_pages_missing_from_index(self):
+
+        client = FakeClient(default=NULL)
+        intent = looked_up_survey(['/vehicle-tax', '/b'], client=client, index=self.index)
+
+        nt.assert_equal(client.pages, ['/b'])
+        nt.assert_equal(intent.org_sect['organisation0'].tolist(), ['DVLA', 'null'])
+        nt.assert_equal(intent.metrics[-1]['index_hits'], 1)
@@ -0,0 +1,76 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+import numpy as np
+import pandas as pd
+import classifyintents
+
+
+class TestStream:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Comparing survey.stream against running the whole file at once')
+
+        self.path = 'test_data/raw_test_data.csv'
+
+        self.whole = classifyintents.survey()
+        self.whole.load(self.path)
+        self.whole.clean_raw()
+        self.whole.clean_urls()
+        self.whole.predictor()
+
+        self.streamed = classifyintents.survey()
+        self.chunks = list(self.streamed.stream(self.path, chunksize=100))
+        self.cleaned = pd.concat(self.chunks)
+
+    def test_stream_yields_chunks(self):
+
+        nt.assert_equal(len(self.chunks), 7)
+        nt.assert_true(all(len(chunk) <= 100 for chunk in self.chunks))
+
+    def test_stream_output_matches_whole_file(self):
+
+        nt.assert_equal(self.cleaned.columns.tolist(),
+                        self.whole.cleaned.columns.tolist())
+        nt.assert_equal(self.cleaned.index.tolist(),
+                        self.whole.cleaned.index.tolist())
+
+        for col in self.whole.cleaned:
+            assert np.allclose(self.cleaned[col].astype(float),
+                               self.whole.cleaned[col].astype(float)), col
+
+    def test_scan_stats_match_whole_file(self):
+
+        stats = self.streamed.stats
+
+        nt.assert_equal(stats['levels'], self.whole.stats['levels'])
+
+        for key in ['time_delta', 'comment_why_you_came_len']:
+            for name, value in self.whole.stats[key].items():
+                assert np.isclose(stats[key][name], value), (key, name)
+
+    def test_stream_to_csv_writes_one_header(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            output = os.path.join(tmp, 'cleaned.csv')
+            self.streamed.stream_to_csv(self.path, output, chunksize=250,
+                                        stats=self.streamed.stats)
+
+            nt.assert_equal(pd.read_csv(output, index_col=0).shape,
+                            self.whole.cleaned.shape)
+
+
+def test_merge_stats_matches_whole_series():
+
+    x = pd.Series(np.arange(100) ** 1.5)
+    merged = classifyintents.merge_stats(
+        {'x': classifyintents.moments(x[:30])},
+        {'x': classifyintents.moments(x[30:])}
+        )
+
+    for name, value in classifyintents.moments(x).items():
+        assert np.isclose(merged['x'][name], value), name
@@ -0,0 +1,54 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+import classifyintents
+from classifyintents.synthetic import synthetic_survey, COLUMNS
+
+
+class TestSyntheticSurvey:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Testing synthetic survey generator')
+
+        self.data = synthetic_survey(2000, seed=1)
+
+    def test_columns_match_smart_survey_export(self):
+
+        nt.assert_equal(self.data.columns.tolist(), COLUMNS + ['target'])
+        nt.assert_equal(synthetic_survey(10, seed=1, classified=False).columns.tolist(),
+                        COLUMNS)
+
+    def test_seed_gives_reproducible_data(self):
+
+        nt.assert_true(self.data.equals(synthetic_survey(2000, seed=1)))
+        nt.assert_false(self.data.equals(synthetic_survey(2000, seed=2)))
+
+    def test_user_ids_are_unique(self):
+
+        nt.assert_true(self.data['UserID'].is_unique)
+
+    def test_pages_have_a_long_tail(self):
+
+        counts = self.data['Page Path'].value_counts()
+
+        nt.assert_equal(counts.index[0], '/')
+        nt.assert_true(counts.iloc[0] > len(self.data) / 10)
+        nt.assert_true((counts == 1).sum() > len(counts) / 3)
+
+    def test_pipeline_runs_on_synthetic_data(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'synthetic.csv')
+            self.data.to_csv(path, index=False)
+
+            intent = classifyintents.survey()
+            intent.load(path)
+            intent.clean_raw()
+            intent.clean_urls()
+            intent.trainer(['ok'])
+
+        nt.assert_equal(len(intent.cleaned), len(self.data))
+        nt.assert_true(intent.data['time_delta'].notnull().all())
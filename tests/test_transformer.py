@@ -0,0 +1,85 @@
+# coding: utf-8
+import os
+import tempfile
+import nose.tools as nt
+import numpy as np
+import classifyintents
+from classifyintents import FeatureTransformer
+
+
+class TestFeatureTransformer:
+
+    @classmethod
+    def setup_class(self):
+
+        print('Fitting a FeatureTransformer to test_data/raw_test_data_classified.csv')
+
+        self.train = classifyintents.survey()
+        self.train.load('test_data/raw_test_data_classified.csv')
+        self.train.clean_raw()
+        self.train.clean_urls()
+        self.train.trainer(['ok'])
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'transformer.json')
+
+        FeatureTransformer.from_survey(self.train).save(self.path)
+        self.transformer = FeatureTransformer.load(self.path)
+
+        # Score a different file, which has only a subset of the levels
+
+        self.pred = classifyintents.survey(transformer=self.transformer)
+        self.pred.load('test_data/raw_test_data_2.csv')
+        self.pred.clean_raw()
+        self.pred.clean_urls()
+        self.pred.predictor()
+
+    @classmethod
+    def teardown_class(self):
+
+        self.tmp.cleanup()
+
+    def test_transformer_round_trips_through_json(self):
+
+        nt.assert_equal(self.transformer.stats, self.train.stats)
+        nt.assert_equal(self.transformer.target_levels,
+                        self.train.target_encoder.classes_.tolist())
+
+    def test_predictor_uses_training_levels(self):
+
+        nt.assert_equal(self.pred.stats['levels'], self.train.stats['levels'])
+
+        levels = self.train.stats['levels']['cat_satisfaction']
+        expected = [levels.index(x) if x in levels else -1
+                    for x in self.pred.data.loc[self.pred.cleaned.index, 'cat_satisfaction']]
+
+        nt.assert_equal(self.pred.cleaned['cat_satisfaction'].tolist(), expected)
+
+    def test_predictor_codes_unseen_levels_as_minus_one(self):
+
+        intent = classifyintents.survey(transformer=self.transformer)
+        intent.load('test_data/raw_test_data_2.csv')
+        intent.clean_raw()
+        intent.clean_urls()
+        intent.data['cat_work_or_personal'] = 'a level never seen in training'
+        intent.predictor()
+
+        nt.assert_equal(set(intent.cleaned['cat_work_or_personal']), {-1})
+
+    def test_clean_raw_normalises_with_training_stats(self):
+
+        stats = self.transformer.stats['time_delta']
+        intent = classifyintents.survey()
+        intent.load('test_data/raw_test_data_2.csv')
+        intent.clean_raw()
+
+        raw_delta = classifyintents.time_delta(intent.data['end_date'].astype('datetime64[ns]'),
+                                               intent.data['start_date'].astype('datetime64[ns]'))
+
+        assert np.allclose(self.pred.data['time_delta'].astype(float),
+                           (raw_delta - stats['mean']) / stats['std'])
+
+    def test_transformer_restores_target_encoder(self):
+
+        nt.assert_equal(self.pred.target_encoder.transform(['ok']).tolist(),
+                        self.train.target_encoder.transform(['ok']).tolist())